@@ -0,0 +1,448 @@
+import os
+import sys
+
+import pandas as pd
+from dotenv import load_dotenv
+
+import hubspot_client
+import id_cache
+import run_report
+import run_state
+
+load_dotenv()
+
+#création des associations hubspot des tables d'associations du dwh, pour tous les types d'association
+#les pk de chaque type d'objet sont résolues une seule fois pour tous les fichiers :
+#les events des associations clubs, experts et expertises ne sont lus qu'une fois
+#les associations existantes sont lues en bulk : seules les paires nouvelles sont créées,
+#celles qui ne sont plus dans le dwh sont supprimées (les exports d'associations sont toujours complets),
+#d'après des ids relus dans hubspot pendant le run et jamais d'après le seul id_cache
+
+#config
+HUBSPOT_API_KEY = os.getenv("PROD_KEY")
+FILTERED_DIR = "/root/apm/infocentre/apm-export-tables-back/filtered"
+
+#id des objets
+CLUB_OBJECT_ID = "2-191825137"
+EVENT_OBJECT_ID = "2-139503358"
+EXPERT_OBJECT_ID = "0-1"
+EXPERTISE_OBJECT_ID = "2-140990150"
+
+#nom des objets dans les messages et les résultats
+OBJECT_NAMES = {
+    CLUB_OBJECT_ID: ('club', 'clubs'),
+    EVENT_OBJECT_ID: ('event', 'events'),
+    EXPERT_OBJECT_ID: ('expert', 'experts'),
+    EXPERTISE_OBJECT_ID: ('expertise', 'expertises'),
+}
+
+#associations créées : fichier du dwh, objet et colonne des pk de chaque côté, type d'association
+ASSOCIATIONS = [
+    {
+        'nom': 'associations_event_club',
+        'fichier': 'dwh.event_club.csv',
+        'objet_from': CLUB_OBJECT_ID,
+        'cle_from': 'club_key',
+        'objet_to': EVENT_OBJECT_ID,
+        'cle_to': 'event_key',
+        'type_association': 122
+    },
+    {
+        'nom': 'associations_event_expert',
+        'fichier': 'dwh.event_expert.csv',
+        'objet_from': EXPERT_OBJECT_ID,
+        'cle_from': 'expert_key',
+        'objet_to': EVENT_OBJECT_ID,
+        'cle_to': 'event_key',
+        'type_association': 55
+    },
+    {
+        'nom': 'associations_event_expertise',
+        'fichier': 'dwh.event_expertise.csv',
+        'objet_from': EXPERTISE_OBJECT_ID,
+        'cle_from': 'expertise_key',
+        'objet_to': EVENT_OBJECT_ID,
+        'cle_to': 'event_key',
+        'type_association': 144
+    },
+    #INVERSION : expertise_key contient les pk des experts, expert_key celles des expertises
+    {
+        'nom': 'associations_expert_expertise',
+        'fichier': 'dwh.expert_expertise.csv',
+        'objet_from': EXPERT_OBJECT_ID,
+        'cle_from': 'expertise_key',
+        'objet_to': EXPERTISE_OBJECT_ID,
+        'cle_to': 'expert_key',
+        'type_association': 143
+    },
+]
+
+BATCH_SIZE = 100
+
+#lecture des associations existantes (api v4 batch read) : 1000 objets par appel
+READ_BATCH_SIZE = 1000
+
+#ASSOCIATION_DIFF=0 : envoyer toutes les associations du fichier, sans lire l'existant ni rien supprimer
+DIFF_ASSOCIATIONS = os.getenv("ASSOCIATION_DIFF", "1") == "1"
+
+
+def _headers():
+    return {'Authorization': f'Bearer {HUBSPOT_API_KEY}', 'Content-Type': 'application/json'}
+
+
+#paires (pk from, pk to) du fichier, None si le fichier est absent
+def load_pairs(association):
+    csv_file = os.path.join(FILTERED_DIR, association['fichier'])
+    if not os.path.exists(csv_file):
+        print(f"fichier introuvable : {csv_file}")
+        return None
+
+    df = pd.read_csv(csv_file, low_memory=False)
+    return pd.DataFrame({
+        'pk_from': df[association['cle_from']].map(str),
+        'pk_to': df[association['cle_to']].map(str)
+    }, index=df.index)
+
+
+#ids relus dans hubspot pendant ce run (jamais ceux du cache) et pk déjà relues, par type d'objet
+_fresh_ids = {}
+_fresh_read = {}
+
+
+#ids hubspot des pk : id_cache, puis api batch read pour les autres, None si une lecture échoue
+def resolve_keys(object_type, keys):
+    mapping = id_cache.lookup(object_type, keys)
+    missing = [pk for pk in keys if pk not in mapping]
+
+    if missing:
+        found = id_cache.read_by_key(object_type, missing)
+        if found is None:
+            return None
+        mapping.update(found)
+        id_cache.remember(object_type, found)
+        _fresh_ids.setdefault(object_type, {}).update(found)
+        _fresh_read.setdefault(object_type, set()).update(missing)
+
+    print(f"ids trouvés pour {len(mapping)}/{len(keys)} {OBJECT_NAMES[object_type][1]}")
+    return mapping
+
+
+#ids des pk relus par batch read, pour les suppressions : un id du cache périmé (objet supprimé puis recréé)
+#ferait supprimer des associations valides. chaque pk n'est relue qu'une fois par run, None si une lecture échoue
+def resolve_fresh(object_type, keys):
+    known = _fresh_ids.setdefault(object_type, {})
+    read = _fresh_read.setdefault(object_type, set())
+    missing = [pk for pk in keys if pk not in read]
+
+    if missing:
+        found = id_cache.read_by_key(object_type, missing)
+        if found is None:
+            return None
+        known.update(found)
+        read.update(missing)
+        id_cache.remember(object_type, found)
+
+    return {pk: known[pk] for pk in keys if pk in known}
+
+
+#créé plusieurs associations en batch
+def create_associations_batch(association, associations, headers):
+    batch_data = {
+        "inputs": [{
+            "from": {"id": assoc["from_id"]},
+            "to": {"id": assoc["to_id"]},
+            "types": [{
+                "associationCategory": "USER_DEFINED",
+                "associationTypeId": association['type_association']
+            }]
+        } for assoc in associations]
+    }
+
+    response = hubspot_client.post(
+        f"{hubspot_client.BASE_URL}/crm/v4/associations/{association['objet_from']}/{association['objet_to']}/batch/create",
+        headers=headers,
+        json=batch_data
+    )
+
+    return response
+
+
+#associations existantes du type configuré : {(id from, id to)}, None si une lecture échoue
+def read_existing(association, from_ids, headers):
+    existing = set()
+    from_ids = list(from_ids)
+
+    for i in range(0, len(from_ids), READ_BATCH_SIZE):
+        response = hubspot_client.post(
+            f"{hubspot_client.BASE_URL}/crm/v4/associations/{association['objet_from']}/{association['objet_to']}/batch/read",
+            headers=headers,
+            json={"inputs": [{"id": from_id} for from_id in from_ids[i:i + READ_BATCH_SIZE]]}
+        )
+
+        #207 : une partie des objets n'existe plus
+        if response.status_code not in (200, 207):
+            print(f"erreur lecture des associations {association['nom']}: {response.status_code}")
+            return None
+
+        for item in response.json().get('results', []):
+            from_id = str(item['from']['id'])
+            for linked in item.get('to', []):
+                type_ids = [association_type.get('typeId') for association_type in linked.get('associationTypes', [])]
+                if association['type_association'] in type_ids:
+                    existing.add((from_id, str(linked['toObjectId'])))
+
+    return existing
+
+
+#supprime les associations par batch, retourne (supprimées, erreurs)
+#labels/archive : seul le type d'association du fichier est retiré, les autres types entre les mêmes objets restent
+def archive_associations(association, stale, headers):
+    stale = sorted(stale)
+    archived = 0
+    errors = 0
+
+    for i in range(0, len(stale), BATCH_SIZE):
+        batch_pairs = stale[i:i + BATCH_SIZE]
+        response = hubspot_client.post(
+            f"{hubspot_client.BASE_URL}/crm/v4/associations/{association['objet_from']}/{association['objet_to']}/batch/labels/archive",
+            headers=headers,
+            json={"inputs": [{
+                "from": {"id": from_id},
+                "to": {"id": to_id},
+                "types": [{
+                    "associationCategory": "USER_DEFINED",
+                    "associationTypeId": association['type_association']
+                }]
+            } for from_id, to_id in batch_pairs]}
+        )
+
+        if response.status_code == 204:
+            archived += len(batch_pairs)
+        else:
+            print(f"erreur suppression des associations {association['nom']}: {response.status_code}")
+            errors += len(batch_pairs)
+
+    return archived, errors
+
+
+#existing : associations déjà dans hubspot (None : pas de diff, toutes les paires sont envoyées)
+def process_batch(association, batch_data, mappings, debug_first=False, existing=None):
+    headers = _headers()
+    from_type, to_type = association['objet_from'], association['objet_to']
+    from_name, to_name = OBJECT_NAMES[from_type], OBJECT_NAMES[to_type]
+    from_property, to_property = id_cache.KEY_PROPERTIES[from_type], id_cache.KEY_PROPERTIES[to_type]
+    results = []
+
+    def result(index, pk_from, pk_to, status):
+        return {'index': index, from_property: pk_from, to_property: pk_to, 'result': status}
+
+    #pk non résolues (lecture en erreur) : tout le batch en erreur
+    for object_type, name in ((from_type, from_name), (to_type, to_name)):
+        if mappings[object_type] is None:
+            return [result(index, pk_from, pk_to, f"erreur batch {name[1]}")
+                    for index, pk_from, pk_to in zip(batch_data.index, batch_data['pk_from'], batch_data['pk_to'])]
+
+    #préparer les associations valides
+    valid_associations = []
+
+    for index, pk_from, pk_to in zip(batch_data.index, batch_data['pk_from'], batch_data['pk_to']):
+        from_id = mappings[from_type].get(pk_from)
+        to_id = mappings[to_type].get(pk_to)
+
+        if not from_id:
+            results.append(result(index, pk_from, pk_to, f"{from_name[0]} introuvable"))
+        elif not to_id:
+            results.append(result(index, pk_from, pk_to, f"{to_name[0]} introuvable"))
+        elif existing is not None and (from_id, to_id) in existing:
+            results.append(result(index, pk_from, pk_to, "existe déjà"))
+        else:
+            valid_associations.append({
+                'index': index,
+                'pk_from': pk_from,
+                'pk_to': pk_to,
+                'from_id': from_id,
+                'to_id': to_id
+            })
+
+    #créer les associations en batch
+    for i in range(0, len(valid_associations), BATCH_SIZE):
+        batch_assocs = valid_associations[i:i + BATCH_SIZE]
+
+        if debug_first and i == 0:
+            print(f"Création de {len(batch_assocs)} associations en batch")
+
+        assoc_response = create_associations_batch(association, batch_assocs, headers)
+
+        if debug_first:
+            print(f"Réponse associations: {assoc_response.status_code}")
+            if assoc_response.status_code != 201:
+                print(f"Détail erreur: {assoc_response.text}")
+
+        if assoc_response.status_code == 201:
+            #succès pour toutes les associations du batch
+            for assoc in batch_assocs:
+                results.append(result(assoc['index'], assoc['pk_from'], assoc['pk_to'], 'ok'))
+        elif assoc_response.status_code == 207:
+            batch_results = assoc_response.json().get('results', [])
+            for j, assoc in enumerate(batch_assocs):
+                if j < len(batch_results):
+                    batch_result = batch_results[j]
+                    if 'id' in batch_result:
+                        status = 'ok'
+                    elif 'status' in batch_result and batch_result['status'] == 'COMPLETE':
+                        status = 'ok'
+                    else:
+                        status = 'erreur association'
+                else:
+                    status = 'erreur association'
+
+                results.append(result(assoc['index'], assoc['pk_from'], assoc['pk_to'], status))
+        else:
+            error_msg = f"erreur batch associations ({assoc_response.status_code})"
+            for assoc in batch_assocs:
+                results.append(result(assoc['index'], assoc['pk_from'], assoc['pk_to'], error_msg))
+
+    return results
+
+
+#associations à supprimer d'après les ids relus dans ce run : seules celles dont l'objet from a été relu
+#sont supprimées, retourne (associations à supprimer, nombre d'associations ignorées)
+def confirm_stale(association, pairs, existing):
+    from_type, to_type = association['objet_from'], association['objet_to']
+    fresh_from = resolve_fresh(from_type, pairs['pk_from'].unique().tolist())
+    fresh_to = resolve_fresh(to_type, pairs['pk_to'].unique().tolist())
+    if fresh_from is None or fresh_to is None:
+        return set(), len(existing)
+
+    wanted = set(zip(pairs['pk_from'].map(fresh_from), pairs['pk_to'].map(fresh_to)))
+    candidates = existing - wanted
+    fresh_from_ids = set(fresh_from.values())
+    stale = {pair for pair in candidates if pair[0] in fresh_from_ids}
+    return stale, len(candidates) - len(stale)
+
+
+#crée les associations d'un fichier par batch et supprime celles qui n'y sont plus,
+#retourne (créées, existantes, supprimées, erreurs)
+def run_association(association, pairs, mappings):
+    name = association['nom']
+    from_type, to_type = association['objet_from'], association['objet_to']
+    total = len(pairs)
+    print(f"{name} : traitement de {total} lignes")
+
+    success = 0
+    exists = 0
+    archived = 0
+    archive_errors = 0
+    errors = 0
+
+    #associations existantes des objets du fichier (les seuls créés ou dont les associations sont supprimées)
+    existing = None
+    if DIFF_ASSOCIATIONS and mappings[from_type] is not None and mappings[to_type] is not None:
+        from_ids = set(mappings[from_type].values())
+        with run_report.timed('read_associations', name, rows=len(from_ids)) as fields:
+            existing = read_existing(association, sorted(from_ids), _headers())
+            if existing is None:
+                fields['status'] = 'error'
+            else:
+                fields['associations'] = len(existing)
+
+    #reprise : batches déjà traités sans erreur dans ce run
+    done_batches = run_state.done_batches(name)
+
+    #traiter par batch
+    for i in range(0, total, BATCH_SIZE):
+        batch_end = min(i + BATCH_SIZE, total)
+        batch_data = pairs.iloc[i:batch_end]
+
+        if i in done_batches:
+            print(f"batch {i//BATCH_SIZE + 1} déjà traité, ignoré")
+            continue
+
+        print(f"Traitement du batch {i//BATCH_SIZE + 1} (lignes {i+1} à {batch_end})")
+
+        with run_report.timed('batch', name, rows=len(batch_data)) as fields:
+            batch_results = process_batch(association, batch_data, mappings, debug_first=(i == 0), existing=existing)
+            fields['errors'] = sum(1 for result in batch_results if result['result'] not in ("ok", "existe déjà"))
+
+        if fields['errors'] == 0:
+            run_state.mark_batch(name, i)
+
+        #compter les résultats du batch
+        for result in batch_results:
+            if result['result'] == "ok":
+                success += 1
+            elif result['result'] == "existe déjà":
+                exists += 1
+            else:
+                errors += 1
+
+    #associations qui ne sont plus dans le fichier
+    #fichier vide : export suspect, rien n'est supprimé
+    if existing is not None and total > 0:
+        wanted = set(zip(pairs['pk_from'].map(mappings[from_type]), pairs['pk_to'].map(mappings[to_type])))
+        stale = existing - wanted
+        if stale:
+            stale, skipped = confirm_stale(association, pairs, existing)
+            if skipped:
+                print(f"{skipped} associations non supprimées (ids non relus dans hubspot)")
+            with run_report.timed('archive', name, rows=len(stale)) as fields:
+                fields['skipped'] = skipped
+                if stale:
+                    archived, archive_errors = archive_associations(association, stale, _headers())
+                fields['errors'] = archive_errors
+
+    print(f"\n{name} terminé:")
+    print(f"Créées: {success}")
+    print(f"Existantes: {exists}")
+    print(f"Supprimées: {archived}")
+    print(f"Erreurs: {errors}")
+    if archive_errors:
+        print(f"Erreurs de suppression: {archive_errors}")
+    print(f"Total traité: {success + exists + errors}")
+    return success, exists, archived, errors
+
+
+#names : associations à créer (toutes par défaut)
+def main(*names):
+    #ids relus : propres à ce run, même si le module reste chargé (worker chaud)
+    _fresh_ids.clear()
+    _fresh_read.clear()
+
+    associations = [association for association in ASSOCIATIONS if not names or association['nom'] in names]
+    if not associations:
+        print(f"association inconnue : {', '.join(names)}")
+        sys.exit(1)
+
+    #lire tous les fichiers avant de résoudre les pk
+    loaded = []
+    missing_files = 0
+    for association in associations:
+        pairs = load_pairs(association)
+        if pairs is None:
+            missing_files += 1
+        else:
+            loaded.append((association, pairs))
+
+    #pk de chaque type d'objet, tous fichiers confondus
+    keys = {}
+    for association, pairs in loaded:
+        keys.setdefault(association['objet_from'], set()).update(pairs['pk_from'])
+        keys.setdefault(association['objet_to'], set()).update(pairs['pk_to'])
+
+    mappings = {}
+    for object_type, object_keys in keys.items():
+        with run_report.timed('resolve', OBJECT_NAMES[object_type][1], rows=len(object_keys)) as fields:
+            mappings[object_type] = resolve_keys(object_type, sorted(object_keys))
+            if mappings[object_type] is None:
+                print(f"Erreur lecture {OBJECT_NAMES[object_type][1]}")
+                fields['status'] = 'error'
+
+    for association, pairs in loaded:
+        run_association(association, pairs, mappings)
+
+    if missing_files:
+        #code retour en erreur : fichier d'associations manquant
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
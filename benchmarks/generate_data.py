@@ -0,0 +1,615 @@
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from country_converter import CountryConverter
+
+#données synthétiques ayant les colonnes des exports dwh.mv_* (rendu texte du COPY csv de postgresql)
+#mêmes valeurs pour une même graine : les benchmarks et les fichiers de référence sont reproductibles
+#génération par paquets pour que 1M de lignes d'une table large tienne en mémoire
+CHUNK_ROWS = 100000
+DEFAULT_SEED = 42
+
+#valeurs parasites présentes dans les colonnes texte de l'entrepôt
+DIRTY_TEXT = ['null', 'NULL', 'None', 'none', ' ', '0']
+
+FIRST_NAMES = ['Jean', 'Marie', 'Pierre', 'Sophie', 'Luc', 'Anne', 'Éric', 'Hélène', 'François', 'Chloé',
+               'Jean-Marc', 'Marie-Claire', 'Olivier', 'Isabelle', 'Karim', 'Fatou', 'Thomas', 'Léa']
+LAST_NAMES = ['Martin', 'Bernard', 'Dubois', 'Thomas', 'Robert', 'Richard', 'Petit', 'Durand', 'Leroy',
+              'Moreau', "D'Almeida", 'Lefèvre', 'Garnier', 'Faure', 'N\'Diaye', 'de la Tour', 'Nguyen']
+CITIES = ['Paris', 'Lyon', 'Marseille', 'Bordeaux', 'Lille', 'Nantes', 'Strasbourg', 'Saint-Étienne',
+          'Bruxelles', 'Genève', 'Casablanca', 'Dakar', 'Montréal', 'Saint-Denis']
+STREETS = ['rue de la Paix', 'avenue Victor Hugo', 'boulevard Haussmann', 'place Bellecour',
+           'chemin des Vignes', 'allée des Tilleuls', 'quai de Seine']
+WORDS = ['stratégie', 'croissance', 'management', 'équipe', 'innovation', 'dirigeant', 'finance',
+         'export', 'digital', 'leadership', 'négociation', 'transmission', 'RSE', 'marketing']
+COUNTRIES = CountryConverter.get_all_iso_codes()
+COUNTRY_WEIGHTS = {'FRA': 0.7, 'BEL': 0.05, 'CHE': 0.03, 'MAR': 0.03, 'SEN': 0.02, 'CAN': 0.02}
+
+REGIONS = ['Afrique', 'Amériques', 'Aquitaine-Auvergne-Centre', 'Asie', 'Belux', 'Bretagne-Pays de Loire',
+           'Europe', 'Grand-Est', 'Haut-de-France', 'IDF-Paris-Champagne', 'Océan Indien', 'Ovalie', 'PACA',
+           'Paris-Normandie-Centre-Val-de-Loire', 'Rhône-Alpes', 'Nouvelle région']
+SUBDOMAINS = ['Stratégie et prospective', 'Finance et gestion', 'Ressources humaines', 'Marketing et vente',
+              'Géopolitique', 'Développement personnel', 'Juridique', 'Systèmes d\'information',
+              'Communication', 'Production et logistique']
+DOMAINS = ["Développement d'entreprise", "Techniques d'entreprise", 'Management', "Environnement de l'entreprise",
+           'Développement du dirigeant', 'Université', 'Tous experts', 'management', 'Autre domaine']
+EXTI_VALUES = ['Le developpement de la capacite strategique',
+               "Les systemes et techniques de gestion d'organisation et de production",
+               'Le management et les ressources humaines', "La dimension marketing et l'action commerciale",
+               'La macro-economie et la geopolitique',
+               "L'environnement social culturel et institutionnel de l'entreprise",
+               "La communication interne/externe et les systemes d'information",
+               "Technologie, prospective et recherche au service de l'entreprise",
+               'Le comportement du dirigeant', 'Non renseigne']
+
+
+def _strings(values):
+    return np.array(values, dtype=object)
+
+
+#met une partie des valeurs à NULL (champ vide dans le csv)
+def _nulls(rng, values, null_rate):
+    if null_rate:
+        values[rng.random(len(values)) < null_rate] = None
+    return values
+
+
+def keys(offset=1):
+    def generate(rng, start, n):
+        return _strings([str(offset + start + i) for i in range(n)])
+    return generate
+
+
+def ints(low, high, null_rate=0.0):
+    def generate(rng, start, n):
+        return _nulls(rng, _strings([str(v) for v in rng.integers(low, high, n)]), null_rate)
+    return generate
+
+
+#numeric(…, 2) : rendu postgresql avec l'échelle de la colonne
+def decimals(low, high, scale=2, null_rate=0.0):
+    def generate(rng, start, n):
+        values = np.round(rng.uniform(low, high, n), scale)
+        return _nulls(rng, _strings([f"{v:.{scale}f}" for v in values]), null_rate)
+    return generate
+
+
+def bools(null_rate=0.0, true_rate=0.5):
+    def generate(rng, start, n):
+        return _nulls(rng, np.where(rng.random(n) < true_rate, 't', 'f').astype(object), null_rate)
+    return generate
+
+
+def choice(values, null_rate=0.0, weights=None):
+    def generate(rng, start, n):
+        p = None
+        if weights:
+            p = np.array([weights.get(v, 1.0) for v in values], dtype=float)
+            p /= p.sum()
+        return _nulls(rng, rng.choice(_strings(values), n, p=p), null_rate)
+    return generate
+
+
+#date : YYYY-MM-DD, timestamp : YYYY-MM-DD HH:MM:SS, timestamptz : +00 en plus (session en UTC)
+def dates(first='1950-01-01', last='2025-12-31', kind='date', null_rate=0.0):
+    def generate(rng, start, n):
+        low = np.datetime64(first, 's').astype(np.int64)
+        high = np.datetime64(last, 's').astype(np.int64)
+        seconds = rng.integers(low, high, n)
+        if kind == 'date':
+            values = seconds.astype('datetime64[s]').astype('datetime64[D]').astype(str)
+        else:
+            values = np.char.replace(seconds.astype('datetime64[s]').astype(str), 'T', ' ')
+            if kind == 'minutes':
+                values = values.astype('<U16')
+            elif kind == 'timestamptz':
+                values = np.char.add(values, '+00')
+        return _nulls(rng, values.astype(object), null_rate)
+    return generate
+
+
+def text(vocabulary, words=1, null_rate=0.0, dirty_rate=0.0, separator=' '):
+    def generate(rng, start, n):
+        picks = rng.choice(_strings(vocabulary), (n, words))
+        values = _strings([separator.join(row) for row in picks])
+        if dirty_rate:
+            dirty = rng.random(n) < dirty_rate
+            values[dirty] = rng.choice(_strings(DIRTY_TEXT), int(dirty.sum()))
+        return _nulls(rng, values, null_rate)
+    return generate
+
+
+#texte libre : virgules, guillemets, retours à la ligne et espaces en bordure
+def paragraphs(null_rate=0.0):
+    def generate(rng, start, n):
+        values = []
+        for size, quirk in zip(rng.integers(2, 12, n), rng.integers(0, 6, n)):
+            value = ' '.join(rng.choice(WORDS, size))
+            if quirk == 1:
+                value = value.replace(' ', ', ', 2)
+            elif quirk == 2:
+                value = f'"{value}"\n{value}'
+            elif quirk == 3:
+                value = f'  {value}\r\n'
+            values.append(value)
+        return _nulls(rng, _strings(values), null_rate)
+    return generate
+
+
+def emails(null_rate=0.0):
+    def generate(rng, start, n):
+        firsts = rng.choice(FIRST_NAMES, n)
+        lasts = rng.choice(LAST_NAMES, n)
+        return _nulls(rng, _strings([
+            f"{first.lower()}.{last.lower().replace(' ', '')}{start + i}@exemple.fr"
+            for i, (first, last) in enumerate(zip(firsts, lasts))
+        ]), null_rate)
+    return generate
+
+
+def phones(null_rate=0.0):
+    def generate(rng, start, n):
+        numbers = rng.integers(100000000, 799999999, n)
+        styles = rng.integers(0, 3, n)
+        values = []
+        for number, style in zip(numbers, styles):
+            digits = f"0{number:09d}"
+            if style == 1:
+                digits = ' '.join(digits[i:i + 2] for i in range(0, 10, 2))
+            elif style == 2:
+                digits = f"+33{digits[1:]}"
+            values.append(digits)
+        return _nulls(rng, _strings(values), null_rate)
+    return generate
+
+
+def countries(null_rate=0.0, extra=('0', 'ZZZ', 'fra')):
+    values = list(COUNTRIES) + list(extra)
+    return choice(values, null_rate, weights=COUNTRY_WEIGHTS)
+
+
+def urls(prefix, null_rate=0.0):
+    def generate(rng, start, n):
+        return _nulls(rng, _strings([f"https://{prefix}/{start + i}/{v}.pdf" for i, v in
+                                     enumerate(rng.integers(1000, 9999, n))]), null_rate)
+    return generate
+
+
+def zip_codes(null_rate=0.0):
+    def generate(rng, start, n):
+        return _nulls(rng, _strings([f"{v:05d}" for v in rng.integers(1000, 98000, n)]), null_rate)
+    return generate
+
+
+def uuids():
+    def generate(rng, start, n):
+        high, low = rng.integers(0, 2 ** 63, n), rng.integers(0, 2 ** 63, n)
+        return _strings([f"{a:016x}{b:016x}" for a, b in zip(high, low)])
+    return generate
+
+
+FLAG = bools(null_rate=0.05, true_rate=0.3)
+
+CONTACT_BASE = {
+    'Email': emails(null_rate=0.02),
+    'Civilite': choice(['M', 'Mme', 'MME', ' m ', 'Dr', 'M.'], null_rate=0.03),
+    'Nom': text(LAST_NAMES, dirty_rate=0.005),
+    'Prenom': text(FIRST_NAMES, dirty_rate=0.005),
+    'Tel': phones(null_rate=0.3),
+    'Portable': phones(null_rate=0.1),
+    'Pays': countries(null_rate=0.05),
+    'Ville': text(CITIES, null_rate=0.05),
+    'CP': zip_codes(null_rate=0.05),
+    'Adresse': text(STREETS, null_rate=0.05),
+    'Nationalite': countries(null_rate=0.2),
+    'Date_naissance': dates('1940-01-01', '2000-12-31', null_rate=0.2),
+    'Dept': ints(1, 96, null_rate=0.1),
+    'StatutPro': choice(['Salarié', 'salarie', 'Indépendant', 'Gérant', "gérant d'entreprise", 'Chômeur',
+                         'Enseignant', 'Chercheur', 'autre', 'Retraité', '0', ' salarié '], null_rate=0.1),
+    'Club': text(CITIES, words=2, null_rate=0.1),
+    'CibleAPM': bools(null_rate=0.2),
+    'FlagCoordinateur': FLAG,
+    'FlagExpert': FLAG,
+    'FlagAnimateur': FLAG,
+    'FlagPermanent': FLAG,
+    'FlagReferent': FLAG,
+    'FlagActif': FLAG,
+    'FlagMembre': FLAG,
+    'DernDateEntree': dates('1990-01-01', '2025-12-31', null_rate=0.1),
+    'subscriber_info__status__value': choice(['active', 'inactive', 'alumni', 'pending'], null_rate=0.1),
+    'active_subscription__club_info__name': text(CITIES, words=2, null_rate=0.2),
+}
+
+STATUT_CYCLE = choice(['En cours', 'Terminé', 'Résilié', 'A renouveler'], null_rate=0.1)
+
+TABLES = {
+    'dwh.mv_expert': {
+        'PKExpert': keys(),
+        **CONTACT_BASE,
+        'SocieteFacturation': text(LAST_NAMES, words=2, null_rate=0.3),
+        'TypeTVA': choice(['Assujetti', 'Non assujetti', 'Intracommunautaire'], null_rate=0.2),
+        'IdTVAInter': text(['FR12345678901', 'BE0123456789', 'CHE-123.456.789'], null_rate=0.6),
+        'accounting__vat_international': bools(null_rate=0.5),
+        'Id Permanent': ints(1, 5000, null_rate=0.7),
+        'IdExpert': ints(1, 200000),
+        'Statut expert': choice(['Actif', 'Inactif', 'En sommeil', ' Actif '], null_rate=0.05),
+    },
+    'dwh.mv_permanent': {
+        'PKPermanent': keys(),
+        **CONTACT_BASE,
+        'Id': ints(1, 200000),
+        'StatutCycle': STATUT_CYCLE,
+    },
+    'dwh.mv_referent': {
+        'PKReferent': keys(),
+        **CONTACT_BASE,
+        'Id': ints(1, 200000),
+        'StatutCycle': STATUT_CYCLE,
+    },
+    'dwh.mv_adherent_actif': {
+        'PKAdherent': keys(),
+        **CONTACT_BASE,
+        'active_subscription__signed_cpp__filename': text(['cpp.pdf', 'contrat_signe.pdf'], null_rate=0.4),
+        'active_subscription__signed_cpp__date': dates('2015-01-01', '2025-12-31', null_rate=0.4),
+        'active_subscription__signed_cpp__asset_filename': text(['asset_cpp.pdf'], null_rate=0.4),
+        'active_subscription__signed_cpp__url': urls('files.apm.fr/cpp', null_rate=0.4),
+        'FK_Societe': ints(1, 80000, null_rate=0.1),
+        'Id': ints(1, 200000),
+        'leader_status__value': choice(['Dirigeant', 'Co-dirigeant', 'Cadre dirigeant'], null_rate=0.2),
+        'StatutCycle': STATUT_CYCLE,
+    },
+    'dwh.mv_cycle': {
+        'PKCycle': keys(),
+        'DateCreationCycle': dates('2005-01-01', '2025-12-31', 'timestamptz', null_rate=0.02),
+        'DateDebut': dates('2005-01-01', '2025-12-31', null_rate=0.02),
+        'DateFin': dates('2006-01-01', '2027-12-31', null_rate=0.1),
+        'DateDesinscription': dates('2006-01-01', '2025-12-31', null_rate=0.8),
+        'FK_Club': ints(1, 3000, null_rate=0.02),
+        'FK_Club2': ints(1, 3000, null_rate=0.9),
+        'FK_Animateur': ints(1, 5000, null_rate=0.1),
+        'FK_Region': ints(1, 20, null_rate=0.05),
+        'Id_MotifSortie': ints(1, 15, null_rate=0.8),
+        'MotifSortie': choice(['Retraite', 'Cession', 'Raisons financières', 'Autre'], null_rate=0.8),
+        'Id_TypeSortie': ints(1, 5, null_rate=0.8),
+        'TypeSortie': choice(['Volontaire', 'Exclusion', 'Décès'], null_rate=0.8),
+        'FK_Invoice': ints(1, 900000, null_rate=0.3),
+        'FlagActif': bools(null_rate=0.02),
+        'DiscountManuel': decimals(-500, 500, null_rate=0.85),
+        'Membre_Index': ints(1, 40),
+        'Membre_email': emails(null_rate=0.05),
+        'Membre_Prenom': text(FIRST_NAMES, null_rate=0.02, dirty_rate=0.005),
+        'Id_Membre': ints(1, 200000),
+        'Membre_Nom': text(LAST_NAMES, null_rate=0.01, dirty_rate=0.005),
+        'Membre_Type': choice(['member', 'Member', 'expert', 'ANIMATEUR', 'null'], null_rate=0.02),
+        'Id_Taux': ints(1, 6, null_rate=0.1),
+        'Taux': decimals(0, 20, null_rate=0.1),
+        'Id_Proba_renew': ints(1, 5, null_rate=0.4),
+        'Proba_renew': decimals(0, 100, null_rate=0.4),
+        'Renew': bools(null_rate=0.3),
+        'sent_count_cpp_to_sign': ints(0, 5, null_rate=0.5),
+        'sent_cpp': bools(null_rate=0.5),
+        'sent_cpp_to_sign': bools(null_rate=0.5),
+        'signed_cpp__asset_filename': text(['asset_cpp.pdf'], null_rate=0.5),
+        'signed_cpp__date': dates('2015-01-01', '2025-12-31', 'timestamptz', null_rate=0.5),
+        'signed_cpp__filename': text(['cpp.pdf', 'contrat_signe.pdf'], null_rate=0.5),
+        'signed_cpp__url': urls('files.apm.fr/cpp', null_rate=0.5),
+        'Id_Offrespeciale': ints(1, 10, null_rate=0.9),
+        'Offrespeciale': choice(['Parrainage', 'Jeune dirigeant', 'Relance'], null_rate=0.9),
+        'FK_Adherent': ints(1, 200000),
+        'subscriber_info__active_subscription__key': uuids(),
+        'Id_Statut_Adherent': ints(1, 6, null_rate=0.05),
+        'Statut_Adherent': choice(['Actif', 'Alumni', 'Inactif', 'Sans alumni'], null_rate=0.05),
+        'Cotisation_TTC': decimals(500, 6000, null_rate=0.05),
+        'Cotisation_HT': decimals(400, 5000, null_rate=0.05),
+        'TVA': decimals(0, 1000, null_rate=0.05),
+        'DateMAJ': dates('2020-01-01', '2025-12-31', 'timestamptz'),
+        'DateCreation': dates('2005-01-01', '2025-12-31', 'timestamptz'),
+    },
+    'dwh.mv_societe': {
+        'PKSociete': keys(),
+        'Nom': text(LAST_NAMES, words=2, dirty_rate=0.005),
+        'Email': emails(null_rate=0.3),
+        'Phone': phones(null_rate=0.3),
+        'Secteur': choice(['Industrie', 'Services', 'Commerce', 'BTP', 'Santé', 'Numérique'], null_rate=0.1),
+        'Pays': countries(null_rate=0.05),
+        'City': text(CITIES, null_rate=0.05),
+        'ZipCode': zip_codes(null_rate=0.05),
+        'Address': text(STREETS, null_rate=0.05),
+        'Dept': ints(1, 96, null_rate=0.1),
+        'Region': choice(REGIONS, null_rate=0.1),
+        'IdEffectif': ints(1, 8, null_rate=0.2),
+        'Effectif': ints(1, 5000, null_rate=0.2),
+        'IDRevenue': ints(1, 8, null_rate=0.3),
+        'Revenue': decimals(10000, 90000000, null_rate=0.3),
+        'SIRET': ints(10000000000000, 99999999999999, null_rate=0.2),
+        'SIREN': ints(100000000, 999999999, null_rate=0.2),
+        'TVA': text(['FR12345678901', 'FR98765432109'], null_rate=0.4),
+        'TVAInter': text(['FR12345678901', 'BE0123456789'], null_rate=0.6),
+        'TVAOption': choice(['Débits', 'Encaissements'], null_rate=0.5),
+        'IDDeadline': ints(1, 5, null_rate=0.3),
+        'Deadline': choice(['30 jours net virement SEPA', '60 jours net virement sepa', '60 jours net',
+                            'Anim / Experts', 'A réception', ' 60 JOURS NET '], null_rate=0.3),
+        'IdMode': ints(1, 6, null_rate=0.3),
+        'Mode': choice(['Virement', 'Prélèvement', 'Chèque'], null_rate=0.3),
+        'TiersPayeur': bools(null_rate=0.5),
+    },
+    'dwh.mv_club': {
+        'PKClub': keys(),
+        'IdClub': ints(1, 3000),
+        'NomClub': text(CITIES, words=2, dirty_rate=0.005),
+        'FK_President': ints(1, 200000, null_rate=0.2),
+        'PrenomPresident': text(FIRST_NAMES, null_rate=0.2),
+        'NomPresident': text(LAST_NAMES, null_rate=0.2),
+        'FK_Animateur': ints(1, 5000, null_rate=0.1),
+        'PrenomAnimateur': text(FIRST_NAMES, null_rate=0.1),
+        'NomAnimateur': text(LAST_NAMES, null_rate=0.1),
+        'FK_Permanent': ints(1, 500, null_rate=0.1),
+        'PrenomPermanent': text(FIRST_NAMES, null_rate=0.1),
+        'NomPermanent': text(LAST_NAMES, null_rate=0.1),
+        'FK_Referent': ints(1, 500, null_rate=0.3),
+        'PrenomReferent': text(FIRST_NAMES, null_rate=0.3),
+        'NomReferent': text(LAST_NAMES, null_rate=0.3),
+        'FK_Region': ints(1, 20, null_rate=0.05),
+        'Region': choice(REGIONS, null_rate=0.05),
+        'NomRegion': choice(REGIONS, null_rate=0.05),
+        'Adresse1Club': text(STREETS, null_rate=0.1),
+        'Adresse2Club': text(STREETS, null_rate=0.8),
+        'CPClub': zip_codes(null_rate=0.1),
+        'VilleClub': text(CITIES, null_rate=0.1),
+        'PaysClub': countries(null_rate=0.05, extra=('0', 'X', '*', 'ZZZ')),
+        'Nbadherents': ints(0, 40, null_rate=0.05),
+        'AxeAnalytique': text(['AX01', 'AX02', 'AX07', 'INT'], null_rate=0.3),
+        'IdStatut': ints(1, 5, null_rate=0.05),
+        'Statut': choice(['Actif', 'En création', 'Fermé'], null_rate=0.05),
+        'DateCreation': dates('1990-01-01', '2025-12-31', null_rate=0.05),
+        'DateFin': dates('2000-01-01', '2025-12-31', null_rate=0.8),
+        'AgeMoyen': decimals(30, 65, null_rate=0.2),
+        'Tarif': decimals(1000, 6000, null_rate=0.2),
+        'Evaluation': decimals(0, 10, null_rate=0.4),
+        'stats__age_average': decimals(30, 65, null_rate=0.3),
+        'Date_Creation_Club': dates('1990-01-01', '2025-12-31', null_rate=0.2),
+        'Date_1ere_Rencontre': dates('1990-01-01', '2025-12-31', null_rate=0.3),
+        'Date_fin_cycle': dates('2020-01-01', '2027-12-31', null_rate=0.3),
+        'Date_debut_cycle': dates('2015-01-01', '2025-12-31', null_rate=0.3),
+        'avatar_url': urls('cdn.apm.fr/clubs', null_rate=0.5),
+    },
+    'dwh.mv_expertise': {
+        'PKExpertise': keys(),
+        'FK_Expert': ints(1, 20000),
+        'FK_Experts': text([str(v) for v in range(1, 400)], words=2, null_rate=0.7, separator=','),
+        'IdExpert': ints(1, 20000),
+        'IdStatut': ints(1, 5, null_rate=0.05),
+        'Statut': choice(['Validée', 'En attente', 'Archivée'], null_rate=0.05),
+        'theme': text(WORDS, words=3, null_rate=0.1),
+        'Expertise': text(WORDS, words=4, dirty_rate=0.005),
+        'SsExpertise': text(WORDS, words=3, null_rate=0.3),
+        'Id_TypeIntervention': ints(1, 5, null_rate=0.05),
+        'TypeIntervention': choice(['Club', 'Université', 'Voyage', 'Sans thème', 'Conférence'], null_rate=0.05),
+        'IdModalite': ints(1, 4, null_rate=0.2),
+        'Modalite': choice(['Présentiel', 'À distance', 'Mixte'], null_rate=0.2),
+        'Avantages': paragraphs(null_rate=0.4),
+        'exti_id__id': ints(1, 10, null_rate=0.3),
+        'exti_id__value': choice(EXTI_VALUES, null_rate=0.3),
+        'theme_under_surveillance': bools(null_rate=0.3),
+        'order_of_preference': ints(1, 10, null_rate=0.3),
+        'format__id': ints(1, 6, null_rate=0.2),
+        'expert__exp_id': ints(1, 20000, null_rate=0.1),
+        'opca__progression': paragraphs(null_rate=0.7),
+        'opca__benefit': paragraphs(null_rate=0.7),
+        'opca__key_points': paragraphs(null_rate=0.7),
+        'opco__progression': paragraphs(null_rate=0.7),
+        'opco__benefit': paragraphs(null_rate=0.7),
+        'opco__key_points': paragraphs(null_rate=0.7),
+        'benefit': paragraphs(null_rate=0.4),
+        'fo_id': ints(1, 1000, null_rate=0.6),
+        'progression': paragraphs(null_rate=0.4),
+        'summary__content': paragraphs(null_rate=0.2),
+        'collecting_org__progression': paragraphs(null_rate=0.8),
+        'collecting_org__key_points': paragraphs(null_rate=0.8),
+        'key_points': paragraphs(null_rate=0.3),
+        'domain__id': ints(1, 8, null_rate=0.1),
+        'domain__subdomain__id': ints(1, 40, null_rate=0.2),
+        'domain__subdomain__value': choice(SUBDOMAINS + ['finance', 'Stratégie', 'Inconnu'], null_rate=0.2),
+        'domain__value': choice(DOMAINS, null_rate=0.1),
+        'is_opca': bools(null_rate=0.3),
+        'is_opco': bools(null_rate=0.3),
+        'event_preparation_info': paragraphs(null_rate=0.5),
+        'key_ideas_to_share': paragraphs(null_rate=0.5),
+        'retex_of_the_day': paragraphs(null_rate=0.6),
+        'format__value': choice(['Conférence', 'Atelier', 'Table ronde', 'Webinaire'], null_rate=0.2),
+        'make_a_success': paragraphs(null_rate=0.6),
+        'attachment_url': urls('files.apm.fr/expertises', null_rate=0.7),
+        'detailled_educational_program_url': urls('files.apm.fr/programmes', null_rate=0.7),
+        'can_be_remote': bools(null_rate=0.3),
+        'interclub_max_club': ints(1, 10, null_rate=0.6),
+        'voyage': bools(null_rate=0.3),
+        'stats__global_satisfaction': decimals(0, 10, null_rate=0.4),
+        'stats__interest_for_concept': decimals(0, 10, null_rate=0.4),
+        'stats__capacity_for_dialogue': decimals(0, 10, null_rate=0.4),
+        'stats__clarity_of_ideas': decimals(0, 10, null_rate=0.4),
+        'stats__number_of_subscribers_evaluations': ints(0, 2000, null_rate=0.4),
+        'stats__number_of_events': ints(0, 300, null_rate=0.4),
+        'stats__presence_rate': decimals(0, 100, null_rate=0.4),
+        'stats__innovation_source': decimals(0, 10, null_rate=0.4),
+        'DateCreation': dates('2005-01-01', '2025-12-31', 'timestamp', null_rate=0.02),
+        'DateMAJ': dates('2015-01-01', '2025-12-31', 'timestamp', null_rate=0.02),
+    },
+    'dwh.mv_evt': {
+        'pk_evt': keys(),
+        'IdEvt': ints(1, 900000),
+        'IdInter': ints(1, 900000, null_rate=0.3),
+        'Nom': text(WORDS, words=3, null_rate=0.02, dirty_rate=0.01),
+        'IdTypeEvt': ints(1, 12, null_rate=0.02),
+        'TypeEvt': choice(['Rencontre', 'CODEV Apm', 'Autre', 'Université', 'Séminaires réseaux',
+                           "Séminaires d'accueil", 'Tous experts', 'Voyage', 'Interclubs', 'Convention',
+                           'Formation'], null_rate=0.02),
+        'Date': dates('2005-01-01', '2026-12-31', 'minutes', null_rate=0.02),
+        'IdTypePresence': ints(1, 4, null_rate=0.1),
+        'TypePresence': choice(['À distance', 'Présentiel', 'Classique', 'Mixte', 'Hybride'], null_rate=0.1),
+        'DateAnnulation': dates('2005-01-01', '2025-12-31', null_rate=0.9),
+        'IdFormat': ints(1, 6, null_rate=0.2),
+        'Ordre': paragraphs(null_rate=0.5),
+        'Format': choice(['Conférence', 'Atelier', 'Table ronde', 'Webinaire'], null_rate=0.2),
+        'NbAdherents': ints(0, 40, null_rate=0.1),
+        'NbInvites': ints(0, 10, null_rate=0.3),
+        'NbParticipants': ints(0, 50, null_rate=0.1),
+        'NbPresents': ints(0, 50, null_rate=0.2),
+        'NbPresents2': ints(0, 50, null_rate=0.6),
+        'TxPresence': decimals(0, 100, null_rate=0.2),
+        'TxPresence2': decimals(0, 100, null_rate=0.6),
+        'IdStatut': ints(1, 5, null_rate=0.02),
+        'Statut': choice(['Planifié', 'Réalisé', 'Annulé'], null_rate=0.02),
+        'SatisfactionGlobale': decimals(0, 10, null_rate=0.4),
+        'SatisfactionGlobale2': decimals(0, 10, null_rate=0.7),
+        'SatisfactionGlobale3': decimals(0, 10, null_rate=0.8),
+        'NbEvaluations': ints(0, 40, null_rate=0.3),
+        'Adresse': text(STREETS, null_rate=0.3),
+        'Pays': countries(null_rate=0.1),
+        'Region': choice(REGIONS, null_rate=0.1),
+        'LieuEvt': text(CITIES, words=2, null_rate=0.3),
+        'NumDept': ints(1, 96, null_rate=0.3),
+        'Dept': text(CITIES, null_rate=0.3),
+        'Ville': text(CITIES, null_rate=0.2),
+        'ZIP': zip_codes(null_rate=0.3),
+        'IdAnnulation': ints(1, 8, null_rate=0.9),
+        'Annulation': choice(['Météo', 'Intervenant absent', 'Quorum non atteint'], null_rate=0.9),
+        'Timzeone': choice(['Europe/Paris', 'Africa/Casablanca', 'America/Montreal'], null_rate=0.1),
+        'IdModePaiement': ints(1, 4, null_rate=0.5),
+        'ModePaiement': choice(['Virement', 'Carte', 'Chèque'], null_rate=0.5),
+        'Date_Creation': dates('2005-01-01', '2025-12-31', 'timestamptz', null_rate=0.02),
+        'Date_MAJ': dates('2015-01-01', '2025-12-31', 'timestamptz', null_rate=0.02),
+    },
+    'dwh.mv_participation': {
+        'PKParticipation': keys(),
+        'FK_Membre': ints(1, 200000),
+        'email': emails(null_rate=0.05),
+        'FK_Evt': ints(1, 900000),
+        'DateEvt': dates('2005-01-01', '2026-12-31', 'timestamp', null_rate=0.02),
+        'FlagPresent': FLAG,
+        'FlagCandidat': FLAG,
+        'FlagExpert': FLAG,
+        'FlagInvite': FLAG,
+        'FlagAnimateur': FLAG,
+        'FlagPermanent': FLAG,
+        'FlagPresident': FLAG,
+        'FlagAdherent': FLAG,
+        'MotifAnnulation': choice(['Maladie', 'Déplacement', 'null', 'Autre'], null_rate=0.85),
+        'IdAdh': ints(1, 200000, null_rate=0.3),
+        'IdRenc': ints(1, 900000, null_rate=0.2),
+        'DateMAJ': dates('2015-01-01', '2025-12-31', 'timestamp'),
+    },
+    'dwh.mv_sollicitation': {
+        'key': uuids(),
+        'solicitation_status': choice(['accepted', 'declined', 'pending', 'cancelled'], null_rate=0.02),
+        'expert_key': uuids(),
+        'Expert_name': text(LAST_NAMES, null_rate=0.02),
+        'Expert_firstname': text(FIRST_NAMES, null_rate=0.02),
+        'Expert_email': emails(null_rate=0.05),
+        'permanent_key': uuids(),
+        'Perm_name': text(LAST_NAMES, null_rate=0.1),
+        'Perm_firstname': text(FIRST_NAMES, null_rate=0.1),
+        'fk_event': ints(1, 900000, null_rate=0.1),
+        'Evt_id': ints(1, 900000, null_rate=0.1),
+        'renc_id': ints(1, 900000, null_rate=0.2),
+        'title': text(WORDS, words=4, null_rate=0.05),
+        'TypeEvt_id': ints(1, 12, null_rate=0.1),
+        'TypeEvt': choice(['Rencontre', 'Université', 'Voyage', 'Convention'], null_rate=0.1),
+        'Evt_status_id': ints(1, 5, null_rate=0.1),
+        'Evt_status': choice(['Planifié', 'Réalisé', 'Annulé'], null_rate=0.1),
+        'event_date': dates('2005-01-01', '2026-12-31', null_rate=0.1),
+        'intervention_key': uuids(),
+        'exp_response_date': dates('2005-01-01', '2026-12-31', null_rate=0.4),
+        'created': dates('2005-01-01', '2025-12-31', 'timestamp', null_rate=0.05),
+        'updated': dates('2015-01-01', '2025-12-31', 'timestamp', null_rate=0.05),
+    },
+    'dwh.mv_region': {
+        'key': keys(),
+        'reg_id': ints(1, 100),
+        'fk_referent': ints(1, 500, null_rate=0.2),
+        'telreferent': phones(null_rate=0.2),
+        'nomreferent': text(LAST_NAMES, null_rate=0.2),
+        'emailreferent': emails(null_rate=0.2),
+        'prenomreferent': text(FIRST_NAMES, null_rate=0.2),
+        'nom': choice(REGIONS),
+    },
+}
+
+
+#graine propre à chaque table et chaque paquet : une table se génère seule, à l'identique
+def _rng(table, seed, chunk):
+    return np.random.default_rng([seed, chunk, *table.encode('utf-8')])
+
+
+def generate_chunk(table, start, rows, seed=DEFAULT_SEED):
+    rng = _rng(table, seed, start // CHUNK_ROWS)
+    return pd.DataFrame({column: generate(rng, start, rows) for column, generate in TABLES[table].items()})
+
+
+def generate_table(table, rows, seed=DEFAULT_SEED):
+    chunks = [generate_chunk(table, start, min(CHUNK_ROWS, rows - start), seed)
+              for start in range(0, rows, CHUNK_ROWS)]
+    return pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=list(TABLES[table]))
+
+
+#écrit {table}.csv comme le COPY ... CSV HEADER du connecteur (NULL = champ vide)
+def write_table(directory, table, rows, seed=DEFAULT_SEED):
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'{table}.csv')
+    tmp_path = f'{path}.tmp'
+
+    with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+        if rows == 0:
+            f.write(','.join(TABLES[table]) + '\n')
+        for start in range(0, rows, CHUNK_ROWS):
+            chunk = generate_chunk(table, start, min(CHUNK_ROWS, rows - start), seed)
+            chunk.to_csv(f, index=False, header=start == 0)
+
+    os.replace(tmp_path, path)
+    return path
+
+
+#génère les tables manquantes d'un répertoire (un fichier meta.json par taille et graine)
+def ensure_tables(directory, tables, rows, seed=DEFAULT_SEED):
+    meta_path = os.path.join(directory, 'meta.json')
+    meta = {}
+    if os.path.exists(meta_path):
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+
+    if meta.get('rows') != rows or meta.get('seed') != seed:
+        meta = {'rows': rows, 'seed': seed, 'tables': []}
+
+    for table in tables:
+        if table in meta['tables'] and os.path.exists(os.path.join(directory, f'{table}.csv')):
+            continue
+        print(f"génération {table} ({rows} lignes)")
+        write_table(directory, table, rows, seed)
+        meta['tables'].append(table)
+
+        os.makedirs(directory, exist_ok=True)
+        with open(meta_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, indent=2)
+
+    return directory
+
+
+def main():
+    parser = argparse.ArgumentParser(description="génère des exports dwh.mv_* synthétiques")
+    parser.add_argument('directory')
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--tables', nargs='*', choices=sorted(TABLES), default=sorted(TABLES))
+    args = parser.parse_args()
+
+    ensure_tables(args.directory, args.tables, args.rows, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,390 @@
+import argparse
+import gc
+import gzip
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+os.environ["EXPORT_FORMAT"] = "csv"
+
+import export_format
+from export_format import read_export
+
+import import_club_hubdb
+import import_club_object
+import import_contact
+import import_cycle
+import import_event_custom
+import import_event_marketing
+import import_expertises_hubdb
+import import_expertises_object
+import import_participation
+import import_region
+import import_societe
+import import_sollicitation
+
+import generate_data
+
+#benchmark des transformations locales des scripts d'import (lecture de l'export -> fichier produit)
+#sur des exports synthétiques : débit (lignes/s) et pic mémoire (tracemalloc) par transformation,
+#comparés à baseline.json, et sortie comparée aux fichiers de référence de golden/
+#   python benchmarks/run_benchmarks.py --sizes 10000 100000 1000000
+#   python benchmarks/run_benchmarks.py --update-baseline
+#   python benchmarks/run_benchmarks.py --update-golden
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BENCH_DIR, 'data')
+GOLDEN_DIR = os.path.join(BENCH_DIR, 'golden')
+BASELINE_FILE = os.path.join(BENCH_DIR, 'baseline.json')
+
+DEFAULT_SIZES = [10000]
+DEFAULT_TOLERANCE = 0.3
+
+#taille et graine des fichiers de référence : assez de lignes pour couvrir les valeurs parasites
+GOLDEN_ROWS = 1000
+GOLDEN_SEED = 7
+
+#table de sous-domaines hubdb simulée (get_subdomain_mapping)
+SUBDOMAIN_MAPPING = {name.lower(): str(1000 + i) for i, name in enumerate(generate_data.SUBDOMAINS)}
+
+
+#même enchaînement que process_* : colonnes connues de l'export, nettoyage, csv filtré
+def _frame_transform(table, columns, clean, as_text=False):
+    def run(output_path):
+        df = read_export(table, as_text=as_text)
+        df_filtered = df[[col for col in columns if col in df.columns]]
+        df_cleaned = clean(df_filtered)
+        df_cleaned.to_csv(output_path, index=False)
+        return len(df)
+    return run
+
+
+def _contact_transform(file_type):
+    def run(output_path):
+        df = read_export(f'dwh.mv_{file_type}')
+        rows = len(df)
+        import_contact.transform_contacts(df, file_type).to_csv(output_path, index=False)
+        return rows
+    return run
+
+
+#fichier temporaire d'import hubdb recopié comme sortie
+def _hubdb_transform(process_csv_data, prepare_import_file):
+    def run(output_path):
+        data = process_csv_data({})
+        temp_file = prepare_import_file(data)
+        try:
+            temp_file.flush()
+            shutil.copyfile(temp_file.name, output_path)
+        finally:
+            temp_file.close()
+            os.unlink(temp_file.name)
+        return len(data)
+    return run
+
+
+#payload d'événements : une ligne json par événement
+def _write_payload(payload, output_path):
+    with open(output_path, 'w', encoding='utf-8') as f:
+        for event in payload['inputs']:
+            f.write(json.dumps(event, ensure_ascii=False) + '\n')
+
+
+def _event_marketing(output_path):
+    events_data = import_event_marketing.read_csv_data(import_event_marketing.table, max_rows=float('inf'))
+    _write_payload(import_event_marketing.create_hubspot_payload(events_data), output_path)
+    return len(events_data)
+
+
+#lecture par lots de process_all_events_in_batches (chaque lot relit l'export depuis le début)
+def _event_marketing_batches(output_path, batch_size=100):
+    inputs = []
+    start_row = 0
+    while True:
+        events_data = import_event_marketing.read_csv_data(import_event_marketing.table, batch_size, start_row)
+        if not events_data:
+            break
+        inputs.extend(import_event_marketing.create_hubspot_payload(events_data)['inputs'])
+        if len(events_data) < batch_size:
+            break
+        start_row += batch_size
+    _write_payload({'inputs': inputs}, output_path)
+    return start_row + len(events_data)
+
+
+def _participation(output_path):
+    data = import_participation.read_participation_data(import_participation.table)
+    _write_payload(import_participation.create_hubspot_payload(data), output_path)
+    return len(data)
+
+
+def _sollicitation(output_path):
+    data = import_sollicitation.read_solicitation_data(import_sollicitation.table)
+    _write_payload(import_sollicitation.create_hubspot_payload(data), output_path)
+    return len(data)
+
+
+TRANSFORMS = {
+    **{
+        f'import_contact.{file_type}': {
+            'tables': [f'dwh.mv_{file_type}'], 'output': 'csv', 'run': _contact_transform(file_type)
+        }
+        for file_type in import_contact.FILE_TYPES
+    },
+    'import_cycle': {
+        'tables': ['dwh.mv_cycle'], 'output': 'csv',
+        'run': _frame_transform('dwh.mv_cycle', import_cycle.TRANSACTION_COLUMNS,
+                                import_cycle.clean_transaction_data, as_text=True),
+    },
+    'import_societe': {
+        'tables': ['dwh.mv_societe'], 'output': 'csv',
+        'run': _frame_transform('dwh.mv_societe', import_societe.COMPANY_COLUMNS,
+                                import_societe.clean_company_data),
+    },
+    'import_club_object': {
+        'tables': ['dwh.mv_club'], 'output': 'csv',
+        'run': _frame_transform('dwh.mv_club', import_club_object.CLUB_COLUMNS,
+                                import_club_object.clean_club_data),
+    },
+    'import_expertises_object': {
+        'tables': ['dwh.mv_expertise'], 'output': 'csv',
+        'run': _frame_transform('dwh.mv_expertise', import_expertises_object.EXPERTISE_COLUMNS,
+                                import_expertises_object.clean_expertise_data, as_text=True),
+    },
+    'import_event_custom': {
+        'tables': ['dwh.mv_evt'], 'output': 'csv',
+        'run': _frame_transform('dwh.mv_evt', import_event_custom.EVENT_COLUMNS, import_event_custom.clean_data),
+    },
+    'import_expertises_hubdb': {
+        'tables': ['dwh.mv_expertise'], 'output': 'csv',
+        'run': _hubdb_transform(import_expertises_hubdb.process_csv_data,
+                                lambda data: import_expertises_hubdb.prepare_import_file(data, SUBDOMAIN_MAPPING)),
+    },
+    'import_club_hubdb': {
+        'tables': ['dwh.mv_club'], 'output': 'csv',
+        'run': _hubdb_transform(import_club_hubdb.process_csv_data, import_club_hubdb.prepare_import_file),
+    },
+    'import_region': {
+        'tables': ['dwh.mv_region'], 'output': 'csv',
+        'run': _hubdb_transform(import_region.process_csv_data, import_region.prepare_import_file),
+    },
+    'import_event_marketing': {
+        'tables': ['dwh.mv_evt'], 'output': 'jsonl', 'run': _event_marketing,
+    },
+    'import_event_marketing.batches': {
+        'tables': ['dwh.mv_evt'], 'output': 'jsonl', 'run': _event_marketing_batches,
+        'golden': 'import_event_marketing',
+    },
+    'import_participation': {
+        'tables': ['dwh.mv_participation'], 'output': 'jsonl', 'run': _participation,
+    },
+    'import_sollicitation': {
+        'tables': ['dwh.mv_sollicitation'], 'output': 'jsonl', 'run': _sollicitation,
+    },
+}
+
+
+#exécute une transformation, sorties des scripts (print) écartées
+def run_transform(name, output_path):
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        return TRANSFORMS[name]['run'](output_path)
+
+
+#durée sans tracemalloc (qui ralentit les allocations), pic mémoire sur une exécution séparée
+def measure(name, output_path, repeat=1, memory=True):
+    durations = []
+    for _ in range(repeat):
+        gc.collect()
+        start_time = time.perf_counter()
+        rows = run_transform(name, output_path)
+        durations.append(time.perf_counter() - start_time)
+
+    duration = min(durations)
+    result = {
+        'rows': rows,
+        'seconds': round(duration, 3),
+        'rows_per_sec': round(rows / duration, 1) if duration else None,
+    }
+
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            run_transform(name, output_path)
+            result['peak_mb'] = round(tracemalloc.get_traced_memory()[1] / 1024 / 1024, 1)
+        finally:
+            tracemalloc.stop()
+
+    return result
+
+
+def load_baseline(path=BASELINE_FILE):
+    if not os.path.exists(path):
+        return {'tolerance': DEFAULT_TOLERANCE, 'results': {}}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_baseline(baseline, path=BASELINE_FILE):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+#régression : débit plus bas ou pic mémoire plus haut que la référence au-delà de la tolérance
+def regressions(result, reference, tolerance):
+    problems = []
+    if reference.get('rows_per_sec') and result.get('rows_per_sec') is not None:
+        if result['rows_per_sec'] < reference['rows_per_sec'] * (1 - tolerance):
+            problems.append(f"débit {result['rows_per_sec']} < {reference['rows_per_sec']} lignes/s")
+    if reference.get('peak_mb') and result.get('peak_mb') is not None:
+        if result['peak_mb'] > reference['peak_mb'] * (1 + tolerance):
+            problems.append(f"mémoire {result['peak_mb']} > {reference['peak_mb']} Mo")
+    return problems
+
+
+#une transformation peut partager la référence d'une autre (même sortie attendue)
+def golden_path(name):
+    name = TRANSFORMS[name].get('golden', name)
+    return os.path.join(GOLDEN_DIR, f"{name}.{TRANSFORMS[name]['output']}.gz")
+
+
+def _first_difference(expected, actual):
+    expected_lines = expected.decode('utf-8').splitlines()
+    actual_lines = actual.decode('utf-8').splitlines()
+    for i, (expected_line, actual_line) in enumerate(zip(expected_lines, actual_lines)):
+        if expected_line != actual_line:
+            return f"ligne {i + 1}\n  attendu : {expected_line[:300]}\n  obtenu  : {actual_line[:300]}"
+    return f"{len(expected_lines)} lignes attendues, {len(actual_lines)} obtenues"
+
+
+#sortie de chaque transformation sur les données de référence, octet pour octet
+def check_golden(names, work_dir, update=False):
+    data_dir = os.path.join(work_dir, 'golden_data')
+    tables = sorted({table for name in names for table in TRANSFORMS[name]['tables']})
+    generate_data.ensure_tables(data_dir, tables, GOLDEN_ROWS, GOLDEN_SEED)
+    export_format.EXPORT_DIR = data_dir
+
+    failures = []
+    for name in names:
+        output_path = os.path.join(work_dir, f"{name}.{TRANSFORMS[name]['output']}")
+        run_transform(name, output_path)
+        with open(output_path, 'rb') as f:
+            actual = f.read()
+
+        path = golden_path(name)
+        if update and TRANSFORMS[name].get('golden'):
+            continue
+        if update:
+            os.makedirs(GOLDEN_DIR, exist_ok=True)
+            with gzip.GzipFile(path, 'wb', mtime=0) as f:
+                f.write(actual)
+            print(f"référence {name} écrite ({len(actual):,} octets)")
+            continue
+
+        if not os.path.exists(path):
+            print(f"référence {name} absente (--update-golden)")
+            continue
+
+        with gzip.open(path, 'rb') as f:
+            expected = f.read()
+
+        if expected == actual:
+            print(f"référence {name} : identique")
+        else:
+            print(f"référence {name} : DIFFÉRENTE, {_first_difference(expected, actual)}")
+            failures.append(name)
+
+    return failures
+
+
+def run_benchmarks(names, sizes, data_dir, work_dir, repeat=1, memory=True):
+    results = {}
+    for size in sizes:
+        size_dir = os.path.join(data_dir, str(size))
+        tables = sorted({table for name in names for table in TRANSFORMS[name]['tables']})
+        generate_data.ensure_tables(size_dir, tables, size)
+        export_format.EXPORT_DIR = size_dir
+
+        results[str(size)] = {}
+        for name in names:
+            output_path = os.path.join(work_dir, f"{name}.{TRANSFORMS[name]['output']}")
+            result = measure(name, output_path, repeat, memory)
+            results[str(size)][name] = result
+            print(f"{size:>9} {name:<32} {result['seconds']:>9.3f}s {result['rows_per_sec'] or 0:>12.1f} lignes/s"
+                  f" {result.get('peak_mb', float('nan')):>9.1f} Mo")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="benchmark des transformations des scripts d'import")
+    parser.add_argument('--sizes', nargs='+', type=int, default=DEFAULT_SIZES,
+                        help="nombres de lignes des exports synthétiques (ex: 10000 100000 1000000)")
+    parser.add_argument('--only', nargs='+', choices=sorted(TRANSFORMS), default=sorted(TRANSFORMS))
+    parser.add_argument('--repeat', type=int, default=1, help="exécutions chronométrées, la plus rapide est gardée")
+    parser.add_argument('--no-memory', action='store_true', help="sans mesure du pic mémoire")
+    parser.add_argument('--tolerance', type=float, default=None, help="écart toléré avec baseline.json (0.3 = 30%%)")
+    parser.add_argument('--data-dir', default=DATA_DIR, help="cache des exports synthétiques")
+    parser.add_argument('--output', help="résultats en json")
+    parser.add_argument('--update-baseline', action='store_true')
+    parser.add_argument('--update-golden', action='store_true')
+    parser.add_argument('--skip-golden', action='store_true')
+    parser.add_argument('--golden-only', action='store_true')
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='bench_')
+    failed = False
+
+    try:
+        if not args.skip_golden or args.update_golden:
+            failures = check_golden(args.only, work_dir, update=args.update_golden)
+            failed = bool(failures)
+
+        if args.golden_only or (args.update_golden and not args.update_baseline):
+            sys.exit(1 if failed else 0)
+
+        results = run_benchmarks(args.only, args.sizes, args.data_dir, work_dir, args.repeat, not args.no_memory)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    baseline = load_baseline()
+
+    if args.update_baseline:
+        for size, size_results in results.items():
+            baseline['results'].setdefault(size, {}).update({
+                name: {'rows_per_sec': result['rows_per_sec'], 'peak_mb': result.get('peak_mb')}
+                for name, result in size_results.items()
+            })
+        save_baseline(baseline)
+        print(f"baseline mise à jour : {BASELINE_FILE}")
+        sys.exit(1 if failed else 0)
+
+    tolerance = args.tolerance if args.tolerance is not None else baseline.get('tolerance', DEFAULT_TOLERANCE)
+    for size, size_results in results.items():
+        for name, result in size_results.items():
+            reference = baseline['results'].get(size, {}).get(name)
+            if not reference:
+                print(f"pas de baseline pour {name} à {size} lignes")
+                continue
+            problems = regressions(result, reference, tolerance)
+            if problems:
+                failed = True
+                print(f"RÉGRESSION {name} à {size} lignes : {', '.join(problems)}")
+
+    print("échec" if failed else "ok")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+import json
+import os
+
+import pandas as pd
+
+import run_report
+import state_store
+from export_manifest import load_manifest
+
+#empreinte de chaque ligne transformée envoyée à hubspot (clé -> hash), par entité,
+#conservée dans la table row_hashes du state store
+#seules les lignes nouvelles ou modifiées depuis le dernier import réussi sont renvoyées
+#anciens snapshots json, lus seulement pour la migration
+SNAPSHOT_DIR = '/root/apm/infocentre/apm-export-tables-back/state/snapshots'
+
+
+def snapshot_path(entity):
+    return os.path.join(SNAPSHOT_DIR, f'{entity}.json')
+
+
+def load_snapshot(entity):
+    snapshot = state_store.get_row_hashes(entity)
+    if snapshot:
+        return snapshot
+
+    #migration : reprise de l'ancien snapshot json de l'entité
+    path = snapshot_path(entity)
+    if not os.path.exists(path):
+        return {}
+
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"snapshot illisible {path}: {e}")
+        return {}
+
+    state_store.replace_row_hashes(entity, snapshot)
+    print(f"snapshot {entity} migré depuis {path}")
+    return snapshot
+
+
+#à appeler seulement une fois l'import hubspot terminé (hubspot_client.wait_for_import_errors)
+#lignes rejetées : ancien hash gardé, ou clé retirée si la ligne était nouvelle, pour qu'elles seules soient renvoyées
+def save_snapshot(entity, snapshot, rejected_keys=()):
+    if rejected_keys:
+        previous = load_snapshot(entity)
+        snapshot = dict(snapshot)
+        for key in rejected_keys:
+            if key in previous:
+                snapshot[key] = previous[key]
+            else:
+                snapshot.pop(key, None)
+
+    state_store.replace_row_hashes(entity, snapshot)
+
+
+#clés des lignes rejetées par hubspot, lues dans les valeurs de la ligne du fichier envoyé
+#None si une erreur ne désigne pas de ligne du fichier
+def rejected_keys(errors, csv_path, key_column):
+    columns = list(pd.read_csv(csv_path, nrows=0).columns)
+    key_index = columns.index(key_column)
+    keys = set()
+
+    for error in errors:
+        row = (error.get('sourceData') or {}).get('rowData') or []
+        if key_index >= len(row):
+            return None
+        keys.add(str(row[key_index]))
+
+    return keys
+
+
+#fin d'un import : errors = lignes rejetées par hubspot, None si l'import a échoué
+#le snapshot est enregistré sans les lignes rejetées, True si toutes les lignes ont été importées
+def commit_import(entity, snapshot, errors, csv_path, key_column):
+    if errors is None:
+        return False
+
+    keys = rejected_keys(errors, csv_path, key_column)
+    if keys is None:
+        print(f"{entity} : lignes rejetées non identifiées, snapshot non enregistré")
+        return False
+
+    save_snapshot(entity, snapshot, keys)
+    if keys:
+        print(f"{entity} : {len(keys)} lignes rejetées par hubspot, renvoyées au prochain run")
+    return not errors
+
+
+#FULL_UPLOAD=1 (--full-upload du connecteur) : tout renvoyer et reconstruire les snapshots
+def full_upload():
+    return os.getenv("FULL_UPLOAD", "0") == "1"
+
+
+#export incrémental : l'export ne contient que les lignes modifiées, pas de suppression déductible
+def export_is_partial(table):
+    return load_manifest().get(table, {}).get('mode') == 'incremental'
+
+
+def row_hashes(df):
+    values = df.fillna('').astype(str)
+    return pd.util.hash_pandas_object(values, index=False).map('{:016x}'.format)
+
+
+#compare les lignes transformées au snapshot de l'entité
+#retourne (lignes nouvelles ou modifiées, nouveau snapshot)
+#les clés supprimées sortent seulement du snapshot : rien n'est supprimé dans hubspot (hors périmètre)
+def detect_changes(entity, df, key_column, partial=False):
+    previous = load_snapshot(entity)
+
+    #export vide : rien à envoyer, et pas de suppression déduite d'un export probablement en erreur
+    if df.empty or key_column not in df.columns:
+        return df, previous
+
+    keys = df[key_column].fillna('').astype(str)
+    hashes = row_hashes(df)
+
+    if partial:
+        snapshot = dict(previous)
+        snapshot.update(zip(keys, hashes))
+        deleted_keys = []
+    else:
+        snapshot = dict(zip(keys, hashes))
+        deleted_keys = sorted(set(previous) - set(snapshot))
+
+    previous_hashes = keys.map(previous)
+    new_mask = previous_hashes.isna()
+    changed_mask = ~new_mask & (previous_hashes != hashes)
+
+    if full_upload():
+        df_changed = df
+    else:
+        df_changed = df[(new_mask | changed_mask).values]
+
+    print(f"{entity} : {int(new_mask.sum())} nouvelles, {int(changed_mask.sum())} modifiées, "
+          f"{len(deleted_keys)} supprimées, {len(df) - int(new_mask.sum()) - int(changed_mask.sum())} inchangées")
+    run_report.record('diff', entity, rows=len(df), new=int(new_mask.sum()), changed=int(changed_mask.sum()),
+                      deleted=len(deleted_keys), uploaded=len(df_changed))
+
+    return df_changed, snapshot
+
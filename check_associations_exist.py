@@ -1,57 +1,56 @@
-import pandas as pd
 import os
+from export_format import read_export
 
 CONFIGURATIONS = [
     #event-club
     {
         'nom': 'Event-Club',
-        'table_association': 'dwh.event_club.csv',
+        'table_association': 'dwh.event_club',
         'cle_gauche': 'event_key',
         'cle_droite': 'club_key',
-        'table_gauche': 'dwh.mv_evt.csv',
+        'table_gauche': 'dwh.mv_evt',
         'colonne_gauche': 'pk_evt',
-        'table_droite': 'dwh.mv_club.csv',
+        'table_droite': 'dwh.mv_club',
         'colonne_droite': 'PKClub'
     },
     
     #event-expert
     {
         'nom': 'Event-Expert',
-        'table_association': 'dwh.event_expert.csv',
+        'table_association': 'dwh.event_expert',
         'cle_gauche': 'event_key',
         'cle_droite': 'expert_key',
-        'table_gauche': 'dwh.mv_evt.csv',
+        'table_gauche': 'dwh.mv_evt',
         'colonne_gauche': 'pk_evt',
-        'table_droite': 'dwh.mv_expert.csv',
+        'table_droite': 'dwh.mv_expert',
         'colonne_droite': 'PKExpert'  
     },
     
     #event-expertise
     {
         'nom': 'Event-Expertise',
-        'table_association': 'dwh.event_expertise.csv',
+        'table_association': 'dwh.event_expertise',
         'cle_gauche': 'event_key',
         'cle_droite': 'expertise_key',
-        'table_gauche': 'dwh.mv_evt.csv',
+        'table_gauche': 'dwh.mv_evt',
         'colonne_gauche': 'pk_evt',
-        'table_droite': 'dwh.mv_expertise.csv',
+        'table_droite': 'dwh.mv_expertise',
         'colonne_droite': 'PKExpertise'
     },
     
     #expert-expertise
     {
         'nom': 'Expert-Expertise',
-        'table_association': 'dwh.expert_expertise.csv',
+        'table_association': 'dwh.expert_expertise',
         'cle_gauche': 'expertise_key',
         'cle_droite': 'expert_key',
-        'table_gauche': 'dwh.mv_expert.csv',
+        'table_gauche': 'dwh.mv_expert',
         'colonne_gauche': 'PKExpert',  
-        'table_droite': 'dwh.mv_expertise.csv',
+        'table_droite': 'dwh.mv_expertise',
         'colonne_droite': 'PKExpertise'
     }
 ]
 
-BASE_PATH = '/root/apm/infocentre/apm-export-tables-back/exports/'
 FILTERED_PATH = '/root/apm/infocentre/apm-export-tables-back/filtered/'
 
 def check_associations():
@@ -60,15 +59,22 @@ def check_associations():
     
     resultats_globaux = []
     
+    #chaque export n'est lu qu'une fois (dwh.mv_evt sert à trois vérifications)
+    exports_charges = {}
+    def charger(table):
+        if table not in exports_charges:
+            exports_charges[table] = read_export(table)
+        return exports_charges[table]
+    
     for i, config in enumerate(CONFIGURATIONS, 1):
         print(f"\n{config['nom']}")
         print("-" * 50)
         
         try:
             #charger les fichiers
-            association = pd.read_csv(os.path.join(BASE_PATH, config['table_association']))
-            table_gauche = pd.read_csv(os.path.join(BASE_PATH, config['table_gauche']))
-            table_droite = pd.read_csv(os.path.join(BASE_PATH, config['table_droite']))
+            association = read_export(config['table_association'])
+            table_gauche = charger(config['table_gauche'])
+            table_droite = charger(config['table_droite'])
             
             print(f"Fichiers chargés:")
             print(f"  - Association: {len(association)} lignes")
@@ -109,7 +115,7 @@ def check_associations():
             ]
             
             #sauvegarder le fichier filtré
-            nom_fichier_filtre = config['table_association']
+            nom_fichier_filtre = f"{config['table_association']}.csv"
             chemin_filtre = os.path.join(FILTERED_PATH, nom_fichier_filtre)
             
             print(f"Sauvegarde vers: {chemin_filtre}")
@@ -160,5 +166,8 @@ def check_associations():
         else:
             print(f"\n{resultat['nom']}: {resultat['erreur']}")
 
-if __name__ == "__main__":
+def main():
     check_associations()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+
+#transformations colonne par colonne des exports (remplacent les boucles iterrows des scripts)
+#chaque fonction reproduit exactement ce que voyait la boucle : valeur de la cellule,
+#"" pour une cellule nulle, test "if value" pour les cellules vides ou à zéro
+#les conversions sont faites une fois par valeur distincte puis répercutées sur les lignes :
+#les exports répètent énormément les mêmes valeurs (pays, booléens, statuts, dates)
+
+
+#applique convert_values aux valeurs distinctes (objets python) et null_value aux cellules nulles
+def on_distinct(series, convert_values, null_value=""):
+    codes, uniques = pd.factorize(series)
+    converted = list(convert_values(np.asarray(uniques, dtype=object)))
+    converted.append(null_value)
+
+    #code -1 (cellule nulle) : dernière valeur du tableau
+    result = np.empty(len(converted), dtype=object)
+    result[:] = converted
+    return pd.Series(result[codes], index=series.index, dtype=object)
+
+
+#conversion valeur par valeur, une cellule nulle étant vue comme ""
+def map_distinct(series, convert):
+    return on_distinct(series, lambda values: [convert(value) for value in values], convert(""))
+
+
+#str(value) des cellules renseignées (ni nulles, ni vides, ni à zéro), "" pour les autres
+def cell_text(series, strip=False):
+    if strip:
+        return on_distinct(series, lambda values: [str(value).strip() if value else "" for value in values])
+    return on_distinct(series, lambda values: [str(value) if value else "" for value in values])
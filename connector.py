@@ -1,6 +1,8 @@
 import time
 from dotenv import load_dotenv
 import psycopg2
+from psycopg2.pool import ThreadedConnectionPool
+from concurrent.futures import ThreadPoolExecutor
 import os
 import csv
 from datetime import datetime
@@ -9,6 +11,14 @@ import subprocess
 import sys
 import shutil
 import requests
+import argparse
+from scheduler import run_dag
+from export_manifest import MANIFEST_FILE, ExportWriter, failed_entries, load_manifest, write_manifest
+from export_format import export_format, write_parquet
+from watermarks import load_watermarks, save_watermarks, needs_full_export
+from warm_worker import WarmPool
+import run_report
+import run_state
 
 load_dotenv()
 
@@ -22,20 +32,26 @@ PASSWORD = os.getenv("PASSWORD")
 
 SLACK_WEBHOOK_URL = os.getenv("SLACK_WEBHOOK_URL")
 
+#nombre de scripts exécutés en parallèle
+MAX_WORKERS = int(os.getenv("MAX_WORKERS", 4))
+
+#nombre d'exports simultanés (taille du pool de connexions postgresql)
+EXPORT_WORKERS = int(os.getenv("EXPORT_WORKERS", 1))
+
+#format des fichiers d'export : "csv" ou "parquet" (typé, lu par read_export dans les scripts)
+EXPORT_FORMAT = os.getenv("EXPORT_FORMAT", "csv")
+
+#"subprocess" : un interpréteur python par script, "inprocess" : workers gardés chauds
+EXECUTION_MODE = os.getenv("EXECUTION_MODE", "subprocess")
+
 #config
 with open("/root/apm/infocentre/apm-export-tables-back/tables.yaml") as f:
     config = yaml.safe_load(f)
 
 databases = config["tables"]
 
-#postgresql
-conn = psycopg2.connect(
-    host=HOST,
-    port=PORT,
-    database=DATABASE,
-    user=USERNAME,
-    password=PASSWORD
-)
+#tables exportées en incrémental : {table: {watermark, key, full_every_days}}
+INCREMENTAL_TABLES = config.get("incremental") or {}
 
 chemin_export = '/root/apm/infocentre/apm-export-tables-back/exports'
 
@@ -54,19 +70,32 @@ IMPORT_SCRIPTS = {
     #'dwh.mv_participation': ["/root/apm/infocentre/apm-export-tables-back/import_participation.py"]
 }
 
-#dictionnaire pour les scripts d'associations
+#scripts d'associations : association_engine.py crée tous les types d'associations
+#(les pk de chaque type d'objet ne sont résolues qu'une fois pour tous les fichiers)
 ASSOCIATION_SCRIPTS = [
-    '/root/apm/infocentre/apm-export-tables-back/associations_event_club.py',
-    '/root/apm/infocentre/apm-export-tables-back/associations_event_expert.py',
-    '/root/apm/infocentre/apm-export-tables-back/associations_event_expertise.py',
-    '/root/apm/infocentre/apm-export-tables-back/associations_expert_expertise.py'
+    '/root/apm/infocentre/apm-export-tables-back/association_engine.py'
 ]
 
-def clean_exports_directory():
-    if os.path.exists(chemin_export):
-        shutil.rmtree(chemin_export)
+ASSOCIATION_CHECK_SCRIPT = '/root/apm/infocentre/apm-export-tables-back/check_associations_exist.py'
+
+#dépendances entre les étapes (nom du script + arguments)
+#les étapes sans entrée ne dépendent que des exports
+STEP_DEPENDENCIES = {
+    'association_engine.py': ['check_associations_exist.py', 'import_club_object.py', 'import_contact.py expert',
+                              'import_event_custom.py', 'import_expertises_object.py'],
+}
+
+#les exports du run précédent (ceux de son manifeste) restent en place : un export en échec
+#laisse aux imports le fichier précédent, complet, au lieu de rien ou d'un fichier partiel
+def clean_exports_directory(previous_manifest=None):
+    keep = {f"{table}.{entry.get('format', 'csv')}" for table, entry in (previous_manifest or {}).items()}
+    keep.add(os.path.basename(MANIFEST_FILE))
     
     os.makedirs(chemin_export, exist_ok=True)
+    for name in os.listdir(chemin_export):
+        path = os.path.join(chemin_export, name)
+        if name not in keep and os.path.isfile(path):
+            os.remove(path)
     
     filtered_dir = 'apm/infocentre/apm-export-tables-back/filtered'
     if os.path.exists(filtered_dir):
@@ -74,48 +103,140 @@ def clean_exports_directory():
     
     os.makedirs(filtered_dir, exist_ok=True)
 
-def export(database):
-    fichier_csv = os.path.join(chemin_export, f'{database}.csv')  
-    # Créer une nouvelle connexion pour chaque export
+#connexion postgresql, jamais ouverte à l'import : les workers chauds (spawn) réimportent ce module
+def open_connection():
+    return psycopg2.connect(
+        host=HOST,
+        port=PORT,
+        database=DATABASE,
+        user=USERNAME,
+        password=PASSWORD
+    )
+
+#requête d'export : complète, ou limitée aux lignes modifiées depuis le dernier watermark
+#retourne (requête, mode, nouveau watermark)
+def build_export_query(cur, database, watermarks, force_full=False):
+    incremental = INCREMENTAL_TABLES.get(database)
+    if not incremental:
+        return f"SELECT * FROM {database}", 'full', None
+    
+    watermark_column = incremental['watermark']
+    key_column = incremental['key']
+    state = watermarks.get(database)
+    
+    cur.execute(f'SELECT MAX("{watermark_column}")::text FROM {database}')
+    new_watermark = cur.fetchone()[0]
+    
+    if force_full or needs_full_export(state, incremental.get('full_every_days', 7)):
+        return f"SELECT * FROM {database}", 'full', new_watermark
+    
+    #>= : les lignes arrivées depuis avec la valeur exacte du watermark sont reprises
+    #IS NULL : les lignes sans valeur de watermark ne seraient jamais couvertes par la comparaison
+    #les lignes renvoyées en double sont écartées par clé à l'import (snapshot des lignes, clés déjà envoyées)
+    query = cur.mogrify(
+        f'SELECT * FROM {database} WHERE "{watermark_column}" >= %s OR "{watermark_column}" IS NULL '
+        f'ORDER BY "{key_column}"',
+        (state['watermark'],)
+    ).decode('utf-8')
+    return query, 'incremental', new_watermark
+
+def export(database, pool=None, watermarks=None, force_full=False):
+    fmt = export_format()
+    fichier_export = os.path.join(chemin_export, f'{database}.{fmt}')  
+    #écrit à côté puis renommé : le fichier précédent n'est remplacé que par un export complet
+    fichier_temp = f'{fichier_export}.tmp'
+    conn_local = None
+    start_time = time.time()
+    
+    #reprise : export déjà terminé dans ce run
+    done = run_state.completed_export(database, fichier_export)
+    if done:
+        print(f"export déjà fait : {fichier_export} ({done['rows']} lignes)")
+        run_report.record('export', database, status='skipped', rows=done['rows'], duration=0)
+        return done
+    
+    # connexion prise dans le pool si fourni, sinon nouvelle connexion pour cet export
     try:
-        conn_local = psycopg2.connect(
-            host=HOST,
-            port=PORT,
-            database=DATABASE,
-            user=USERNAME,
-            password=PASSWORD
-        )
+        conn_local = pool.getconn() if pool else open_connection()
+        conn_local.set_client_encoding('UTF8')
+        #même snapshot pour le calcul du watermark et le COPY
+        conn_local.set_session(isolation_level='REPEATABLE READ', readonly=True)
         
         cur = conn_local.cursor()
-        copy_query = f"COPY (SELECT * FROM {database}) TO STDOUT WITH CSV HEADER"
-        
-        with open(fichier_csv, 'w', encoding='utf-8') as f:
-            cur.copy_expert(copy_query, f)
+        select_query, mode, new_watermark = build_export_query(cur, database, watermarks or {}, force_full)
         
-        cur.execute(f"SELECT COUNT(*) FROM {database}")
-        total_rows = cur.fetchone()[0]
+        if fmt == 'parquet':
+            #fichier typé selon les colonnes postgresql, lu en flux par un curseur serveur
+            total_rows, total_bytes, sha256 = write_parquet(conn_local, select_query, fichier_temp)
+        else:
+            copy_query = f"COPY ({select_query}) TO STDOUT WITH CSV HEADER"
+            
+            #comptage des lignes et empreinte calculés pendant l'écriture du flux
+            with open(fichier_temp, 'wb') as f:
+                writer = ExportWriter(f)
+                cur.copy_expert(copy_query, writer)
+            
+            total_rows, total_bytes, sha256 = writer.rows(), writer.bytes, writer.hexdigest()
         
-        print(f"export : {fichier_csv} ({total_rows} lignes)")
+        os.replace(fichier_temp, fichier_export)
+        print(f"export : {fichier_export} ({total_rows} lignes, {mode})")
         
-        conn_local.close()  
-        return True
+        cur.close()
+        conn_local.rollback()
+        run_report.record('export', database, status='ok', mode=mode, format=fmt, rows=total_rows,
+                          bytes=total_bytes, duration=round(time.time() - start_time, 3))
+        result = {
+            'mode': mode,
+            'format': fmt,
+            'watermark': new_watermark,
+            'rows': total_rows,
+            'bytes': total_bytes,
+            'sha256': sha256,
+            'duration': round(time.time() - start_time, 3),
+            'exported_at': datetime.now().isoformat(timespec='seconds')
+        }
+        run_state.mark_export(database, result)
+        return result
 
     except Exception as e:
         print(f"erreur lors de l'export de {database} : {e}")
-        if 'conn_local' in locals():
-            conn_local.close()
-        return False
+        run_report.record('export', database, status='error', error=str(e),
+                          duration=round(time.time() - start_time, 3))
+        if os.path.exists(fichier_temp):
+            os.remove(fichier_temp)
+        return None
+
+    finally:
+        if conn_local is not None:
+            if pool:
+                pool.putconn(conn_local)
+            else:
+                conn_local.close()
 
-def export_all_tables():
-    print("début des exports...")
-    success_count = 0
-    failed_tables = []
+def export_all_tables(workers=EXPORT_WORKERS, previous_manifest=None, force_full=False):
+    print(f"début des exports ({workers} en parallèle)...")
+    tables = list(databases.values())
+    watermarks = load_watermarks()
     
-    for name, table in databases.items():
-        if export(table):
-            success_count += 1
-        else:
-            failed_tables.append(table)
+    if workers > 1:
+        #plusieurs COPY en parallèle sur un pool de connexions
+        pool = ThreadedConnectionPool(1, workers, host=HOST, port=PORT, database=DATABASE, user=USERNAME, password=PASSWORD)
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(lambda table: export(table, pool, watermarks, force_full), tables))
+        finally:
+            pool.closeall()
+    else:
+        results = [export(table, watermarks=watermarks, force_full=force_full) for table in tables]
+    
+    success_count = sum(1 for result in results if result)
+    failed_tables = [table for table, result in zip(tables, results) if not result]
+    
+    entries = {table: result for table, result in zip(tables, results) if result}
+    entries.update(failed_entries(failed_tables, previous_manifest, chemin_export))
+    manifest = write_manifest(entries, previous_manifest)
+    unchanged_count = sum(1 for entry in manifest.values() if entry['unchanged'])
+    print(f"tables inchangées depuis le dernier export : {unchanged_count}")
     
     print(f"exports terminés : {success_count}/{len(databases)} réussis")
     
@@ -125,67 +246,67 @@ def export_all_tables():
     # Continuer même si certains exports échouent
     return success_count, failed_tables
 
-def run_import_script(script_command, table_name):
+#exécute un script dans un sous-processus, ou dans un worker chaud si un pool est fourni
+#retourne (succès, message d'erreur)
+def execute_script(script_command, pool=None):
+    #séparer la commande et les arguments
+    parts = script_command.split()
+    script_file = parts[0]
+    args = parts[1:] if len(parts) > 1 else []
+    
+    if pool:
+        module_name = os.path.splitext(os.path.basename(script_file))[0]
+        if pool.run(module_name, args):
+            return True, ""
+        return False, "échec dans le worker (voir la sortie ci-dessus)"
+    
+    result = subprocess.run([sys.executable, script_file] + args, 
+                          capture_output=True, text=True)
+    return result.returncode == 0, result.stderr
+
+def run_import_script(script_command, table_name, pool=None):
     #exécute un script d'import
     try:
         print(f"import de {table_name} en cours...")
         
-        #séparer la commande et les arguments
-        parts = script_command.split()
-        script_file = parts[0]
-        args = parts[1:] if len(parts) > 1 else []
-        
-        result = subprocess.run([sys.executable, script_file] + args, 
-                              capture_output=True, text=True)
+        success, error = execute_script(script_command, pool)
         
-        if result.returncode == 0:
+        if success:
             print(f"import {table_name} réussi")
             return True
         else:
-            print(f"erreur import {table_name}: {result.stderr}")
+            print(f"erreur import {table_name}: {error}")
             return False
             
     except Exception as e:
         print(f"erreur lors de l'exécution de l'import {table_name}: {e}")
         return False
 
-def run_all_imports():
-    print("début des imports...")
-    success_count = 0    
-    total_scripts = sum(len(scripts) if isinstance(scripts, list) else 1 for scripts in IMPORT_SCRIPTS.values())
-    current_script = 0
+#nom d'une étape : nom du script suivi de ses arguments
+def step_name(script_command):
+    parts = script_command.split()
+    return ' '.join([os.path.basename(parts[0])] + parts[1:])
+
+#liste des étapes d'import dont le CSV a bien été exporté
+def build_import_steps():
+    import_steps = {}
     skipped_count = 0
-    
+
     for table_name, scripts in IMPORT_SCRIPTS.items():
-        csv_file = os.path.join(chemin_export, f'{table_name}.csv')
-        if not os.path.exists(csv_file):
-            print(f"fichier CSV manquant : {csv_file} - IGNORÉ")
-            #compter les scripts ignorés
-            scripts_count = len(scripts) if isinstance(scripts, list) else 1
-            skipped_count += scripts_count
-            current_script += scripts_count
+        if not isinstance(scripts, list):
+            scripts = [scripts]
+
+        export_file = os.path.join(chemin_export, f'{table_name}.{export_format()}')
+        if not os.path.exists(export_file):
+            print(f"fichier d'export manquant : {export_file} - IGNORÉ")
+            skipped_count += len(scripts)
             continue
-        
-        if isinstance(scripts, list):
-            for script_command in scripts:
-                current_script += 1
-                if run_import_script(script_command, f"{table_name} ({script_command})"):
-                    success_count += 1
-                
-                if current_script < total_scripts:
-                    print(f"attente de 1 mn avant le prochain import... ")
-                    time.sleep(60)
-        else:
-            current_script += 1
-            if run_import_script(scripts, table_name):
-                success_count += 1
-            
-            if current_script < total_scripts:
-                print(f"attente de 1 mn avant le prochain import...")
-                time.sleep(60)
-    
+
+        for script_command in scripts:
+            import_steps[step_name(script_command)] = (script_command, f"{table_name} ({script_command})")
+
     print(f"scripts ignorés (fichiers manquants) : {skipped_count}")
-    return success_count, total_scripts - skipped_count
+    return import_steps
 
 def send_log_slack(message):
     try:
@@ -194,88 +315,195 @@ def send_log_slack(message):
     except:
         print("Erreur envoi Slack")
 
-def run_association_check():
+def run_association_check(pool=None):
     try:
         print("vérification des associations en cours...")
         
-        result = subprocess.run([sys.executable, '/root/apm/infocentre/apm-export-tables-back/check_associations_exists.py'], 
-                              capture_output=True, text=True)
+        success, error = execute_script(ASSOCIATION_CHECK_SCRIPT, pool)
         
-        if result.returncode == 0:
+        if success:
             print("vérification des associations réussie")
             return True
         else:
-            print(f"erreur lors de la vérification des associations: {result.stderr}")
+            print(f"erreur lors de la vérification des associations: {error}")
             return False
             
     except Exception as e:
         print(f"erreur : {e}")
         return False
 
-def run_association_scripts():
-    print("début des scripts d'associations...")
-    success_count = 0
-    total_scripts = len(ASSOCIATION_SCRIPTS)
-    
-    for i, script_path in enumerate(ASSOCIATION_SCRIPTS):
-        try:
-            script_name = os.path.basename(script_path)
-            print(f"exécution de {script_name}...")
-            
-            result = subprocess.run([sys.executable, script_path], 
-                                  capture_output=True, text=True)
-            
-            if result.returncode == 0:
-                print(f"script {script_name} réussi")
-                success_count += 1
-            else:
-                print(f"erreur dans {script_name}: {result.stderr}")
+def run_association_script(script_path, pool=None):
+    try:
+        script_name = os.path.basename(script_path)
+        print(f"exécution de {script_name}...")
+        
+        success, error = execute_script(script_path, pool)
+        
+        if success:
+            print(f"script {script_name} réussi")
+            return True
+        else:
+            print(f"erreur dans {script_name}: {error}")
+            return False
             
-            #pause entre les scripts 
-            if i < total_scripts - 1:
-                print("Attente de 1 minute avant le prochain script d'association...")
-                time.sleep(60)
-                
-        except Exception as e:
-            print(f"Erreur lors de l'exécution de {script_path}: {e}")
+    except Exception as e:
+        print(f"Erreur lors de l'exécution de {script_path}: {e}")
+        return False
+
+#lance les imports, la vérification et les associations selon leurs dépendances
+def run_all_steps(with_associations=True, max_workers=MAX_WORKERS, execution_mode=EXECUTION_MODE):
+    print(f"début des imports ({max_workers} en parallèle, mode {execution_mode})...")
+    import_steps = build_import_steps()
+
+    association_steps = {}
+    check_step = step_name(ASSOCIATION_CHECK_SCRIPT)
+    if with_associations:
+        association_steps = {step_name(script): script for script in ASSOCIATION_SCRIPTS}
+
+    steps = list(import_steps)
+    if with_associations:
+        steps += [check_step] + list(association_steps)
+
+    #workers chauds : pandas, requests et les modules des scripts ne sont chargés qu'une fois
+    pool = None
+    if execution_mode == "inprocess":
+        module_names = sorted(set(step.split()[0][:-3] for step in steps))
+        pool = WarmPool(module_names, max_workers)
+
+    def run_step(step):
+        #reprise : étape déjà réussie dans ce run
+        if run_state.step_done(step):
+            print(f"{step} déjà fait, ignoré")
+            run_report.record('step', step, status='skipped', duration=0)
+            return True
+
+        with run_report.timed('step', step) as fields:
+            success = execute_step(step)
+            fields['status'] = 'ok' if success else 'error'
+
+        if success:
+            run_state.mark_step(step)
+        return success
+
+    def execute_step(step):
+        if step in import_steps:
+            script_command, label = import_steps[step]
+            return run_import_script(script_command, label, pool)
+        if step == check_step:
+            return run_association_check(pool)
+        return run_association_script(association_steps[step], pool)
+
+    try:
+        #la vérification part une fois tous les imports terminés (réussis ou non), comme avant le parallélisme
+        #les scripts d'import attendent la fin du traitement hubspot de leurs imports
+        after = {check_step: list(import_steps)}
+        results = run_dag(steps, STEP_DEPENDENCIES, run_step, max_workers, after=after)
+    finally:
+        if pool:
+            pool.shutdown()
+
+    success_imports = sum(1 for step in import_steps if results.get(step))
+    association_check_success = bool(results.get(check_step))
+    association_success = sum(1 for step in association_steps if results.get(step))
+
+    if with_associations:
+        if association_check_success:
+            print(f"Scripts d'associations terminés: {association_success}/{len(association_steps)} réussis")
+        else:
+            print("Échec de la vérification des associations - scripts d'associations ignorés")
+
+    return success_imports, len(import_steps), association_success, len(association_steps), results
+
+#avance les watermarks des exports incrémentaux dont tous les imports ont réussi
+#(sinon les lignes modifiées seront réexportées au prochain run)
+def commit_watermarks(step_results):
+    manifest = load_manifest()
+    updates = {}
+    
+    for table in INCREMENTAL_TABLES:
+        entry = manifest.get(table)
+        if not entry or not entry.get('watermark'):
+            continue
+        #fichier d'un run précédent, export en échec dans ce run
+        if entry.get('stale'):
+            print(f"watermark de {table} non avancé (export en échec)")
+            continue
+        
+        scripts = IMPORT_SCRIPTS.get(table, [])
+        if not isinstance(scripts, list):
+            scripts = [scripts]
+        #table sans script d'import : personne n'a consommé les lignes exportées
+        if not scripts:
+            print(f"watermark de {table} non avancé (aucun import)")
+            continue
+        if not all(step_results.get(step_name(script)) for script in scripts):
+            print(f"watermark de {table} non avancé (import en échec)")
+            continue
+        
+        updates[table] = {'watermark': entry['watermark']}
+        if entry.get('mode') == 'full':
+            updates[table]['last_full'] = entry['exported_at']
     
-    print(f"Scripts d'associations terminés: {success_count}/{total_scripts} réussis")
-    return success_count, total_scripts
+    save_watermarks(updates)
+    return updates
 
+#lignes du message slack : étapes les plus lentes et débit par entité
+def format_report_summary(summary):
+    lines = []
 
-def main():
+    if summary['slowest']:
+        lines.append("Étapes les plus lentes :")
+        for entry in summary['slowest']:
+            lines.append(f"  {entry['name']} ({entry['phase']}) : {entry['duration']}s")
+
+    throughput = [
+        (name, stats) for name, stats in summary['throughput'].items() if stats['rows_per_second']
+    ]
+    if throughput:
+        lines.append("Débit (lignes/s) :")
+        for name, stats in sorted(throughput, key=lambda item: item[1]['rows_per_second']):
+            lines.append(f"  {name} : {stats['rows_per_second']} ({stats['rows']} lignes)")
+
+    http = summary['http']
+    if http['calls']:
+        lines.append(f"Appels HubSpot : {http['calls']} ({http['retries']} relances, {http['duration']}s)")
+
+    return "\n".join(lines)
+
+
+def main(max_workers=MAX_WORKERS, export_workers=EXPORT_WORKERS, force_full=False, execution_mode=EXECUTION_MODE, resume=False, fmt=EXPORT_FORMAT):
     start_time = time.time()  
     print("start : ", datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
     
-    clean_exports_directory()
+    #format des exports, lu aussi par les scripts d'import
+    os.environ["EXPORT_FORMAT"] = fmt
     
-    #exporter toutes les tables 
-    success_exports, failed_tables = export_all_tables()
+    #rapport du run, partagé avec les scripts lancés (sous-processus ou workers)
+    os.makedirs(run_report.REPORT_DIR, exist_ok=True)
+    os.environ["RUN_REPORT_FILE"] = os.path.join(run_report.REPORT_DIR, f"run_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl")
     
-    #lancer tous les imports
-    success_imports, total_possible_imports = run_all_imports()
+    #manifeste du run précédent, avant le nettoyage du dossier exports
+    #en reprise, c'est celui enregistré au démarrage du run interrompu
+    state, resumed = run_state.start_run(resume, load_manifest())
+    previous_manifest = state['previous_manifest']
     
-    #vérifier les associations et créer les CSV filtrés
-    association_check_success = False
-    association_success = 0
-    total_associations = 0
+    #en reprise, les exports et fichiers filtrés déjà produits sont conservés
+    if not resumed:
+        clean_exports_directory(previous_manifest)
     
-    if success_exports > 0:  
-        print("\n" + "="*50)
-        print("PHASE ASSOCIATIONS")
-        print("="*50)
-        
-        #vérification des associations
-        association_check_success = run_association_check()
-        
-        if association_check_success:
-            print("Attente de 1 minute avant les scripts d'associations...")
-            time.sleep(60)
-            
-            #scripts d'associations
-            association_success, total_associations = run_association_scripts()
-        else:
-            print("Échec de la vérification des associations - scripts d'associations ignorés")
+    #exporter toutes les tables 
+    success_exports, failed_tables = export_all_tables(export_workers, previous_manifest, force_full)
+    
+    #lancer les imports, la vérification des associations et les associations
+    #en parallèle selon les dépendances entre scripts
+    success_imports, total_possible_imports, association_success, total_associations, step_results = run_all_steps(
+        with_associations=success_exports > 0,
+        max_workers=max_workers,
+        execution_mode=execution_mode
+    )
+    
+    commit_watermarks(step_results)
+    run_state.finish_run()
     
     #calculer la durée
     end_time = time.time()
@@ -307,10 +535,31 @@ def main():
         else:
             message = f"Tables exportées : {success_exports}/{len(databases)}\nImports réussis : {success_imports}/{total_possible_imports}\nDurée : {duration_minutes}m {duration_remaining_seconds}s"
     
+    try:
+        summary = run_report.write_summary()
+        report_lines = format_report_summary(summary)
+        if report_lines:
+            message += "\n" + report_lines
+    except (OSError, ValueError) as e:
+        print(f"erreur résumé du rapport: {e}")
+    
     send_log_slack(message)
     
     print("Terminé")
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS, help="nombre de scripts exécutés en parallèle")
+    parser.add_argument('--export-workers', type=int, default=EXPORT_WORKERS, help="nombre d'exports simultanés (taille du pool de connexions)")
+    parser.add_argument('--full-export', action='store_true', help="ignore les watermarks et exporte toutes les tables en entier")
+    parser.add_argument('--in-process', action='store_true', help="exécute les scripts dans des workers python gardés chauds")
+    parser.add_argument('--export-format', choices=['csv', 'parquet'], default=EXPORT_FORMAT, help="format des fichiers d'export lus par les scripts d'import")
+    parser.add_argument('--full-upload', action='store_true', help="envoie toutes les lignes à hubspot, pas seulement celles modifiées depuis le dernier import")
+    parser.add_argument('--resume', action='store_true', help="reprend le dernier run interrompu sans refaire les exports, étapes et batches réussis")
+    args = parser.parse_args()
+
+    execution_mode = "inprocess" if args.in_process else EXECUTION_MODE
+    if args.full_upload:
+        os.environ["FULL_UPLOAD"] = "1"
+    main(max_workers=args.workers, export_workers=args.export_workers, force_full=args.full_export, execution_mode=execution_mode, resume=args.resume, fmt=args.export_format)
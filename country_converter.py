@@ -1,3 +1,24 @@
+import unicodedata
+
+import pandas as pd
+
+from column_transforms import map_distinct
+
+
+#clé de recherche insensible à la casse et aux accents
+def fold_text(text):
+    text = unicodedata.normalize('NFKD', str(text).strip())
+    return ''.join(c for c in text if not unicodedata.combining(c)).lower()
+
+
+#index inverse nom -> code, le premier code d'un nom l'emporte (ordre du dictionnaire)
+def build_reverse_index(iso_to_country):
+    index = {}
+    for iso, name in iso_to_country.items():
+        index.setdefault(fold_text(name), iso)
+    return index
+
+
 class CountryConverter:
     # Dictionnaire de conversion ISO alpha-3 -> Nom complet
     ISO_TO_COUNTRY = {
@@ -62,23 +83,44 @@ class CountryConverter:
         'VNM': 'Vietnam', 'YEM': 'Yemen', 'ZMB': 'Zambie', 'ZWE': 'Zimbabwe'
     }
     
+    # index précalculés : code (sans casse ni accents) -> nom, nom -> code
+    ISO_INDEX = {fold_text(iso): name for iso, name in ISO_TO_COUNTRY.items()}
+    COUNTRY_TO_ISO = build_reverse_index(ISO_TO_COUNTRY)
+
+    # valeurs des exports qui tiennent lieu de pays absent
+    PLACEHOLDERS = ('0', 'X', '*')
+    
     @classmethod
     def convert_iso_to_country(cls, iso_code):
         if not iso_code or not isinstance(iso_code, str):
             return iso_code
             
         iso_code = iso_code.strip().upper()
-        return cls.ISO_TO_COUNTRY.get(iso_code, iso_code)
+        return cls.ISO_INDEX.get(fold_text(iso_code), iso_code)
     
     @classmethod
     def convert_country_to_iso(cls, country_name):
         if not country_name or not isinstance(country_name, str):
             return country_name
             
-        for iso, name in cls.ISO_TO_COUNTRY.items():
-            if name.lower() == country_name.lower().strip():
-                return iso
-        return country_name
+        return cls.COUNTRY_TO_ISO.get(fold_text(country_name), country_name)
+    
+    # cellule d'export -> nom du pays, "" pour une cellule vide ou un placeholder
+    @classmethod
+    def convert_value(cls, value, placeholders=PLACEHOLDERS):
+        if not value or pd.isna(value):
+            return ""
+        
+        original_value = str(value).strip()
+        if original_value in placeholders:
+            return ""
+        
+        return cls.convert_iso_to_country(original_value)
+    
+    # même conversion sur une colonne, une fois par valeur distincte
+    @classmethod
+    def convert_series(cls, series, placeholders=PLACEHOLDERS):
+        return map_distinct(series, lambda value: cls.convert_value(value, placeholders))
     
     @classmethod
     def get_all_countries(cls):
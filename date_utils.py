@@ -0,0 +1,155 @@
+from datetime import datetime, timezone
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from column_transforms import on_distinct
+
+#conversion des dates des exports vers les formats attendus par hubspot, partagée par les scripts
+#formats essayés dans l'ordre comme le faisaient les scripts : le premier qui correspond l'emporte
+#sorties : 'ms' (timestamp en millisecondes), 'date' (YYYY-MM-DD), 'dmy' (DD/MM/YYYY),
+#'iso' (YYYY-MM-DDTHH:MM:SS), 'iso_z' (YYYY-MM-DDTHH:MM:SS.000Z)
+
+#formats des champs date/datetime hubspot (cycles, expertises, événements)
+HUBSPOT_FORMATS = (
+    '%Y-%m-%d %H:%M:%S+00:00',
+    '%Y-%m-%d %H:%M:%S%z',
+    '%Y-%m-%d %H:%M:%S',
+    '%Y-%m-%d',
+    '%d/%m/%Y %H:%M:%S',
+    '%d/%m/%Y',
+    '%Y-%m-%d %H:%M'
+)
+
+#formats des événements comportementaux (participations, sollicitations)
+BEHAVIORAL_FORMATS = ('%Y-%m-%dT%H:%M:%S', '%Y-%m-%d %H:%M:%S', '%Y-%m-%d', '%d/%m/%Y %H:%M:%S', '%d/%m/%Y')
+
+#formats parsés colonne par colonne : forme exacte des valeurs (champs complets),
+#format pandas appliqué aux n premiers caractères
+#les formes sont disjointes, une valeur de la forme détectée ne peut pas correspondre à un autre format
+COLUMN_FORMATS = {
+    '%Y-%m-%d %H:%M:%S+00:00': (r'^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}\+00:00$', '%Y-%m-%d %H:%M:%S', 19),
+    '%Y-%m-%d %H:%M:%S': (r'^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}$', '%Y-%m-%d %H:%M:%S', 19),
+    '%Y-%m-%dT%H:%M:%S': (r'^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}$', '%Y-%m-%dT%H:%M:%S', 19),
+    '%Y-%m-%d %H:%M': (r'^\d{4}-\d{2}-\d{2} \d{2}:\d{2}$', '%Y-%m-%d %H:%M', 16),
+    '%Y-%m-%d': (r'^\d{4}-\d{2}-\d{2}$', '%Y-%m-%d', 10),
+    '%d/%m/%Y %H:%M:%S': (r'^\d{2}/\d{2}/\d{4} \d{2}:\d{2}:\d{2}$', '%d/%m/%Y %H:%M:%S', 19),
+    '%d/%m/%Y': (r'^\d{2}/\d{2}/\d{4}$', '%d/%m/%Y', 10),
+}
+
+#nombre de valeurs regardées pour détecter le format d'une colonne
+SNIFF_SIZE = 100
+
+CACHE_SIZE = 100000
+
+
+#espaces retirés et suffixe +00 complété en +00:00
+def normalize_date_string(value):
+    date_string = str(value).strip()
+    if date_string.endswith('+00'):
+        date_string = date_string[:-3] + '+00:00'
+    return date_string
+
+
+#premier format qui correspond : (datetime, format), (None, None) si aucun
+@lru_cache(maxsize=CACHE_SIZE)
+def parse_date(date_string, formats=HUBSPOT_FORMATS):
+    for date_format in formats:
+        try:
+            return datetime.strptime(date_string, date_format), date_format
+        except ValueError:
+            continue
+    return None, None
+
+
+def render_date(date_obj, output):
+    if output == 'ms':
+        if date_obj.tzinfo is None:
+            date_obj = date_obj.replace(tzinfo=timezone.utc)
+        return int(date_obj.timestamp() * 1000)
+    if output == 'date':
+        return date_obj.strftime('%Y-%m-%d')
+    if output == 'dmy':
+        return date_obj.strftime('%d/%m/%Y')
+    if output == 'iso':
+        return date_obj.strftime('%Y-%m-%dT%H:%M:%S')
+    if output == 'iso_z':
+        return date_obj.replace(tzinfo=None).isoformat() + '.000Z'
+    raise ValueError(f"sortie de date inconnue: {output}")
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _convert_date(date_string, output, formats, date_hours):
+    date_obj, date_format = parse_date(date_string, formats)
+    if date_obj is None:
+        return None
+
+    hour = dict(date_hours).get(date_format)
+    if hour is not None:
+        date_obj = date_obj.replace(hour=hour, minute=0, second=0)
+    return render_date(date_obj, output)
+
+
+#conversion d'une valeur, None si aucun format ne correspond
+#date_hours : heure imposée aux dates sans heure, par format ({'%Y-%m-%d': 9})
+def convert_date(value, output, formats=HUBSPOT_FORMATS, date_hours=None, normalize=True):
+    date_string = normalize_date_string(value) if normalize else value
+    return _convert_date(date_string, output, tuple(formats), tuple(sorted((date_hours or {}).items())))
+
+
+#format de la colonne, détecté sur ses premières valeurs
+def detect_format(texts, formats=HUBSPOT_FORMATS):
+    for date_string in texts[:SNIFF_SIZE]:
+        if date_string:
+            date_format = parse_date(date_string, tuple(formats))[1]
+            if date_format:
+                return date_format
+    return None
+
+
+#conversion d'une colonne : les valeurs au format détecté sont parsées en une passe,
+#les autres (et les valeurs invalides) passent par fallback, conversion d'une valeur
+#du script (valeurs vides, autres formats, message d'erreur)
+def convert_dates(series, output, fallback, formats=HUBSPOT_FORMATS, date_hours=None, normalize=True):
+    formats = tuple(formats)
+
+    def convert(values):
+        texts = [(normalize_date_string(value) if normalize else value) if isinstance(value, str) and value else ""
+                 for value in values]
+        converted = pd.Series([None] * len(texts), dtype=object)
+
+        date_format = detect_format(texts, formats)
+        if date_format in COLUMN_FORMATS:
+            pattern, column_format, length = COLUMN_FORMATS[date_format]
+            text = pd.Series(texts, dtype=object)
+            matched = text.str.match(pattern)
+            dates = pd.to_datetime(text[matched].str.slice(0, length), format=column_format, errors='coerce')
+
+            hour = (date_hours or {}).get(date_format)
+            if hour is not None:
+                dates = dates + pd.Timedelta(hours=hour)
+
+            parsed = dates.notna()
+            converted[dates.index[parsed]] = render_dates(dates[parsed], output).values
+
+        for i in np.flatnonzero(converted.isna().values):
+            converted.iat[i] = fallback(values[i])
+        return converted
+
+    return on_distinct(series, convert, fallback(""))
+
+
+#même rendu que render_date, sur une colonne de dates sans fuseau
+def render_dates(dates, output):
+    if output == 'ms':
+        return (dates.astype('datetime64[ns]').astype('int64') // 10 ** 6).astype(str)
+    if output == 'date':
+        return dates.dt.strftime('%Y-%m-%d')
+    if output == 'dmy':
+        return dates.dt.strftime('%d/%m/%Y')
+    if output == 'iso':
+        return dates.dt.strftime('%Y-%m-%dT%H:%M:%S')
+    if output == 'iso_z':
+        return dates.dt.strftime('%Y-%m-%dT%H:%M:%S') + '.000Z'
+    raise ValueError(f"sortie de date inconnue: {output}")
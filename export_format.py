@@ -0,0 +1,234 @@
+import csv
+import hashlib
+import os
+from datetime import datetime
+
+import pandas as pd
+
+#format des fichiers intermédiaires entre export et imports : "csv" ou "parquet"
+#le connecteur transmet le format aux scripts par la variable d'environnement
+EXPORT_DIR = '/root/apm/infocentre/apm-export-tables-back/exports'
+EXPORT_FORMATS = ('csv', 'parquet')
+
+#nombre de lignes lues par le curseur serveur et écrites par groupe parquet
+EXPORT_BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS", 50000))
+
+#oid postgresql des types conservés tels quels en parquet
+PG_BOOL = 16
+PG_INTEGERS = (20, 21, 23)
+PG_FLOATS = (700, 701)
+PG_NUMERIC = 1700
+PG_BYTEA = 17
+
+#métadonnée des colonnes parquet des numeric sans précision, écrits en texte
+NUMERIC_TEXT_KEY = b'pg_numeric_text'
+PG_DATE = 1082
+PG_TIMESTAMP = 1114
+
+#types dont psycopg2 construit des objets python (timestamptz, interval, json, time, tableaux...)
+#lus comme le texte renvoyé par postgresql, identique à celui du COPY csv
+PG_TEXT_TYPES = (1184, 1186, 114, 3802, 1083, 1266, 790, 1000, 1005, 1007, 1009, 1015, 1016, 1021, 1022, 1231)
+
+
+def export_format():
+    fmt = os.getenv("EXPORT_FORMAT", "csv").lower()
+    if fmt not in EXPORT_FORMATS:
+        print(f"format d'export inconnu {fmt}, csv utilisé")
+        return 'csv'
+    return fmt
+
+
+#fichier d'export d'une table : celui du format courant, sinon celui qui existe
+def export_path(table, fmt=None):
+    fmt = fmt or export_format()
+    path = os.path.join(EXPORT_DIR, f'{table}.{fmt}')
+    if os.path.exists(path):
+        return path
+
+    for other in EXPORT_FORMATS:
+        other_path = os.path.join(EXPORT_DIR, f'{table}.{other}')
+        if os.path.exists(other_path):
+            return other_path
+    return path
+
+
+def _arrow_type(pa, column):
+    type_code = column.type_code
+    if type_code == PG_BOOL:
+        return pa.bool_()
+    if type_code in PG_INTEGERS:
+        return pa.int64()
+    if type_code in PG_FLOATS:
+        return pa.float64()
+    if type_code == PG_NUMERIC:
+        if column.precision and 0 < column.precision <= 38 and column.scale is not None:
+            return pa.decimal128(column.precision, column.scale)
+        #numeric sans précision : l'échelle change d'une valeur à l'autre, gardé en texte exact (12.50)
+        #et converti en nombre à la lecture typée, comme pd.read_csv sur le csv
+        return pa.string()
+    if type_code == PG_BYTEA:
+        return pa.binary()
+    if type_code == PG_DATE:
+        return pa.date32()
+    if type_code == PG_TIMESTAMP:
+        return pa.timestamp('us')
+    return pa.string()
+
+
+#colonne parquet d'une colonne postgresql, les numeric en texte sont marqués pour la lecture typée
+def _arrow_field(pa, column):
+    arrow_type = _arrow_type(pa, column)
+    metadata = {NUMERIC_TEXT_KEY: b'1'} if column.type_code == PG_NUMERIC and pa.types.is_string(arrow_type) else None
+    return pa.field(column.name, arrow_type, metadata=metadata)
+
+
+def register_text_types(conn):
+    import psycopg2.extensions
+
+    text_type = psycopg2.extensions.new_type(PG_TEXT_TYPES, 'PG_TEXT', lambda value, cur: value)
+    psycopg2.extensions.register_type(text_type, conn)
+
+
+#écrit le résultat de la requête dans un fichier parquet typé (types postgresql)
+#curseur serveur : la table n'est jamais chargée en entier en mémoire
+#retourne (lignes, octets, empreinte sha256)
+def write_parquet(conn, query, path, batch_rows=EXPORT_BATCH_ROWS):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    register_text_types(conn)
+    cur = conn.cursor(name=f"export_{os.getpid()}_{id(conn)}")
+    writer = None
+    total_rows = 0
+
+    try:
+        cur.execute(query)
+        while True:
+            rows = cur.fetchmany(batch_rows)
+
+            if writer is None:
+                schema = pa.schema([_arrow_field(pa, column) for column in cur.description])
+                writer = pq.ParquetWriter(path, schema, compression='snappy')
+
+            if not rows:
+                break
+
+            columns = list(zip(*rows))
+            arrays = []
+            for field, values in zip(schema, columns):
+                if pa.types.is_string(field.type):
+                    values = [_text(value) for value in values]
+                arrays.append(pa.array(values, type=field.type))
+
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            total_rows += len(rows)
+    finally:
+        if writer is not None:
+            writer.close()
+        cur.close()
+
+    return total_rows, os.path.getsize(path), file_sha256(path)
+
+
+def file_sha256(path):
+    file_hash = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+
+#rendu texte d'une valeur, identique à la sortie du COPY csv de postgresql
+def _text(value):
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return value
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, float):
+        if value != value:
+            return 'NaN'
+        if value in (float('inf'), float('-inf')):
+            return 'Infinity' if value > 0 else '-Infinity'
+        text = repr(value)
+        return text[:-2] if text.endswith('.0') else text
+    if isinstance(value, datetime):
+        text = value.strftime('%Y-%m-%d %H:%M:%S')
+        if value.microsecond:
+            text += f".{value.microsecond:06d}".rstrip('0')
+        return text
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if isinstance(value, (bytes, memoryview)):
+        #bytea : format hex du COPY csv
+        return '\\x' + bytes(value).hex()
+    if hasattr(value, 'as_tuple'):
+        return format(value, 'f')
+    return str(value)
+
+
+def _text_column(pa, column):
+    if pa.types.is_string(column.type):
+        return column.to_pandas()
+    if pa.types.is_integer(column.type):
+        import pyarrow.compute as pc
+        return pc.cast(column, pa.string()).to_pandas()
+    return pd.Series([_text(value) for value in column.to_pylist()], dtype=object)
+
+
+#lit un export parquet comme pd.read_csv lirait le csv du même export :
+#les colonnes non numériques (dates, booléens) gardent le rendu texte de postgresql
+def _read_parquet(path, columns=None, as_text=False):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    table = pq.read_table(path, columns=columns)
+    data = {}
+
+    for field, column in zip(table.schema, table.columns):
+        name, column_type = field.name, column.type
+        if as_text or not (pa.types.is_integer(column_type) or pa.types.is_floating(column_type)
+                           or pa.types.is_decimal(column_type)):
+            series = _text_column(pa, column)
+            #comme read_csv : champ vide = valeur manquante
+            series = series.where(series.notna() & (series != ''), float('nan'))
+            if not as_text and NUMERIC_TEXT_KEY in (field.metadata or {}):
+                series = pd.to_numeric(series)
+        elif pa.types.is_decimal(column_type):
+            series = column.to_pandas().astype('float64')
+        else:
+            series = column.to_pandas()
+        data[name] = series.reset_index(drop=True)
+
+    return pd.DataFrame(data, columns=table.column_names)
+
+
+#lecture d'un export par les scripts d'import, quel que soit son format
+#as_text=True : toutes les valeurs en texte (équivalent de dtype=str)
+def read_export(table, columns=None, as_text=False):
+    path = export_path(table)
+
+    if path.endswith('.parquet'):
+        return _read_parquet(path, columns, as_text)
+
+    return pd.read_csv(path, usecols=columns, dtype=str if as_text else None, low_memory=False)
+
+
+#lignes d'un export sous forme de dict texte, comme csv.DictReader (valeur vide si nulle)
+def iter_export_rows(table):
+    path = export_path(table)
+
+    if not path.endswith('.parquet'):
+        with open(path, 'r', encoding='utf-8') as f:
+            yield from csv.DictReader(f)
+        return
+
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(path)
+    for batch in parquet_file.iter_batches(batch_size=EXPORT_BATCH_ROWS):
+        columns = {name: [_text(value) for value in column.to_pylist()]
+                   for name, column in zip(batch.schema.names, batch.columns)}
+        for i in range(batch.num_rows):
+            yield {name: (values[i] if values[i] is not None else '') for name, values in columns.items()}
@@ -0,0 +1,85 @@
+import hashlib
+import json
+import os
+
+#manifeste des exports : lignes, taille, empreinte et durée par table
+MANIFEST_FILE = '/root/apm/infocentre/apm-export-tables-back/exports/manifest.json'
+
+
+#enveloppe le fichier d'export pour compter les lignes et calculer l'empreinte
+#pendant l'écriture du flux COPY (évite un second SELECT COUNT(*))
+class ExportWriter:
+    def __init__(self, file):
+        self.file = file
+        self.hash = hashlib.sha256()
+        self.bytes = 0
+        self.lines = 0
+        self.in_quotes = False
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+
+        self.file.write(data)
+        self.bytes += len(data)
+        self.hash.update(data)
+
+        #un retour à la ligne dans un champ entre guillemets ne termine pas la ligne csv
+        for i, segment in enumerate(data.split(b'"')):
+            if i > 0:
+                self.in_quotes = not self.in_quotes
+            if not self.in_quotes:
+                self.lines += segment.count(b'\n')
+
+        return len(data)
+
+    #nombre de lignes de données (sans l'en-tête)
+    def rows(self, header=True):
+        return max(self.lines - 1, 0) if header else self.lines
+
+    def hexdigest(self):
+        return self.hash.hexdigest()
+
+
+def load_manifest(path=MANIFEST_FILE):
+    if not os.path.exists(path):
+        return {}
+
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"manifeste illisible {path}: {e}")
+        return {}
+
+
+#tables dont l'export a échoué : le fichier du run précédent est toujours lu par les imports,
+#son entrée est gardée (stale : son watermark n'est pas avancé une seconde fois)
+def failed_entries(failed_tables, previous, export_dir):
+    entries = {}
+    for table in failed_tables:
+        entry = (previous or {}).get(table)
+        if entry and os.path.exists(os.path.join(export_dir, f"{table}.{entry.get('format', 'csv')}")):
+            entries[table] = dict(entry, stale=True)
+    return entries
+
+
+#écrit le manifeste en signalant les tables identiques au run précédent
+def write_manifest(entries, previous=None, path=MANIFEST_FILE):
+    previous = previous or {}
+    manifest = {}
+
+    for table, entry in entries.items():
+        entry = dict(entry)
+        previous_hash = previous.get(table, {}).get('sha256')
+        entry['unchanged'] = previous_hash is not None and previous_hash == entry.get('sha256')
+        manifest[table] = entry
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(temp_path, path)
+
+    return manifest
+
@@ -0,0 +1,198 @@
+import gzip
+import json
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import rate_limiter
+import run_report
+
+#HUBSPOT_BASE_URL : autre serveur que api.hubapi.com (serveur de test mock_hubspot_server.py)
+BASE_URL = os.getenv("HUBSPOT_BASE_URL", "https://api.hubapi.com").rstrip("/")
+
+#client http partagé par tous les appels hubspot : session gardée ouverte (keep-alive),
+#connexions réutilisées, timeouts par défaut, budget d'appels du rate limiter
+POOL_SIZE = int(os.getenv("HUBSPOT_POOL_SIZE", 10))
+CONNECT_TIMEOUT = float(os.getenv("HUBSPOT_CONNECT_TIMEOUT", 10))
+READ_TIMEOUT = float(os.getenv("HUBSPOT_READ_TIMEOUT", 120))
+
+#suivi des imports crm : hubspot les traite en asynchrone après le POST /crm/v3/imports
+IMPORT_POLL_SECONDS = float(os.getenv("HUBSPOT_IMPORT_POLL_SECONDS", 10))
+IMPORT_TIMEOUT_SECONDS = float(os.getenv("HUBSPOT_IMPORT_TIMEOUT", 3600))
+IMPORT_FINAL_STATES = ('DONE', 'FAILED', 'CANCELED', 'REVERTED')
+IMPORT_ERRORS_PAGE_SIZE = 100
+
+#compression gzip des corps json envoyés (les réponses sont déjà demandées en gzip)
+GZIP_REQUESTS = os.getenv("HUBSPOT_GZIP_REQUESTS", "0") == "1"
+GZIP_MIN_BYTES = 1024
+
+_session = None
+_session_pid = None
+_lock = threading.Lock()
+
+
+#une session par processus (les workers chauds et sous-processus ont la leur)
+def session():
+    global _session, _session_pid
+
+    with _lock:
+        if _session is None or _session_pid != os.getpid():
+            new_session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=0)
+            new_session.mount('https://', adapter)
+            new_session.mount('http://', adapter)
+            new_session.headers.update({'Accept-Encoding': 'gzip, deflate'})
+            _session, _session_pid = new_session, os.getpid()
+        return _session
+
+
+#ferme la session du processus, la suivante est créée au prochain appel (nouvelle étape dans un worker chaud)
+def reset_session():
+    global _session, _session_pid
+
+    with _lock:
+        if _session is not None:
+            _session.close()
+        _session, _session_pid = None, None
+
+
+def _gzip_json(kwargs):
+    body = json.dumps(kwargs.pop('json')).encode('utf-8')
+    headers = dict(kwargs.pop('headers', None) or {})
+    headers['Content-Type'] = 'application/json'
+
+    if len(body) >= GZIP_MIN_BYTES:
+        body = gzip.compress(body)
+        headers['Content-Encoding'] = 'gzip'
+
+    kwargs['data'] = body
+    kwargs['headers'] = headers
+
+
+#corps multipart (files=) construit une seule fois : le fichier est lu au premier envoi,
+#une nouvelle tentative après un 429 renverrait sinon un fichier vide
+def _encode_files(kwargs):
+    prepared = requests.Request('POST', BASE_URL, files=kwargs.pop('files'), data=kwargs.pop('data', None)).prepare()
+    headers = dict(kwargs.pop('headers', None) or {})
+    headers['Content-Type'] = prepared.headers['Content-Type']
+
+    kwargs['data'] = prepared.body
+    kwargs['headers'] = headers
+
+
+def _body_size(response):
+    body = response.request.body if response.request is not None else None
+    if body is None:
+        return 0
+    if isinstance(body, str):
+        return len(body.encode('utf-8'))
+    if isinstance(body, bytes):
+        return len(body)
+    return 0
+
+
+#requête hubspot soumise au budget partagé, relancée après un 429
+def request(method, url, bucket='default', max_retries=rate_limiter.MAX_RETRIES, **kwargs):
+    name = f"{method.upper()} {urlsplit(url).path}"
+    kwargs.setdefault('timeout', (CONNECT_TIMEOUT, READ_TIMEOUT))
+    if GZIP_REQUESTS and kwargs.get('json') is not None:
+        _gzip_json(kwargs)
+    if kwargs.get('files') is not None:
+        _encode_files(kwargs)
+    #corps lu en flux (fichier ouvert passé en data=) : impossible à renvoyer à l'identique
+    if hasattr(kwargs.get('data'), 'read'):
+        max_retries = 0
+
+    start_time = time.time()
+
+    for attempt in range(max_retries + 1):
+        rate_limiter.acquire(bucket)
+        try:
+            response = session().request(method, url, **kwargs)
+        except requests.RequestException as e:
+            run_report.record('http', name, status='error', error=str(e), retries=attempt,
+                              duration=round(time.time() - start_time, 3))
+            raise
+        rate_limiter.update_from_response(response, bucket)
+
+        if response.status_code != 429 or attempt == max_retries:
+            break
+
+        print(f"limite hubspot atteinte (429), nouvelle tentative {attempt + 1}/{max_retries}")
+
+    run_report.record('http', name, status=response.status_code, retries=attempt,
+                      bytes_sent=_body_size(response), duration=round(time.time() - start_time, 3))
+    return response
+
+
+def get(url, **kwargs):
+    return request('get', url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request('post', url, **kwargs)
+
+
+def patch(url, **kwargs):
+    return request('patch', url, **kwargs)
+
+
+#lignes en erreur d'un import terminé (sourceData.rowData : valeurs de la ligne du fichier), None si la lecture échoue
+def import_errors(import_id, headers):
+    errors = []
+    params = {'limit': IMPORT_ERRORS_PAGE_SIZE}
+
+    while True:
+        response = get(f"{BASE_URL}/crm/v3/imports/{import_id}/errors", headers=headers, params=params)
+        if response.status_code != 200:
+            print(f"erreur lecture des erreurs de l'import {import_id}: {response.status_code}")
+            return None
+
+        payload = response.json()
+        errors.extend(payload.get('results', []))
+        after = payload.get('paging', {}).get('next', {}).get('after')
+        if not after:
+            return errors
+        params = {'limit': IMPORT_ERRORS_PAGE_SIZE, 'after': after}
+
+
+#attend la fin d'un import crm et retourne ses lignes rejetées par hubspot (vide si aucune),
+#None s'il ne se termine pas en DONE ou si son suivi échoue
+def wait_for_import_errors(import_id, headers):
+    deadline = time.time() + IMPORT_TIMEOUT_SECONDS
+
+    while True:
+        response = get(f"{BASE_URL}/crm/v3/imports/{import_id}", headers=headers)
+        if response.status_code != 200:
+            print(f"erreur suivi de l'import {import_id}: {response.status_code}")
+            return None
+
+        state = response.json().get('state')
+        if state in IMPORT_FINAL_STATES:
+            break
+        if time.time() >= deadline:
+            print(f"import {import_id} toujours en cours ({state}) après {IMPORT_TIMEOUT_SECONDS:.0f}s")
+            return None
+        time.sleep(IMPORT_POLL_SECONDS)
+
+    if state != 'DONE':
+        print(f"import {import_id} terminé en {state}")
+        return None
+
+    errors = import_errors(import_id, headers)
+    if errors:
+        print(f"import {import_id} terminé avec {len(errors)} lignes en erreur, par exemple : "
+              f"{', '.join(sorted(set(str(error.get('errorType')) for error in errors[:10])))}")
+    elif errors is not None:
+        print(f"import {import_id} terminé")
+    return errors
+
+
+#attend la fin d'un import crm, True s'il est terminé (DONE) sans ligne en erreur
+def wait_for_import(import_id, headers):
+    errors = wait_for_import_errors(import_id, headers)
+    return errors is not None and not errors
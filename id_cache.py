@@ -0,0 +1,236 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+import hubspot_client
+import run_report
+import state_store
+import watermarks
+
+load_dotenv()
+
+#correspondances pk -> id hubspot des objets liés par les associations, gardées entre les runs
+#(table id_map du state store) pour ne plus relire les objets à chaque batch
+#premier passage : liste paginée de tous les objets du type, refait tous les ID_CACHE_FULL_DAYS jours
+#passages suivants : seulement les objets modifiés depuis le dernier passage (hs_lastmodifieddate)
+HUBSPOT_API_KEY = os.getenv("PROD_KEY")
+FULL_EVERY_DAYS = int(os.getenv("ID_CACHE_FULL_DAYS", 7))
+
+#propriété unique (pk) de chaque type d'objet
+KEY_PROPERTIES = {
+    "2-191825137": "pk_club",
+    "2-139503358": "pk_event",
+    "0-1": "pk_expert",
+    "2-140990150": "pk_expertise",
+}
+
+#date de dernière modification, pour la mise à jour incrémentale : les contacts n'ont pas hs_lastmodifieddate
+MODIFIED_PROPERTIES = {
+    "2-191825137": "hs_lastmodifieddate",
+    "2-139503358": "hs_lastmodifieddate",
+    "0-1": "lastmodifieddate",
+    "2-140990150": "hs_lastmodifieddate",
+}
+
+LIST_PAGE_SIZE = 100
+SEARCH_PAGE_SIZE = 200
+#l'api search ne pagine pas au-delà de 10 000 résultats : passage complet dans ce cas
+SEARCH_MAX_RESULTS = 10000
+
+#l'api batch read accepte 100 objets par appel, appels envoyés en parallèle
+READ_BATCH_SIZE = 100
+READ_WORKERS = int(os.getenv("ID_READ_WORKERS", 4))
+
+#marge sur le dernier passage, pour les objets modifiés pendant sa lecture
+REFRESH_OVERLAP_MS = 60 * 1000
+
+_maps = {}
+
+
+def _headers():
+    return {'Authorization': f'Bearer {HUBSPOT_API_KEY}', 'Content-Type': 'application/json'}
+
+
+def _state_key(object_type):
+    return f"id_map:{object_type}"
+
+
+def _add_results(mapping, results, key_property):
+    for result in results:
+        key = (result.get('properties') or {}).get(key_property)
+        if key:
+            mapping[str(key)] = str(result['id'])
+
+
+#tous les objets du type, None si la liste échoue
+def fetch_all(object_type, key_property):
+    mapping = {}
+    after = None
+
+    while True:
+        params = {'limit': LIST_PAGE_SIZE, 'properties': key_property, 'archived': 'false'}
+        if after:
+            params['after'] = after
+
+        response = hubspot_client.get(f"{hubspot_client.BASE_URL}/crm/v3/objects/{object_type}",
+                                      headers=_headers(), params=params)
+        if response.status_code != 200:
+            print(f"erreur liste {object_type}: {response.status_code}")
+            return None
+
+        payload = response.json()
+        _add_results(mapping, payload.get('results', []), key_property)
+
+        after = payload.get('paging', {}).get('next', {}).get('after')
+        if not after:
+            return mapping
+
+
+#objets modifiés depuis since_ms, None si la recherche échoue ou dépasse la limite de l'api search
+def fetch_modified(object_type, key_property, since_ms):
+    modified_property = MODIFIED_PROPERTIES[object_type]
+    mapping = {}
+    after = None
+
+    while True:
+        body = {
+            "filterGroups": [{
+                "filters": [{
+                    "propertyName": modified_property,
+                    "operator": "GTE",
+                    "value": str(since_ms)
+                }]
+            }],
+            "sorts": [{"propertyName": modified_property, "direction": "ASCENDING"}],
+            "properties": [key_property],
+            "limit": SEARCH_PAGE_SIZE
+        }
+        if after:
+            body['after'] = after
+
+        response = hubspot_client.post(f"{hubspot_client.BASE_URL}/crm/v3/objects/{object_type}/search",
+                                       bucket='search', headers=_headers(), json=body)
+        if response.status_code != 200:
+            print(f"erreur recherche des {object_type} modifiés: {response.status_code}")
+            return None
+
+        payload = response.json()
+        if payload.get('total', 0) > SEARCH_MAX_RESULTS:
+            return None
+
+        _add_results(mapping, payload.get('results', []), key_property)
+
+        after = payload.get('paging', {}).get('next', {}).get('after')
+        if not after:
+            return mapping
+
+
+def _read_chunk(object_type, key_property, keys):
+    response = hubspot_client.post(
+        f"{hubspot_client.BASE_URL}/crm/v3/objects/{object_type}/batch/read",
+        headers=_headers(),
+        json={
+            "idProperty": key_property,
+            "properties": [key_property],
+            "inputs": [{"id": str(key)} for key in keys]
+        }
+    )
+
+    #207 : une partie des clés n'existe pas dans hubspot
+    if response.status_code not in (200, 207):
+        print(f"erreur lecture {object_type}: {response.status_code}")
+        return None
+
+    mapping = {}
+    _add_results(mapping, response.json().get('results', []), key_property)
+    return mapping
+
+
+#ids hubspot des clés, lus par leur propriété unique (pk), None si une lecture échoue
+#les clés absentes de hubspot ne sont pas dans le résultat
+def read_by_key(object_type, keys):
+    key_property = KEY_PROPERTIES[object_type]
+    keys = list(keys)
+    chunks = [keys[i:i + READ_BATCH_SIZE] for i in range(0, len(keys), READ_BATCH_SIZE)]
+
+    if len(chunks) > 1 and READ_WORKERS > 1:
+        with ThreadPoolExecutor(max_workers=min(READ_WORKERS, len(chunks))) as executor:
+            results = list(executor.map(lambda chunk: _read_chunk(object_type, key_property, chunk), chunks))
+    else:
+        results = [_read_chunk(object_type, key_property, chunk) for chunk in chunks]
+
+    if any(result is None for result in results):
+        return None
+
+    mapping = {}
+    for result in results:
+        mapping.update(result)
+    return mapping
+
+
+#met le cache du type à jour, une fois par processus
+def refresh(object_type):
+    if object_type in _maps:
+        return _maps[object_type]
+
+    key_property = KEY_PROPERTIES[object_type]
+    state_key = _state_key(object_type)
+    state = state_store.get_watermarks().get(state_key)
+    started_ms = int(time.time() * 1000)
+
+    with run_report.timed('id_cache', object_type) as fields:
+        mapping = None
+        full = watermarks.needs_full_export(state, FULL_EVERY_DAYS)
+
+        try:
+            if not full:
+                mapping = fetch_modified(object_type, key_property, int(state['watermark']) - REFRESH_OVERLAP_MS)
+                if mapping is None:
+                    full = True
+                else:
+                    state_store.put_id_map(object_type, mapping)
+                    watermarks.save_watermarks({state_key: {'watermark': str(started_ms)}})
+
+            if full:
+                mapping = fetch_all(object_type, key_property)
+                if mapping is not None:
+                    state_store.replace_id_map(object_type, mapping)
+                    watermarks.save_watermarks({state_key: {'watermark': str(started_ms),
+                                                            'last_full': datetime.now().isoformat(timespec='seconds')}})
+        #cache non rafraîchi : les clés absentes seront lues une à une par batch
+        except Exception as e:
+            print(f"erreur mise à jour du cache des ids {key_property}: {e}")
+            mapping = None
+
+        fields['full'] = full
+        fields['rows'] = len(mapping) if mapping is not None else 0
+        if mapping is None:
+            fields['status'] = 'error'
+
+    _maps[object_type] = state_store.get_id_map(object_type)
+    print(f"cache des ids {key_property}: {len(_maps[object_type])} objets"
+          f" ({'passage complet' if full else 'mise à jour incrémentale'}{'' if mapping is not None else ', échec'})")
+    return _maps[object_type]
+
+
+#ids connus pour les clés demandées
+def lookup(object_type, keys):
+    mapping = refresh(object_type)
+    return {key: mapping[key] for key in keys if key in mapping}
+
+
+#ids trouvés par ailleurs (read_by_key), gardés pour les prochains batches et runs
+def remember(object_type, mapping):
+    if not mapping:
+        return
+
+    refresh(object_type).update(mapping)
+    state_store.put_id_map(object_type, mapping)
+
+
+#oublie les ids chargés : le prochain refresh repart du state store (nouvelle étape dans un worker chaud)
+def reset():
+    _maps.clear()
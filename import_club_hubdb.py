@@ -1,11 +1,14 @@
 import os
 from dotenv import load_dotenv
 import pandas as pd
-import requests
+import hubspot_client
+import run_report
+from export_format import iter_export_rows
 import csv
 import tempfile
 import json
-from datetime import datetime
+from contextlib import closing
+import date_utils
 from country_converter import CountryConverter 
 
 load_dotenv()
@@ -13,7 +16,14 @@ load_dotenv()
 # config
 API_KEY =  os.getenv("PROD_KEY")
 TABLE_ID = "348959970"  
-CSV_FILE = "/root/apm/infocentre/apm-export-tables-back/exports/dwh.mv_club.csv"  
+EXPORT_TABLE = "dwh.mv_club"  
+
+CLUB_DATE_FORMATS = (
+    '%Y-%m-%d',    # YYYY-MM-DD
+    '%d/%m/%Y',    # DD/MM/YYYY  
+    '%m/%d/%Y',    # MM/DD/YYYY
+    '%Y/%m/%d',    # YYYY/MM/DD 
+)
 
 def convert_date_format(date_string):
     if not date_string or date_string.strip() == '':
@@ -21,31 +31,11 @@ def convert_date_format(date_string):
     
     date_string = date_string.strip()
     
-    input_formats = [
-        '%Y-%m-%d',    # YYYY-MM-DD
-        '%d/%m/%Y',    # DD/MM/YYYY  
-        '%m/%d/%Y',    # MM/DD/YYYY
-        '%Y/%m/%d',    # YYYY/MM/DD 
-    ]
-    
-    for input_format in input_formats:
-        try:
-            date_obj = datetime.strptime(date_string, input_format)
-            result = date_obj.strftime('%Y-%m-%d')
-            return result
-        except ValueError:
-            continue
-    
-    return date_string
+    converted = date_utils.convert_date(date_string, 'date', formats=CLUB_DATE_FORMATS, normalize=False)
+    return converted if converted is not None else date_string
 
 def convert_country_for_club(value):
-    if not value or pd.isna(value) if 'pd' in globals() else not str(value).strip():
-        return ""
-    
-    original_value = str(value).strip()
-    converted = CountryConverter.convert_iso_to_country(original_value)
-    
-    return converted
+    return CountryConverter.convert_value(value, placeholders=())
 
 def convert_region_for_hubspot(value):
     if not value or pd.isna(value) if 'pd' in globals() else not str(value).strip():
@@ -75,13 +65,13 @@ def convert_region_for_hubspot(value):
 
 
 def get_hubdb_keys():
-    url = f"https://api.hubapi.com/cms/v3/hubdb/tables/{TABLE_ID}/rows"
+    url = f"{hubspot_client.BASE_URL}/cms/v3/hubdb/tables/{TABLE_ID}/rows"
     headers = {
         "Authorization": f"Bearer {API_KEY}",
         "Content-Type": "application/json"
     }
     try:
-        response = requests.get(url, headers=headers)
+        response = hubspot_client.get(url, headers=headers)
         if response.status_code == 200:
             # Retourner un dictionnaire : {pk_club: hs_id}
             return {str(row['values'].get('pk_club', '')).strip(): row['id'] 
@@ -95,8 +85,7 @@ def get_hubdb_keys():
 
 def process_csv_data(hubdb_keys):
     all_data = []
-    with open(CSV_FILE, mode='r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
+    with closing(iter_export_rows(EXPORT_TABLE)) as reader:
         
         for row in reader:
             key_value = str(row.get('PKClub', '')).strip()
@@ -165,7 +154,7 @@ def import_to_hubdb(temp_file):
     if not temp_file:
         return None
 
-    import_url = f"https://api.hubapi.com/cms/v3/hubdb/tables/{TABLE_ID}/draft/import"
+    import_url = f"{hubspot_client.BASE_URL}/cms/v3/hubdb/tables/{TABLE_ID}/draft/import"
     
     config = {
         "skipRows": 1,
@@ -220,7 +209,7 @@ def import_to_hubdb(temp_file):
             }
             
             headers = {"Authorization": f"Bearer {API_KEY}"}
-            response = requests.post(import_url, files=files, headers=headers)
+            response = hubspot_client.post(import_url, files=files, headers=headers)
 
             return response
     except Exception as e:
@@ -245,7 +234,8 @@ def main():
         print("aucune donnée à traiter")
         return
     
-    temp_file = prepare_import_file(all_data)
+    with run_report.timed('transform', 'import_club_hubdb', rows=len(all_data)):
+        temp_file = prepare_import_file(all_data)
     if not temp_file:
         print("erreur lors de la préparation du fichier")
         return
@@ -256,12 +246,12 @@ def main():
     if response and response.status_code == 200:
         print("import réussi")
         
-        publish_url = f"https://api.hubapi.com/cms/v3/hubdb/tables/{TABLE_ID}/draft/publish"
+        publish_url = f"{hubspot_client.BASE_URL}/cms/v3/hubdb/tables/{TABLE_ID}/draft/publish"
         headers = {
             "Authorization": f"Bearer {API_KEY}",
             "Content-Type": "application/json"
         }
-        pub_response = requests.post(publish_url, headers=headers)
+        pub_response = hubspot_client.post(publish_url, headers=headers)
         
         if pub_response.status_code == 200:
             print("table HubDB publiée")
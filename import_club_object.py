@@ -1,8 +1,14 @@
 from dotenv import load_dotenv
 import pandas as pd
 import os
-import requests
+import hubspot_client
+import run_report
+from export_format import read_export
+from column_transforms import cell_text, map_distinct
+import date_utils
+from change_detection import detect_changes, commit_import
 import json
+import sys
 from datetime import datetime
 from country_converter import CountryConverter
 
@@ -10,7 +16,7 @@ load_dotenv()
 
 output_dir = '/root/apm/infocentre/apm-export-tables-back/filtered'
 HUBSPOT_API_KEY = os.getenv("PROD_KEY")
-HUBSPOT_IMPORT_API_URL = 'https://api.hubapi.com/crm/v3/imports'
+HUBSPOT_IMPORT_API_URL = f'{hubspot_client.BASE_URL}/crm/v3/imports'
 
 CLUB_COLUMNS = [
     'PKClub',
@@ -53,16 +59,18 @@ CLUB_COLUMNS = [
     'avatar_url'
 ]
 
+INT_COLUMNS = ['IdClub', 'FK_President', 'FK_Animateur', 'FK_Permanent', 'FK_Referent', 'FK_Region', 'IdStatut']
+FLOAT_COLUMNS = ['AgeMoyen', 'Tarif', 'Evaluation', 'stats__age_average']
+DATE_COLUMNS = ['DateCreation', 'DateFin', 'Date_Creation_Club', 'Date_1ere_Rencontre', 'Date_fin_cycle', 'Date_debut_cycle']
+
+#dates dont le format est connu d'avance, converties sans passer par l'inférence de format
+CLUB_DATE_FORMATS = ('%Y-%m-%d %H:%M:%S+00:00', '%Y-%m-%d %H:%M:%S', '%Y-%m-%d')
+
+#pays inconnu des clubs
+COUNTRY_PLACEHOLDERS = ('X', '*')
+
 def convert_country_for_club(value):
-    if not value or pd.isna(value):
-        return ""
-    
-    original_value = str(value).strip()
-    if original_value in ['X', '*']:
-        return ""
-    
-    converted = CountryConverter.convert_iso_to_country(original_value)
-    return converted
+    return CountryConverter.convert_value(value, placeholders=COUNTRY_PLACEHOLDERS)
 
 def parse_date(date_str):
     """Convertit une date au format YYYY-MM-DD vers le format DD/MM/YYYY pour HubSpot"""
@@ -75,43 +83,51 @@ def parse_date(date_str):
     except:
         return ""
 
+#conversion des dates d'une colonne : les dates iso (celles de l'export) parsées en une passe
+#avec un format explicite, les autres par parse_date
+def parse_dates(series):
+    return date_utils.convert_dates(series, 'dmy', parse_date, formats=CLUB_DATE_FORMATS)
+
+def clean_int(value):
+    try:
+        return int(float(value)) if value and str(value).replace('.', '').isdigit() else ""
+    except:
+        return ""
+
+def clean_float(value):
+    try:
+        return float(value) if value and str(value).replace('.', '').replace(',', '').isdigit() else ""
+    except:
+        return ""
+
+#nettoyage colonne par colonne, conversions faites une fois par valeur distincte
 def clean_club_data(df):
-    processed_data = []
-    
-    for _, row in df.iterrows():
-        data = {}
-        
-        for column in df.columns:
-            value = row[column] if pd.notna(row[column]) else ""
-            
-            if column == 'PaysClub':
-                data[column] = convert_country_for_club(value)
-            elif column in ['IdClub', 'FK_President', 'FK_Animateur', 'FK_Permanent', 'FK_Referent', 'FK_Region', 'IdStatut']:
-                try:
-                    data[column] = int(float(value)) if value and str(value).replace('.', '').isdigit() else ""
-                except:
-                    data[column] = ""
-            elif column in ['AgeMoyen', 'Tarif', 'Evaluation', 'stats__age_average']:
-                try:
-                    data[column] = float(value) if value and str(value).replace('.', '').replace(',', '').isdigit() else ""
-                except:
-                    data[column] = ""
-            elif column in ['DateCreation', 'DateFin', 'Date_Creation_Club', 'Date_1ere_Rencontre', 'Date_fin_cycle', 'Date_debut_cycle']:
-                data[column] = parse_date(value)
-            else:
-                data[column] = str(value).strip() if value else ""
-        
-        processed_data.append(data)
+    if df.empty:
+        return pd.DataFrame()
+
+    data = {}
+    for column in df.columns:
+        values = df[column]
+
+        if column == 'PaysClub':
+            data[column] = CountryConverter.convert_series(values, placeholders=COUNTRY_PLACEHOLDERS)
+        elif column in INT_COLUMNS:
+            data[column] = map_distinct(values, clean_int)
+        elif column in FLOAT_COLUMNS:
+            data[column] = map_distinct(values, clean_float)
+        elif column in DATE_COLUMNS:
+            data[column] = parse_dates(values)
+        else:
+            data[column] = cell_text(values, strip=True)
     
-    return pd.DataFrame(processed_data)
+    return pd.DataFrame(data, index=df.index).reset_index(drop=True)
 
 def process_clubs():
-    input_file = '/root/apm/infocentre/apm-export-tables-back/exports/dwh.mv_club.csv'
     output_file = 'dwh_club_filtered.csv'
     output_path = os.path.join(output_dir, output_file)
     
     try:
-        df = pd.read_csv(input_file)
+        df = read_export('dwh.mv_club')
         print(f"nombre total de clubs: {len(df)}")
         
         available_columns = [col for col in CLUB_COLUMNS if col in df.columns]
@@ -122,12 +138,22 @@ def process_clubs():
         
         df_filtered = df[available_columns]
         
-        df_cleaned = clean_club_data(df_filtered)
+        with run_report.timed('transform', 'import_club_object', rows=len(df_filtered)):
+            df_cleaned = clean_club_data(df_filtered)
         
-        df_cleaned.to_csv(output_path, index=False)
-        print(f"{len(df_cleaned)} clubs exportés vers {output_path}")
+        #seules les lignes nouvelles ou modifiées depuis le dernier import réussi sont envoyées
+        df_changed, snapshot = detect_changes('club_object', df_cleaned, 'PKClub')
         
-        upload_success = upload_clubs_to_hubspot(output_path, available_columns)
+        if df_changed.empty:
+            print("aucun club à envoyer, import ignoré")
+            return True
+        
+        df_changed.to_csv(output_path, index=False)
+        print(f"{len(df_changed)} clubs exportés vers {output_path}")
+        
+        #lignes rejetées par hubspot, None si l'import a échoué : le snapshot est enregistré sans les lignes rejetées
+        errors = upload_clubs_to_hubspot(output_path, available_columns)
+        upload_success = commit_import('club_object', snapshot, errors, output_path, 'PKClub')
         
         if upload_success:
             print("import des clubs réussi")
@@ -362,21 +388,22 @@ def upload_clubs_to_hubspot(csv_file_path, available_columns):
             files = {'files': ('dwh_club_filtered.csv', csv_file, 'text/csv')}
             data = {'importRequest': json.dumps(payload)}
             
-            response = requests.post(HUBSPOT_IMPORT_API_URL, headers=headers, files=files, data=data)
+            response = hubspot_client.post(HUBSPOT_IMPORT_API_URL, headers=headers, files=files, data=data)
             
             if response.status_code == 200:
                 result = response.json()
                 print("upload réussi")
                 print(f"Import ID: {result.get('id', 'N/A')}")
-                return True
+                #import traité en asynchrone par hubspot : attendre sa fin, retourne les lignes rejetées
+                return hubspot_client.wait_for_import_errors(result['id'], headers)
             else:
                 print(f"erreur API HubSpot: {response.status_code}")
                 print(f"response: {response.text}")
-                return False
+                return None
                 
     except Exception as e:
         print(f"erreur lors de l'upload: {e}")
-        return False
+        return None
 
 def main():
     if not os.path.exists(output_dir):
@@ -388,6 +415,8 @@ def main():
         print("import terminé avec succès")
     else:
         print("échec de l'import")
+        #code retour en erreur : le connecteur saute les étapes qui en dépendent et n'avance pas le watermark
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
@@ -1,6 +1,6 @@
 import os
 from dotenv import load_dotenv
-import requests
+import hubspot_client
 import csv
 import re
 
@@ -12,14 +12,14 @@ TABLE_ID = "348959970"
 CSV_FILE = 'exports/club_urls.csv'
 
 def get_existing_hubdb_rows():
-    url = f"https://api.hubapi.com/cms/v3/hubdb/tables/{TABLE_ID}/rows"
+    url = f"{hubspot_client.BASE_URL}/cms/v3/hubdb/tables/{TABLE_ID}/rows"
     headers = {
         "Authorization": f"Bearer {API_KEY}",
         "Content-Type": "application/json"
     }
     
     try:
-        response = requests.get(url, headers=headers)
+        response = hubspot_client.get(url, headers=headers)
         if response.status_code == 200:
             existing_ids = [str(row['id']) for row in response.json().get('results', [])]
             print(f"IDs existants dans HubDB: {len(existing_ids)} lignes")
@@ -90,7 +90,7 @@ def update_hubdb_rows():
     for hubspot_id, data in updates_data.items():
         try:
             #mettre à jour une ligne spécifique
-            update_url = f"https://api.hubapi.com/cms/v3/hubdb/tables/{TABLE_ID}/rows/{hubspot_id}/draft"
+            update_url = f"{hubspot_client.BASE_URL}/cms/v3/hubdb/tables/{TABLE_ID}/rows/{hubspot_id}/draft"
             
             #préparer les données à mettre à jour avec les vrais noms de colonnes
             update_payload = {
@@ -102,7 +102,7 @@ def update_hubdb_rows():
             }
             
             #faire la requête de mise à jour
-            response = requests.patch(update_url, json=update_payload, headers=headers)
+            response = hubspot_client.patch(update_url, json=update_payload, headers=headers)
             
             if response.status_code == 200:
                 success_count += 1
@@ -122,8 +122,8 @@ def update_hubdb_rows():
     #publier les modifications si il y a eu des succès
     if success_count > 0:
         print("\nPublication des modifications...")
-        publish_url = f"https://api.hubapi.com/cms/v3/hubdb/tables/{TABLE_ID}/draft/publish"
-        pub_response = requests.post(publish_url, headers=headers)
+        publish_url = f"{hubspot_client.BASE_URL}/cms/v3/hubdb/tables/{TABLE_ID}/draft/publish"
+        pub_response = hubspot_client.post(publish_url, headers=headers)
         
         if pub_response.status_code == 200:
             print("table HubDB publiée avec succès")
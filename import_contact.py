@@ -1,18 +1,23 @@
 from dotenv import load_dotenv
 import pandas as pd
 import os
-import requests
+import hubspot_client
+import run_report
+from export_format import export_path, read_export
+from change_detection import detect_changes, commit_import
 import json
 from datetime import datetime
 import sys
 from country_converter import CountryConverter  
+from column_transforms import cell_text, map_distinct
+import date_utils
 
 load_dotenv()
 
 # config 
 output_dir = '/root/apm/infocentre/apm-export-tables-back/filtered'
 HUBSPOT_API_KEY = os.getenv("PROD_KEY")
-HUBSPOT_IMPORT_API_URL = 'https://api.hubapi.com/crm/v3/imports'
+HUBSPOT_IMPORT_API_URL = f'{hubspot_client.BASE_URL}/crm/v3/imports'
 
 # configuration pour les 4 types
 FILE_TYPES = {
@@ -52,6 +57,7 @@ BASE_COLUMNS = [
     'subscriber_info__status__value', 'active_subscription__club_info__name',
 ]
 
+# dates YYYY-MM-DD -> DD/MM/YYYY
 def convert_date_for_hubspot(date_value):
     if not date_value or pd.isna(date_value):
         return ""
@@ -60,6 +66,10 @@ def convert_date_for_hubspot(date_value):
     except:
         return ""
 
+# même conversion sur une colonne, dates au format YYYY-MM-DD parsées en une passe
+def convert_dates_for_hubspot(series):
+    return date_utils.convert_dates(series, 'dmy', convert_date_for_hubspot, formats=('%Y-%m-%d',), normalize=False)
+
 def convert_civilite(value):
     if not value:
         return ""
@@ -85,18 +95,13 @@ def convert_country_field(value, field_name=""):
     
     original_value = str(value).strip()
     
-    if original_value == "0":
-        return ""
-    
     try:
         if float(original_value) == 0:
             return ""
     except (ValueError, TypeError):
         pass
     
-    converted = CountryConverter.convert_iso_to_country(original_value)
-    
-    return converted
+    return CountryConverter.convert_value(original_value, placeholders=('0',))
 
 def convert_statut_pro(value):
     if not value or pd.isna(value):
@@ -132,10 +137,72 @@ def convert_statut_pro(value):
     return "Autre"
 
 
+# transforme un export contact en lignes d'import hubspot
+def transform_contacts(df, file_type):
+    config = FILE_TYPES[file_type]
+
+    # Nettoyer les noms de colonnes
+    df.columns = df.columns.str.strip()
+    df = df.rename(columns={' CibleAPM': 'Cible APM', 'CibleAPM': 'Cible APM'})
+    
+    if 'Prénom' in df.columns:
+        df = df.rename(columns={'Prénom': 'Prenom'})
+    
+    # inclure les colonnes de base + PK + colonnes spécifiques
+    columns_to_keep = [config['pk']] + BASE_COLUMNS + config.get('specific_columns', [])
+
+    print(f"Colonnes dans le fichier source : {list(df.columns)}")
+    print(f"'Cible APM' dans le fichier ? {'Cible APM' in df.columns}")
+    print(f"Colonnes à garder : {columns_to_keep}")
+
+    available_columns = [col for col in columns_to_keep if col in df.columns]
+    print(f"Colonnes disponibles : {available_columns}")
+    
+    if 'Cible APM' in df.columns and 'Cible APM' not in available_columns:
+        available_columns.append('Cible APM')
+    df_filtered = df[available_columns]
+    
+    if df_filtered.empty:
+        return pd.DataFrame()
+
+    # conversion colonne par colonne
+    data = {}
+    for column in available_columns:
+        values = df_filtered[column]
+
+        if column.startswith('Flag') or column == 'Cible APM':
+            data[column] = map_distinct(values, convert_to_boolean)
+        elif column == 'Civilite':
+            data[column] = map_distinct(values, convert_civilite)
+        elif column in ['Date_naissance', 'DernDateEntree', 'active_subscription__signed_cpp__date']:
+            data[column] = convert_dates_for_hubspot(values)
+        elif column == 'Pays': 
+            data[column] = map_distinct(values, lambda value: convert_country_field(value, "Pays"))
+        elif column == 'Nationalite':  
+            data[column] = map_distinct(values, lambda value: convert_country_field(value, "Nationalité"))
+        elif column == 'StatutPro':
+            data[column] = map_distinct(values, convert_statut_pro)
+        else:
+            data[column] = cell_text(values, strip=True)
+
+    #ajout des colonnes PK
+    data['pk_membre'] = data[config['pk']]
+    role_property = f"pk_{file_type}" if file_type != "adherent_actif" else "pk_adherent"
+    data[role_property] = data[config['pk']]
+
+    if config['pk'] in data:
+        data.pop(config['pk'])
+
+    # profil apm
+    data['profil_apm'] = ";" + config['profil_apm']
+
+    return pd.DataFrame(data).reset_index(drop=True)
+
+
 # traite un fichier selon son type
 def process_file(file_type):
     config = FILE_TYPES[file_type]
-    input_file = f'/root/apm/infocentre/apm-export-tables-back/exports/dwh.mv_{file_type}.csv'
+    input_file = export_path(f'dwh.mv_{file_type}')
     output_file = f'dwh_{file_type}_filtered.csv'
     output_path = os.path.join(output_dir, output_file)
 
@@ -144,71 +211,25 @@ def process_file(file_type):
         return False
     
     try:
-        df = pd.read_csv(input_file)
+        df = read_export(f'dwh.mv_{file_type}')
         
-        # Nettoyer les noms de colonnes
-        df.columns = df.columns.str.strip()
-        df = df.rename(columns={' CibleAPM': 'Cible APM', 'CibleAPM': 'Cible APM'})
-        
-        if 'Prénom' in df.columns:
-            df = df.rename(columns={'Prénom': 'Prenom'})
-        
-        # inclure les colonnes de base + PK + colonnes spécifiques
-        columns_to_keep = [config['pk']] + BASE_COLUMNS + config.get('specific_columns', [])
-
-        print(f"Colonnes dans le fichier source : {list(df.columns)}")
-        print(f"'Cible APM' dans le fichier ? {'Cible APM' in df.columns}")
-        print(f"Colonnes à garder : {columns_to_keep}")
-
-        available_columns = [col for col in columns_to_keep if col in df.columns]
-        print(f"Colonnes disponibles : {available_columns}")
+        with run_report.timed('transform', f'import_contact {file_type}', rows=len(df)):
+            df_processed = transform_contacts(df, file_type)
         
-        if 'Cible APM' in df.columns and 'Cible APM' not in available_columns:
-            available_columns.append('Cible APM')
-        df_filtered = df[available_columns]
+        #seules les lignes nouvelles ou modifiées depuis le dernier import réussi sont envoyées
+        entity = f'contact_{file_type}'
+        df_changed, snapshot = detect_changes(entity, df_processed, 'pk_membre')
         
-        processed_data = []
-        for _, row in df_filtered.iterrows():
-            data = {}
-            
-            for column in available_columns:
-                value = row[column] if pd.notna(row[column]) else ""
-                
-                if column.startswith('Flag') or column == 'Cible APM':
-                    data[column] = convert_to_boolean(value)
-                elif column == 'Civilite':
-                    data[column] = convert_civilite(value)
-                elif column in ['Date_naissance', 'DernDateEntree', 'active_subscription__signed_cpp__date']:
-                    data[column] = convert_date_for_hubspot(value)
-                elif column == 'Pays': 
-                    data[column] = convert_country_field(value, "Pays")
-                elif column == 'Nationalite':  
-                    data[column] = convert_country_field(value, "Nationalité")
-                elif column == 'StatutPro':
-                    data[column] = convert_statut_pro(value)
-                elif column == 'Statut expert':
-                    data[column] = str(value).strip() if value else ""
-                else:
-                    data[column] = str(value).strip() if value else ""
-               
-            
-            #ajout des colonnes PK
-            data['pk_membre'] = data[config['pk']]
-            role_property = f"pk_{file_type}" if file_type != "adherent_actif" else "pk_adherent"
-            data[role_property] = data[config['pk']]
-
-            if config['pk'] in data:
-                data.pop(config['pk'])
-            
-            # profil apm
-            data['profil_apm'] = ";" + config['profil_apm']
-            
-            processed_data.append(data)
+        if df_changed.empty:
+            print(f"aucun {file_type} à envoyer, import ignoré")
+            return True
         
-        pd.DataFrame(processed_data).to_csv(output_path, index=False)
-        print(f"{len(processed_data)} {file_type}s exportés")
+        df_changed.to_csv(output_path, index=False)
+        print(f"{len(df_changed)} {file_type}s exportés")
         
-        upload_success = upload_to_hubspot(output_path, file_type, config)
+        #lignes rejetées par hubspot, None si l'import a échoué : le snapshot est enregistré sans les lignes rejetées
+        errors = upload_to_hubspot(output_path, file_type, config)
+        upload_success = commit_import(entity, snapshot, errors, output_path, 'pk_membre')
         
         if upload_success:
             print(f"import {file_type} réussi")
@@ -318,39 +339,49 @@ def upload_to_hubspot(csv_file_path, file_type, config):
             files = {'files': (f"dwh_{file_type}_filtered.csv", csv_file, 'text/csv')}
             data = {'importRequest': json.dumps(payload)}
             
-            response = requests.post(HUBSPOT_IMPORT_API_URL, headers=headers, files=files, data=data)
+            response = hubspot_client.post(HUBSPOT_IMPORT_API_URL, headers=headers, files=files, data=data)
             
             if response.status_code == 200:
-                return True
+                #import traité en asynchrone par hubspot : attendre sa fin, retourne les lignes rejetées
+                return hubspot_client.wait_for_import_errors(response.json()['id'], headers)
             else:
                 print(f"erreur API: {response.status_code}")
                 print(f"Réponse: {response.text}")  
-                return False
+                return None
             
     except Exception as e:
         print(f"erreur upload {file_type}: {e}")
-        return False
+        return None
 
 
-def main():
+def main(file_type=None):
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
     
-    if len(sys.argv) > 1:
-        file_type = sys.argv[1].lower()
+    if file_type is None and len(sys.argv) > 1:
+        file_type = sys.argv[1]
+    
+    if file_type:
+        file_type = file_type.lower()
         
         if file_type in FILE_TYPES:
             success = process_file(file_type)
         else:
-            return
+            print(f"type de contact inconnu : {file_type}")
+            success = False
     else:
         results = {}
         for file_type in FILE_TYPES.keys():
             results[file_type] = process_file(file_type)
         
-        for file_type, success in results.items():
-            status = "ok" if success else "ko"
+        for file_type, file_success in results.items():
+            status = "ok" if file_success else "ko"
             print(f"{file_type}: {status}")
+        success = all(results.values())
+    
+    if not success:
+        #code retour en erreur : le connecteur saute les étapes qui en dépendent et n'avance pas le watermark
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
@@ -1,16 +1,23 @@
 from dotenv import load_dotenv
+import numpy as np
 import pandas as pd
 import os
-import requests
+import hubspot_client
+import run_report
+from export_format import read_export
+from column_transforms import map_distinct
+import date_utils
+from change_detection import detect_changes, commit_import, export_is_partial
 import json
-from datetime import datetime, timezone
+import sys
+from datetime import datetime
 
 
 load_dotenv()
 
 output_dir = '/root/apm/infocentre/apm-export-tables-back/filtered'
 HUBSPOT_API_KEY = os.getenv("PROD_KEY")
-HUBSPOT_IMPORT_API_URL = 'https://api.hubapi.com/crm/v3/imports'
+HUBSPOT_IMPORT_API_URL = f'{hubspot_client.BASE_URL}/crm/v3/imports'
 
 TRANSACTION_COLUMNS = [
     'PKCycle',
@@ -63,90 +70,107 @@ TRANSACTION_COLUMNS = [
     'dealstage'
 ]
 
+#valeurs vides pour l'entrepôt
+NULL_TOKENS = ['nan', 'null', 'none']
+
+KEY_COLUMNS = ['PKCycle', 'FK_Club', 'FK_Club2', 'FK_Animateur', 'FK_Region', 'FK_Adherent']
+INT_COLUMNS = ['Id_MotifSortie', 'Id_TypeSortie', 'FK_Invoice', 'Membre_Index', 
+               'Id_Membre', 'Id_Taux', 'Id_Proba_renew', 'sent_count_cpp_to_sign', 
+               'Id_Offrespeciale', 'Id_Statut_Adherent']
+# montants et pourcentages
+DECIMAL_COLUMNS = ['DiscountManuel', 'Taux', 'Proba_renew', 'Cotisation_TTC', 'Cotisation_HT', 'TVA']
+BOOLEAN_COLUMNS = ['Renew', 'sent_cpp', 'sent_cpp_to_sign']
+DATETIME_COLUMNS = ['DateCreationCycle', 'DateMAJ', 'DateCreation', 'signed_cpp__date']
+DATE_COLUMNS = ['DateDebut', 'DateFin', 'DateDesinscription']
+
+
+def clean_key(value):
+    return str(value).strip() if value and str(value).strip() and str(value).lower() not in NULL_TOKENS else ""
+
+
+def clean_int(value):
+    try:
+        if value and str(value).strip() and str(value).lower() not in NULL_TOKENS:
+            clean_value = str(value).replace('.0', '').replace(',', '').strip()
+            return int(float(clean_value)) if clean_value.replace('-', '').isdigit() else ""
+        return ""
+    except Exception as e:
+        return ""
+
+
+def clean_decimal(value):
+    try:
+        if value and str(value).strip() and str(value).lower() not in NULL_TOKENS:
+            clean_value = str(value).replace(',', '.').strip()
+            return float(clean_value) if clean_value.replace('.', '').replace('-', '').isdigit() else ""
+        return ""
+    except:
+        return ""
+
+
+def clean_flag(value):
+    if str(value).lower() in ['true', '1', 'yes', 'oui', 'vrai', '1.0', 't']:
+        return True
+    elif str(value).lower() in ['false', '0', 'no', 'non', 'faux', '0.0', 'f']:
+        return False
+    return ""
+
+
+def clean_text(value):
+    return str(value).strip() if value and str(value).lower() not in NULL_TOKENS else ""
+
+
+#conversion des dates d'une colonne, valeurs distinctes au format détecté parsées en une passe
+def convert_dates_to_hubspot_format(series, field_type="datetime"):
+    return date_utils.convert_dates(series, "date" if field_type == "date" else "ms",
+                                    lambda value: convert_date_to_hubspot_format(value, field_type))
+
+
+#nettoyage colonne par colonne, conversions faites une fois par valeur distincte
 def clean_transaction_data(df):
-    processed_data = []
+    if df.empty:
+        return pd.DataFrame()
 
-    if 'PKCycle' in df.columns:
-        for i in range(min(5, len(df))):
-            raw_value = df.iloc[i]['PKCycle']
-    
-    for _, row in df.iterrows():
-        data = {}
-        
-        for column in df.columns:
-            value = row[column] if pd.notna(row[column]) else ""
-
-            if column in ['PKCycle']:
-                data[column] = str(value).strip() if value and str(value).strip() and str(value).lower() not in ['nan', 'null', 'none'] else ""
-
-            elif column in ['FK_Club', 'FK_Club2', 'FK_Animateur', 'FK_Region', 'FK_Adherent']:
-                data[column] = str(value).strip() if value and str(value).strip() and str(value).lower() not in ['nan', 'null', 'none'] else ""
-
-            elif column in ['Id_MotifSortie', 'Id_TypeSortie', 'FK_Invoice', 'Membre_Index', 
-                        'Id_Membre', 'Id_Taux', 'Id_Proba_renew', 'sent_count_cpp_to_sign', 
-                        'Id_Offrespeciale', 'Id_Statut_Adherent']:
-                try:
-                    if value and str(value).strip() and str(value).lower() not in ['nan', 'null', 'none']:
-                        clean_value = str(value).replace('.0', '').replace(',', '').strip()
-                        data[column] = int(float(clean_value)) if clean_value.replace('-', '').isdigit() else ""
-                    else:
-                        data[column] = ""
-                except Exception as e:
-                    data[column] = ""
-            
-            # conversion des montants et pourcentages
-            elif column in ['DiscountManuel', 'Taux', 'Proba_renew', 'Cotisation_TTC', 'Cotisation_HT', 'TVA']:
-                try:
-                    if value and str(value).strip() and str(value).lower() not in ['nan', 'null', 'none']:
-                        clean_value = str(value).replace(',', '.').strip()
-                        data[column] = float(clean_value) if clean_value.replace('.', '').replace('-', '').isdigit() else ""
-                    else:
-                        data[column] = ""
-                except:
-                    data[column] = ""
-            
-            elif column in ['FlagActif']:
-                if str(value).lower() in ['true', '1', 'yes', 'oui', 'vrai', '1.0', 't']:
-                    data[column] = True
-                elif str(value).lower() in ['false', '0', 'no', 'non', 'faux', '0.0', 'f']:
-                    data[column] = False
-                else:
-                    data[column] = ""
-
-            elif column in ['Renew', 'sent_cpp', 'sent_cpp_to_sign']:
-                data[column] = normalize_boolean(value)
-                        
-            #conversion des dates 
-            elif column in ['DateCreationCycle', 'DateMAJ', 'DateCreation', 'signed_cpp__date']:
-                data[column] = convert_date_to_hubspot_format(value, "datetime")
-
-            elif column in ['DateDebut', 'DateFin', 'DateDesinscription']:
-                data[column] = convert_date_to_hubspot_format(value, "date")
-
-            elif column == 'Membre_Type':
-                data[column] = normalize_membre_type(value)
+    data = {}
+    for column in df.columns:
+        values = df[column]
 
-            else:
-                data[column] = str(value).strip() if value and str(value).lower() not in ['nan', 'null', 'none'] else ""
-        
-        prenom = data.get('Membre_Prenom', '').strip()
-        nom = data.get('Membre_Nom', '').strip()
-        
-        if prenom and nom:
-            data['dealname'] = f"[CYCLE] {prenom} {nom}"
-        elif nom:  
-            data['dealname'] = f"[CYCLE] {nom}"
-        else:  
-            pk_cycle = data.get('PKCycle', '')
-            data['dealname'] = f"[CYCLE] {pk_cycle}" if pk_cycle else "[CYCLE] Inconnu"
-        
-        #pipeline et dealstage fixes
-        data['pipeline'] = "1902842079"
-        data['dealstage'] = "2585825492"
-        
-        processed_data.append(data)
+        if column in KEY_COLUMNS:
+            data[column] = map_distinct(values, clean_key)
+        elif column in INT_COLUMNS:
+            data[column] = map_distinct(values, clean_int)
+        elif column in DECIMAL_COLUMNS:
+            data[column] = map_distinct(values, clean_decimal)
+        elif column == 'FlagActif':
+            data[column] = map_distinct(values, clean_flag)
+        elif column in BOOLEAN_COLUMNS:
+            data[column] = map_distinct(values, normalize_boolean)
+        #conversion des dates 
+        elif column in DATETIME_COLUMNS:
+            data[column] = convert_dates_to_hubspot_format(values, "datetime")
+        elif column in DATE_COLUMNS:
+            data[column] = convert_dates_to_hubspot_format(values, "date")
+        elif column == 'Membre_Type':
+            data[column] = map_distinct(values, normalize_membre_type)
+        else:
+            data[column] = map_distinct(values, clean_text)
+
+    empty = pd.Series("", index=df.index, dtype=object)
+    prenom = data.get('Membre_Prenom', empty).str.strip()
+    nom = data.get('Membre_Nom', empty).str.strip()
+    pk_cycle = data.get('PKCycle', empty)
+
+    data['dealname'] = np.where(
+        (prenom != "") & (nom != ""), "[CYCLE] " + prenom + " " + nom,
+        np.where(nom != "", "[CYCLE] " + nom,
+                 np.where(pk_cycle != "", "[CYCLE] " + pk_cycle.astype(str), "[CYCLE] Inconnu"))
+    )
+    
+    #pipeline et dealstage fixes
+    data['pipeline'] = "1902842079"
+    data['dealstage'] = "2585825492"
     
-    return pd.DataFrame(processed_data)
+    return pd.DataFrame(data, index=df.index).reset_index(drop=True)
 
 
 
@@ -190,51 +214,13 @@ def convert_date_to_hubspot_format(date_string, field_type="datetime"):
         return ""
     
     try:
-        date_string = str(date_string).strip()
-        
-        if date_string.endswith('+00'):
-            date_string = date_string[:-3] + '+00:00'
-        
-        #formats de date supportés
-        date_formats = [
-            '%Y-%m-%d %H:%M:%S+00:00',  
-            '%Y-%m-%d %H:%M:%S%z',
-            '%Y-%m-%d %H:%M:%S',
-            '%Y-%m-%d',
-            '%d/%m/%Y %H:%M:%S',
-            '%d/%m/%Y',
-            '%Y-%m-%d %H:%M'
-        ]
+        converted = date_utils.convert_date(date_string, "date" if field_type == "date" else "ms")
         
-        date_obj = None
-        for date_format in date_formats:
-            try:
-                if date_format == '%Y-%m-%d':
-                    date_obj = datetime.strptime(date_string, date_format)
-                    date_obj = date_obj.replace(hour=0, minute=0, second=0, tzinfo=timezone.utc)
-                elif '%z' in date_format or '+00:00' in date_format:
-                    # Pour les dates avec timezone
-                    date_obj = datetime.strptime(date_string, date_format)
-                    # Si pas de timezone info, ajouter UTC
-                    if date_obj.tzinfo is None:
-                        date_obj = date_obj.replace(tzinfo=timezone.utc)
-                else:
-                    date_obj = datetime.strptime(date_string, date_format)
-                    if date_obj.tzinfo is None:
-                        date_obj = date_obj.replace(tzinfo=timezone.utc)
-                break
-            except ValueError:
-                continue
-        
-        if not date_obj:
-            print(f"Format de date non reconnu: {date_string}")
+        if converted is None:
+            print(f"Format de date non reconnu: {date_utils.normalize_date_string(date_string)}")
             return ""
         
-        if field_type == "date":
-            return date_obj.strftime('%Y-%m-%d')
-        else:
-            timestamp_ms = int(date_obj.timestamp() * 1000)
-            return str(timestamp_ms)
+        return str(converted)
             
     except Exception as e:
         print(f"Erreur conversion date {date_string}: {e}")
@@ -242,13 +228,12 @@ def convert_date_to_hubspot_format(date_string, field_type="datetime"):
 
 
 def process_transactions():
-    input_file = '/root/apm/infocentre/apm-export-tables-back/exports/dwh.mv_cycle.csv'
     output_file = 'dwh_transactions_filtered.csv'
     output_path = os.path.join(output_dir, output_file)
     
     try:
         print("Lecture du fichier CSV...")
-        df = pd.read_csv(input_file, dtype=str, low_memory=False)
+        df = read_export('dwh.mv_cycle', as_text=True)
 
         available_columns = [col for col in TRANSACTION_COLUMNS if col in df.columns]
         
@@ -256,11 +241,21 @@ def process_transactions():
         
         df_filtered = df[available_columns]
         
-        df_cleaned = clean_transaction_data(df_filtered)       
+        with run_report.timed('transform', 'import_cycle', rows=len(df_filtered)):
+            df_cleaned = clean_transaction_data(df_filtered)
+        
+        #seules les lignes nouvelles ou modifiées depuis le dernier import réussi sont envoyées
+        df_changed, snapshot = detect_changes('cycle', df_cleaned, 'PKCycle', partial=export_is_partial('dwh.mv_cycle'))
         
-        df_cleaned.to_csv(output_path, index=False)
+        if df_changed.empty:
+            print("aucune transaction à envoyer, import ignoré")
+            return True
         
-        upload_success = upload_transactions_to_hubspot(output_path, available_columns)
+        df_changed.to_csv(output_path, index=False)
+        
+        #lignes rejetées par hubspot, None si l'import a échoué : le snapshot est enregistré sans les lignes rejetées
+        errors = upload_transactions_to_hubspot(output_path, available_columns)
+        upload_success = commit_import('cycle', snapshot, errors, output_path, 'PKCycle')
         
         if upload_success:
             print("import des transactions réussi")
@@ -547,21 +542,22 @@ def upload_transactions_to_hubspot(csv_file_path, available_columns):
             files = {'files': ('dwh_transactions_filtered.csv', csv_file, 'text/csv')}
             data = {'importRequest': json.dumps(payload)}
             
-            response = requests.post(HUBSPOT_IMPORT_API_URL, headers=headers, files=files, data=data)
+            response = hubspot_client.post(HUBSPOT_IMPORT_API_URL, headers=headers, files=files, data=data)
             
             if response.status_code == 200:
                 result = response.json()
                 print("upload réussi")
                 print(f"Import ID: {result.get('id', 'N/A')}")
-                return True
+                #import traité en asynchrone par hubspot : attendre sa fin, retourne les lignes rejetées
+                return hubspot_client.wait_for_import_errors(result['id'], headers)
             else:
                 print(f"erreur API HubSpot: {response.status_code}")
                 print(f"response: {response.text}")
-                return False
+                return None
                 
     except Exception as e:
         print(f"erreur lors de l'upload: {e}")
-        return False
+        return None
 
 def main():
     if not os.path.exists(output_dir):
@@ -573,6 +569,8 @@ def main():
         print("import terminé avec succès")
     else:
         print("échec de l'import")
+        #code retour en erreur pour que le connecteur n'avance pas le watermark
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
@@ -1,16 +1,21 @@
 from dotenv import load_dotenv
 import pandas as pd
 import os
-import requests
+import hubspot_client
+import run_report
+from export_format import read_export
+from column_transforms import cell_text, map_distinct
+import date_utils
 import json
-from datetime import datetime, timezone
+import sys
+from datetime import datetime
 from country_converter import CountryConverter
 
 load_dotenv()
 
 output_dir = '/root/apm/infocentre/apm-export-tables-back/filtered'
 HUBSPOT_API_KEY = os.getenv("PROD_KEY")
-HUBSPOT_IMPORT_API_URL = 'https://api.hubapi.com/crm/v3/imports'
+HUBSPOT_IMPORT_API_URL = f'{hubspot_client.BASE_URL}/crm/v3/imports'
 
 # colonnes à traiter du fichier csv
 EVENT_COLUMNS = [
@@ -85,74 +90,34 @@ def convert_type_presence(value):
     return TYPE_PRESENCE_MAPPING.get(str(value).strip(), str(value).strip())
 
 def convert_country(value):
-    if not value or pd.isna(value) or str(value).strip() == "0":
-        return ""
-    
-    try:
-        return CountryConverter.convert_iso_to_country(str(value).strip())
-    except:
-        return str(value).strip()
+    return CountryConverter.convert_value(value, placeholders=('0',))
+
+#les dates sans heure sont placées à 9h
+EVENT_DATE_HOURS = {'%Y-%m-%d': 9}
 
 def convert_date_to_timestamp(date_string):
     if not date_string or str(date_string).lower() in ['null', 'none', '', 'nan']:
         return ""  
     try:
-        date_string = str(date_string).strip()
-        
-        if date_string.endswith('+00'):
-            date_string = date_string[:-3] + '+00:00'
-        
-        #différents formats de date
-        date_formats = [
-            '%Y-%m-%d %H:%M:%S+00:00',  
-            '%Y-%m-%d %H:%M:%S%z',      
-            '%Y-%m-%d %H:%M:%S',
-            '%Y-%m-%d',
-            '%d/%m/%Y %H:%M:%S',
-            '%d/%m/%Y',
-            '%Y-%m-%d %H:%M'
-        ]
-        
-        for date_format in date_formats:
-            try:
-                if date_format == '%Y-%m-%d':
-                    date_obj = datetime.strptime(date_string, date_format)
-                    date_obj = date_obj.replace(hour=9, minute=0, second=0, tzinfo=timezone.utc)
-                elif '%z' in date_format or '+00:00' in date_format:
-                    date_obj = datetime.strptime(date_string, date_format)
-                    if date_obj.tzinfo is None:
-                        date_obj = date_obj.replace(tzinfo=timezone.utc)
-                else:
-                    date_obj = datetime.strptime(date_string, date_format)
-                    date_obj = date_obj.replace(tzinfo=timezone.utc)
-                
-                timestamp_ms = int(date_obj.timestamp() * 1000)
-                return str(timestamp_ms)
-            except ValueError:
-                continue
-        
-        print(f"Format de date non reconnu: {date_string}")
-        return ""
+        timestamp_ms = date_utils.convert_date(date_string, 'ms', date_hours=EVENT_DATE_HOURS)
+        if timestamp_ms is None:
+            print(f"Format de date non reconnu: {date_utils.normalize_date_string(date_string)}")
+            return ""
+        return str(timestamp_ms)
     except Exception as e:
         print(f"Erreur conversion date {date_string}: {e}")
         return ""
 
 
+ANNULATION_DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y', '%Y-%m-%d %H:%M:%S')
+
 def format_date(value):
     if not value or pd.isna(value):
         return ""
     
     try:
-        value_str = str(value).strip()
-        formats = ['%Y-%m-%d', '%d/%m/%Y', '%Y-%m-%d %H:%M:%S']
-        
-        for fmt in formats:
-            try:
-                dt = datetime.strptime(value_str, fmt)
-                return dt.strftime('%Y-%m-%d')
-            except ValueError:
-                continue
-        return ""
+        converted = date_utils.convert_date(str(value).strip(), 'date', formats=ANNULATION_DATE_FORMATS, normalize=False)
+        return converted or ""
     except:
         return ""
 
@@ -178,58 +143,58 @@ def convert_to_float(value):
         return ""
 
 
+# colonnes dates
+DATE_COLUMNS = ['DateAnnulation']
+
+# colonnes datetime (date + heure)
+DATETIME_COLUMNS = ['Date', 'Date_Creation', 'Date_MAJ']
+
+FLOAT_COLUMNS = ['TxPresence', 'TxPresence2', 'SatisfactionGlobale', 
+                 'SatisfactionGlobale2', 'SatisfactionGlobale3']
+
+NUMERIC_COLUMNS = ['IdEvt', 'IdInter', 'IdTypeEvt', 'NbAdherents', 'NbInvites', 
+                   'NbParticipants', 'IdStatut', 'NbEvaluations', 'IdModePaiement']
+
+def convert_name(value):
+    return "A renommer" if not value or str(value).strip().lower() in ['', 'none', 'null'] else str(value).strip()
+
+#nettoyage colonne par colonne, conversions faites une fois par valeur distincte
 def clean_data(df):
-    # colonnes dates
-    date_columns = ['DateAnnulation']
-    
-    # colonnes datetime (date + heure)
-    datetime_columns = ['Date', 'Date_Creation', 'Date_MAJ']
+    if df.empty:
+        return pd.DataFrame()
 
-    float_columns = ['TxPresence', 'TxPresence2', 'SatisfactionGlobale', 
-                    'SatisfactionGlobale2', 'SatisfactionGlobale3']
-    
-    numeric_columns = ['IdEvt', 'IdInter', 'IdTypeEvt', 'NbAdherents', 'NbInvites', 
-                      'NbParticipants', 'IdStatut', 'NbEvaluations', 'IdModePaiement']
-    
-    cleaned_data = []
-    
-    for _, row in df.iterrows():
-        data = {}
-        
-        for column in df.columns:
-            value = row[column] if pd.notna(row[column]) else ""
-            
-            # traitement spécifique par colonne
-            if column == 'Nom':
-                data[column] = "A renommer" if not value or str(value).strip().lower() in ['', 'none', 'null'] else str(value).strip()
-            elif column == 'TypePresence':
-                data[column] = convert_type_presence(value)
-            elif column == 'TypeEvt':  
-                data[column] = convert_type_event(value)
-            elif column == 'Pays':
-                data[column] = convert_country(value)
-            elif column in datetime_columns:  
-                data[column] = convert_date_to_timestamp(value)
-            elif column in date_columns:
-                data[column] = format_date(value)
-            elif column in float_columns:  
-                data[column] = convert_to_float(value)
-            elif column in numeric_columns:
-                data[column] = convert_to_int(value)
-            else:
-                data[column] = str(value).strip() if value else ""
-        
-        cleaned_data.append(data)
+    data = {}
+    for column in df.columns:
+        values = df[column]
+
+        # traitement spécifique par colonne
+        if column == 'Nom':
+            data[column] = map_distinct(values, convert_name)
+        elif column == 'TypePresence':
+            data[column] = map_distinct(values, convert_type_presence)
+        elif column == 'TypeEvt':  
+            data[column] = map_distinct(values, convert_type_event)
+        elif column == 'Pays':
+            data[column] = CountryConverter.convert_series(values, placeholders=('0',))
+        elif column in DATETIME_COLUMNS:  
+            data[column] = date_utils.convert_dates(values, 'ms', convert_date_to_timestamp, date_hours=EVENT_DATE_HOURS)
+        elif column in DATE_COLUMNS:
+            data[column] = date_utils.convert_dates(values, 'date', format_date, formats=ANNULATION_DATE_FORMATS, normalize=False)
+        elif column in FLOAT_COLUMNS:  
+            data[column] = map_distinct(values, convert_to_float)
+        elif column in NUMERIC_COLUMNS:
+            data[column] = map_distinct(values, convert_to_int)
+        else:
+            data[column] = cell_text(values, strip=True)
     
-    return pd.DataFrame(cleaned_data)
+    return pd.DataFrame(data, index=df.index).reset_index(drop=True)
 
 def process_events():
-    input_file = '/root/apm/infocentre/apm-export-tables-back/exports/dwh.mv_evt.csv'
     output_file = 'dwh_evenement_filtered.csv'
     output_path = os.path.join(output_dir, output_file)
     
     try:
-        df = pd.read_csv(input_file)
+        df = read_export('dwh.mv_evt')
         
         # vérifier les colonnes disponibles
         available_columns = [col for col in EVENT_COLUMNS if col in df.columns]
@@ -240,7 +205,8 @@ def process_events():
         
         # filtrer et nettoyer
         df_filtered = df[available_columns]
-        df_cleaned = clean_data(df_filtered)
+        with run_report.timed('transform', 'import_event_custom', rows=len(df_filtered)):
+            df_cleaned = clean_data(df_filtered)
         
         # sauvegarder
         df_cleaned.to_csv(output_path, index=False)
@@ -302,12 +268,13 @@ def upload_to_hubspot(csv_file_path, available_columns):
             files = {'files': ('dwh_evenement_filtered.csv', csv_file, 'text/csv')}
             data = {'importRequest': json_payload}
             
-            response = requests.post(HUBSPOT_IMPORT_API_URL, headers=headers, files=files, data=data)
+            response = hubspot_client.post(HUBSPOT_IMPORT_API_URL, headers=headers, files=files, data=data)
             
             if response.status_code == 200:
                 result = response.json()
                 print(f"✅ Upload réussi - ID: {result.get('id', 'N/A')}")
-                return True
+                #import traité en asynchrone par hubspot : les associations attendent sa fin
+                return hubspot_client.wait_for_import(result['id'], headers)
             else:
                 print(f"❌ Erreur upload: {response.status_code}")
                 try:
@@ -330,6 +297,9 @@ def main():
     
     success = process_events()
     print("terminé" if success else "échec")
+    if not success:
+        #code retour en erreur : le connecteur saute les étapes qui en dépendent
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
@@ -1,20 +1,21 @@
-import csv
 import json
+from contextlib import closing
 import os
-import time
 from dotenv import load_dotenv
-import requests
-from datetime import datetime, timezone
+import hubspot_client
+import run_report
+from export_format import iter_export_rows
+import date_utils
 from country_converter import CountryConverter
 
 load_dotenv()
 
 # configuration
-filename = "/root/apm/infocentre/apm-export-tables-back/exports/dwh.mv_evt.csv"
+table = "dwh.mv_evt"
 access_token = os.getenv("PROD_KEY")
 
 
-def read_csv_data(filename, max_rows=100, start_row=0):
+def read_csv_data(table, max_rows=100, start_row=0):
     # mapping des colonnes csv vers les propriétés hubspot
     columns_mapping = {
         'pk_evt': 'pk_evenement',
@@ -63,8 +64,7 @@ def read_csv_data(filename, max_rows=100, start_row=0):
     events_data = []
     current_row = 0
     
-    with open(filename, 'r', encoding='utf-8') as file:
-        reader = csv.DictReader(file, delimiter=',')
+    with closing(iter_export_rows(table)) as reader:
         
         for row in reader:
             if current_row < start_row:
@@ -150,8 +150,7 @@ def read_csv_data(filename, max_rows=100, start_row=0):
             # conversion de la date au format iso pour hubspot
             if row.get('Date'):
                 try:
-                    date_obj = datetime.strptime(row['Date'], '%Y-%m-%d %H:%M')
-                    event_data['start_datetime'] = date_obj.isoformat() + '.000Z'
+                    event_data['start_datetime'] = date_utils.convert_date(row['Date'], 'iso_z', formats=('%Y-%m-%d %H:%M',), normalize=False) or ''
                 except:
                     event_data['start_datetime'] = ''
             else:
@@ -226,13 +225,13 @@ def create_hubspot_payload(events_data):
 
 
 def send_to_hubspot(payload, access_token):
-    url = "https://api.hubapi.com/marketing/v3/marketing-events/events/upsert"
+    url = f"{hubspot_client.BASE_URL}/marketing/v3/marketing-events/events/upsert"
     headers = {
         "Authorization": f"Bearer {access_token}",
         "Content-Type": "application/json"
     }
     
-    response = requests.post(url, json=payload, headers=headers)
+    response = hubspot_client.post(url, json=payload, headers=headers)
     
     if response.status_code in [200, 201]:
         print("import réussi")
@@ -246,51 +245,15 @@ def convert_date_to_timestamp(date_string):
     if not date_string or date_string.lower() in ['null', 'none', '']:
         return None
     try:
-        date_string = str(date_string).strip()
-        
-        # 🚀 CORRECTION : Normaliser +00 vers +00:00
-        if date_string.endswith('+00'):
-            date_string = date_string[:-3] + '+00:00'
-        
-        # Essayer différents formats de date
-        date_formats = [
-            '%Y-%m-%d %H:%M:%S+00:00',  # ← Format principal avec timezone normalisée
-            '%Y-%m-%d %H:%M:%S%z',      # avec timezone
-            '%Y-%m-%d %H:%M:%S',
-            '%Y-%m-%d',
-            '%d/%m/%Y %H:%M:%S',
-            '%d/%m/%Y',
-            '%Y-%m-%d %H:%M'
-        ]
-        
-        for date_format in date_formats:
-            try:
-                if date_format == '%Y-%m-%d':
-                    date_obj = datetime.strptime(date_string, date_format)
-                    date_obj = date_obj.replace(hour=0, minute=0, second=0, tzinfo=timezone.utc)
-                elif '%z' in date_format or '+00:00' in date_format:
-                    # Pour les dates avec timezone
-                    date_obj = datetime.strptime(date_string, date_format)
-                    # Si pas de timezone info, ajouter UTC
-                    if date_obj.tzinfo is None:
-                        date_obj = date_obj.replace(tzinfo=timezone.utc)
-                else:
-                    date_obj = datetime.strptime(date_string, date_format)
-                    date_obj = date_obj.replace(tzinfo=timezone.utc)
-                
-                timestamp_ms = int(date_obj.timestamp() * 1000)
-                return str(timestamp_ms)
-            except ValueError:
-                continue
-        
-        print(f"Format de date non reconnu: {date_string}")
-        return None
+        timestamp_ms = date_utils.convert_date(date_string, 'ms')
+        if timestamp_ms is None:
+            print(f"Format de date non reconnu: {date_utils.normalize_date_string(date_string)}")
+            return None
+        return str(timestamp_ms)
     except Exception as e:
         print(f"Erreur conversion date {date_string}: {e}")
         return None
 
-
-
 def map_type_presence(value):
     # normalisation des valeurs de type de présence
     mapping = {
@@ -302,14 +265,14 @@ def map_type_presence(value):
     return mapping.get(value, value)  
 
 
-def process_all_events_in_batches(filename, access_token, batch_size=100):
+def process_all_events_in_batches(table, access_token, batch_size=100):
     total_processed = 0
     total_errors = 0
     start_row = 0
     
     # traitement par lots pour éviter les timeouts et limites api
     while True:
-        events_data = read_csv_data(filename, batch_size, start_row)
+        events_data = read_csv_data(table, batch_size, start_row)
         
         if not events_data:
             break
@@ -322,9 +285,9 @@ def process_all_events_in_batches(filename, access_token, batch_size=100):
             start_row += batch_size
             continue
         
-        result = send_to_hubspot(payload, access_token)
-
-        time.sleep(1)
+        with run_report.timed('batch', 'import_event_marketing', rows=len(payload["inputs"])) as fields:
+            result = send_to_hubspot(payload, access_token)
+            fields['status'] = 'ok' if result else 'error'
         
         if result:
             total_processed += len(payload["inputs"])
@@ -342,5 +305,9 @@ def process_all_events_in_batches(filename, access_token, batch_size=100):
     return total_processed
 
 
-total_imported = process_all_events_in_batches(filename, access_token)
-print(f"import termine: {total_imported} evenements")
+def main():
+    total_imported = process_all_events_in_batches(table, access_token)
+    print(f"import termine: {total_imported} evenements")
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,20 @@
 import os
 from dotenv import load_dotenv
-import requests
+import hubspot_client
+import run_report
+from export_format import iter_export_rows
 import csv
 import tempfile
 import json
-from datetime import datetime, timezone
+from contextlib import closing
+import date_utils
 
 load_dotenv()
 
 #configuration
 API_KEY = os.getenv("PROD_KEY")
 TABLE_ID = "583148785"
-CSV_FILE = "/root/apm/infocentre/apm-export-tables-back/exports/dwh.mv_expertise.csv"
+EXPORT_TABLE = "dwh.mv_expertise"
 SUBDOMAIN_TABLE_ID = "348960978"
 
 #normaliser la clé
@@ -46,11 +49,7 @@ def convert_date_iso(date_string):
         date_string = str(date_string).strip()
         
         if len(date_string) == 19 and ' ' in date_string:
-            date_obj = datetime.strptime(date_string, '%Y-%m-%d %H:%M:%S')
-            
-            iso_date = date_obj.strftime('%Y-%m-%dT%H:%M:%S')
-            
-            return iso_date
+            return date_utils.convert_date(date_string, 'iso', formats=('%Y-%m-%d %H:%M:%S',), normalize=False) or ""
             
     except Exception as e:
         return ""
@@ -117,11 +116,11 @@ def convert_type_intervention(value):
 
 #récupère les clés existantes dans la hubdb
 def get_existing_keys():
-    url = f"https://api.hubapi.com/cms/v3/hubdb/tables/{TABLE_ID}/rows"
+    url = f"{hubspot_client.BASE_URL}/cms/v3/hubdb/tables/{TABLE_ID}/rows"
     headers = {"Authorization": f"Bearer {API_KEY}"}
     
     try:
-        response = requests.get(url, headers=headers)
+        response = hubspot_client.get(url, headers=headers)
         
         if response.status_code == 200:
             data = response.json()
@@ -144,11 +143,11 @@ def get_existing_keys():
 
 #crée le mapping des sous-domaine
 def get_subdomain_mapping():
-    subdomain_url = f"https://api.hubapi.com/cms/v3/hubdb/tables/{SUBDOMAIN_TABLE_ID}/rows"
+    subdomain_url = f"{hubspot_client.BASE_URL}/cms/v3/hubdb/tables/{SUBDOMAIN_TABLE_ID}/rows"
     headers = {"Authorization": f"Bearer {API_KEY}"}
     
     try:
-        response = requests.get(subdomain_url, headers=headers)
+        response = hubspot_client.get(subdomain_url, headers=headers)
         
         if response.status_code == 200:
             data = response.json()
@@ -207,8 +206,7 @@ def process_csv_data(hubdb_keys):
     seen_keys = set()
     duplicate_count = 0
     
-    with open(CSV_FILE, mode='r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
+    with closing(iter_export_rows(EXPORT_TABLE)) as reader:
         
         for row in reader:
             original_key = str(row.get('PKExpertise', '')).strip()
@@ -361,7 +359,7 @@ def import_to_hubdb(temp_file):
     if not temp_file:
         return None
 
-    import_url = f"https://api.hubapi.com/cms/v3/hubdb/tables/{TABLE_ID}/draft/import"
+    import_url = f"{hubspot_client.BASE_URL}/cms/v3/hubdb/tables/{TABLE_ID}/draft/import"
     
     config = {
         "skipRows": 1,
@@ -442,7 +440,7 @@ def import_to_hubdb(temp_file):
             }
             
             headers = {"Authorization": f"Bearer {API_KEY}"}
-            response = requests.post(import_url, files=files, headers=headers, timeout=300)
+            response = hubspot_client.post(import_url, files=files, headers=headers, timeout=300)
 
             return response
             
@@ -452,10 +450,10 @@ def import_to_hubdb(temp_file):
 
 #publier table hubdb
 def publish_table():
-    publish_url = f"https://api.hubapi.com/cms/v3/hubdb/tables/{TABLE_ID}/draft/publish"
+    publish_url = f"{hubspot_client.BASE_URL}/cms/v3/hubdb/tables/{TABLE_ID}/draft/publish"
     headers = {"Authorization": f"Bearer {API_KEY}"}
     
-    response = requests.post(publish_url, headers=headers)
+    response = hubspot_client.post(publish_url, headers=headers)
     
     if response.status_code == 200:
         print("table publiée avec succès")
@@ -483,7 +481,8 @@ def main():
         return
     
     # 3 préparer le fichier
-    temp_file = prepare_import_file(all_data, subdomain_mapping)
+    with run_report.timed('transform', 'import_expertises_hubdb', rows=len(all_data)):
+        temp_file = prepare_import_file(all_data, subdomain_mapping)
     
     if temp_file:
         
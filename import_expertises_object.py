@@ -1,15 +1,21 @@
 from dotenv import load_dotenv
 import pandas as pd
 import os
-import requests
+import hubspot_client
+import run_report
+from export_format import read_export
+from column_transforms import map_distinct
+import date_utils
+from change_detection import detect_changes, commit_import
 import json
-from datetime import datetime, timezone
+import sys
+from datetime import datetime
 
 load_dotenv()
 
 output_dir = '/root/apm/infocentre/apm-export-tables-back/filtered'
 HUBSPOT_API_KEY = os.getenv("PROD_KEY")
-HUBSPOT_IMPORT_API_URL = 'https://api.hubapi.com/crm/v3/imports'
+HUBSPOT_IMPORT_API_URL = f'{hubspot_client.BASE_URL}/crm/v3/imports'
 
 EXPERTISE_COLUMNS = [
     'PKExpertise', 'FK_Expert', 'FK_Experts', 'IdExpert', 'IdStatut', 'Statut',
@@ -28,63 +34,68 @@ EXPERTISE_COLUMNS = [
     'stats__presence_rate', 'stats__innovation_source', 'DateCreation', 'DateMAJ'
 ]
 
-def clean_expertise_data(df):
-    processed_data = []
+#valeurs vides pour l'entrepôt
+NULL_TOKENS = ['nan', 'null', 'none']
 
-    if 'PKExpertise' in df.columns:
-        for i in range(min(5, len(df))):
-            raw_value = df.iloc[i]['PKExpertise']
-    
-    for _, row in df.iterrows():
-        data = {}
-        
-        for column in df.columns:
-            value = row[column] if pd.notna(row[column]) else ""
+KEY_COLUMNS = ['PKExpertise', 'FK_Expert', 'FK_Experts', 'IdExpert', 'expert__exp_id']
+INT_COLUMNS = ['IdStatut', 'Id_TypeIntervention', 'IdModalite', 'exti_id__id', 
+               'order_of_preference', 'format__id', 'fo_id', 'domain__id', 
+               'domain__subdomain__id', 'interclub_max_club', 'stats__number_of_subscribers_evaluations', 
+               'stats__number_of_events']
+# stats et pourcentages
+DECIMAL_COLUMNS = ['stats__global_satisfaction', 'stats__interest_for_concept', 'stats__capacity_for_dialogue',
+                   'stats__clarity_of_ideas', 'stats__presence_rate', 'stats__innovation_source']
+BOOLEAN_COLUMNS = ['theme_under_surveillance', 'is_opca', 'is_opco', 'can_be_remote', 'voyage']
+DATETIME_COLUMNS = ['DateCreation', 'DateMAJ']
 
-            if column in ['PKExpertise']:
-                data[column] = str(value).strip() if value and str(value).strip() and str(value).lower() not in ['nan', 'null', 'none'] else ""
+def clean_key(value):
+    return str(value).strip() if value and str(value).strip() and str(value).lower() not in NULL_TOKENS else ""
 
-            elif column in ['FK_Expert', 'FK_Experts', 'IdExpert', 'expert__exp_id']:
-                data[column] = str(value).strip() if value and str(value).strip() and str(value).lower() not in ['nan', 'null', 'none'] else ""
+def clean_int(value):
+    try:
+        if value and str(value).strip() and str(value).lower() not in NULL_TOKENS:
+            clean_value = str(value).replace('.0', '').replace(',', '').strip()
+            return int(float(clean_value)) if clean_value.replace('-', '').isdigit() else ""
+        return ""
+    except Exception as e:
+        return ""
 
-            elif column in ['IdStatut', 'Id_TypeIntervention', 'IdModalite', 'exti_id__id', 
-                        'order_of_preference', 'format__id', 'fo_id', 'domain__id', 
-                        'domain__subdomain__id', 'interclub_max_club', 'stats__number_of_subscribers_evaluations', 
-                        'stats__number_of_events']:
-                try:
-                    if value and str(value).strip() and str(value).lower() not in ['nan', 'null', 'none']:
-                        clean_value = str(value).replace('.0', '').replace(',', '').strip()
-                        data[column] = int(float(clean_value)) if clean_value.replace('-', '').isdigit() else ""
-                    else:
-                        data[column] = ""
-                except Exception as e:
-                    data[column] = ""
-            
-            # conversion des stats et pourcentages
-            elif column in ['stats__global_satisfaction', 'stats__interest_for_concept', 'stats__capacity_for_dialogue',
-                          'stats__clarity_of_ideas', 'stats__presence_rate', 'stats__innovation_source']:
-                try:
-                    if value and str(value).strip() and str(value).lower() not in ['nan', 'null', 'none']:
-                        clean_value = str(value).replace(',', '.').strip()
-                        data[column] = float(clean_value) if clean_value.replace('.', '').replace('-', '').isdigit() else ""
-                    else:
-                        data[column] = ""
-                except:
-                    data[column] = ""
+def clean_decimal(value):
+    try:
+        if value and str(value).strip() and str(value).lower() not in NULL_TOKENS:
+            clean_value = str(value).replace(',', '.').strip()
+            return float(clean_value) if clean_value.replace('.', '').replace('-', '').isdigit() else ""
+        return ""
+    except:
+        return ""
 
-            elif column in ['theme_under_surveillance', 'is_opca', 'is_opco', 'can_be_remote', 'voyage']:
-                data[column] = convert_boolean(value)
-                        
-            #conversion des dates 
-            elif column in ['DateCreation', 'DateMAJ']:
-                data[column] = convert_date_to_hubspot_format(value, "datetime")
+def clean_text(value):
+    return str(value).strip() if value and str(value).lower() not in NULL_TOKENS else ""
 
-            else:
-                data[column] = str(value).strip() if value and str(value).lower() not in ['nan', 'null', 'none'] else ""
-        
-        processed_data.append(data)
+#nettoyage colonne par colonne, conversions faites une fois par valeur distincte
+def clean_expertise_data(df):
+    if df.empty:
+        return pd.DataFrame()
+
+    data = {}
+    for column in df.columns:
+        values = df[column]
+
+        if column in KEY_COLUMNS:
+            data[column] = map_distinct(values, clean_key)
+        elif column in INT_COLUMNS:
+            data[column] = map_distinct(values, clean_int)
+        elif column in DECIMAL_COLUMNS:
+            data[column] = map_distinct(values, clean_decimal)
+        elif column in BOOLEAN_COLUMNS:
+            data[column] = map_distinct(values, convert_boolean)
+        #conversion des dates 
+        elif column in DATETIME_COLUMNS:
+            data[column] = convert_dates_to_hubspot_format(values, "datetime")
+        else:
+            data[column] = map_distinct(values, clean_text)
     
-    return pd.DataFrame(processed_data)
+    return pd.DataFrame(data, index=df.index).reset_index(drop=True)
 
 def convert_boolean(value):
     if not value:
@@ -105,64 +116,30 @@ def convert_date_to_hubspot_format(date_string, field_type="datetime"):
         return ""
     
     try:
-        date_string = str(date_string).strip()
-        
-        if date_string.endswith('+00'):
-            date_string = date_string[:-3] + '+00:00'
-        
-        #formats de date supportés
-        date_formats = [
-            '%Y-%m-%d %H:%M:%S+00:00',  
-            '%Y-%m-%d %H:%M:%S%z',
-            '%Y-%m-%d %H:%M:%S',
-            '%Y-%m-%d',
-            '%d/%m/%Y %H:%M:%S',
-            '%d/%m/%Y',
-            '%Y-%m-%d %H:%M'
-        ]
-        
-        date_obj = None
-        for date_format in date_formats:
-            try:
-                if date_format == '%Y-%m-%d':
-                    date_obj = datetime.strptime(date_string, date_format)
-                    date_obj = date_obj.replace(hour=0, minute=0, second=0, tzinfo=timezone.utc)
-                elif '%z' in date_format or '+00:00' in date_format:
-                    # Pour les dates avec timezone
-                    date_obj = datetime.strptime(date_string, date_format)
-                    # Si pas de timezone info, ajouter UTC
-                    if date_obj.tzinfo is None:
-                        date_obj = date_obj.replace(tzinfo=timezone.utc)
-                else:
-                    date_obj = datetime.strptime(date_string, date_format)
-                    if date_obj.tzinfo is None:
-                        date_obj = date_obj.replace(tzinfo=timezone.utc)
-                break
-            except ValueError:
-                continue
+        converted = date_utils.convert_date(date_string, "date" if field_type == "date" else "ms")
         
-        if not date_obj:
-            print(f"Format de date non reconnu: {date_string}")
+        if converted is None:
+            print(f"Format de date non reconnu: {date_utils.normalize_date_string(date_string)}")
             return ""
         
-        if field_type == "date":
-            return date_obj.strftime('%Y-%m-%d')
-        else:
-            timestamp_ms = int(date_obj.timestamp() * 1000)
-            return str(timestamp_ms)
+        return str(converted)
             
     except Exception as e:
         print(f"Erreur conversion date {date_string}: {e}")
         return ""
 
+
+def convert_dates_to_hubspot_format(series, field_type="datetime"):
+    return date_utils.convert_dates(series, "date" if field_type == "date" else "ms",
+                                    lambda value: convert_date_to_hubspot_format(value, field_type))
+
 def process_expertises():
-    input_file = '/root/apm/infocentre/apm-export-tables-back/exports/dwh.mv_expertise.csv'
     output_file = 'expertise_filtered.csv'
     output_path = os.path.join(output_dir, output_file)
     
     try:
         print("Lecture du fichier CSV...")
-        df = pd.read_csv(input_file, dtype=str, low_memory=False)
+        df = read_export('dwh.mv_expertise', as_text=True)
 
         available_columns = [col for col in EXPERTISE_COLUMNS if col in df.columns]
         
@@ -170,11 +147,21 @@ def process_expertises():
         
         df_filtered = df[available_columns]
         
-        df_cleaned = clean_expertise_data(df_filtered)       
+        with run_report.timed('transform', 'import_expertises_object', rows=len(df_filtered)):
+            df_cleaned = clean_expertise_data(df_filtered)
         
-        df_cleaned.to_csv(output_path, index=False)
+        #seules les lignes nouvelles ou modifiées depuis le dernier import réussi sont envoyées
+        df_changed, snapshot = detect_changes('expertises_object', df_cleaned, 'PKExpertise')
         
-        upload_success = upload_expertises_to_hubspot(output_path, available_columns)
+        if df_changed.empty:
+            print("aucune expertise à envoyer, import ignoré")
+            return True
+        
+        df_changed.to_csv(output_path, index=False)
+        
+        #lignes rejetées par hubspot, None si l'import a échoué : le snapshot est enregistré sans les lignes rejetées
+        errors = upload_expertises_to_hubspot(output_path, available_columns)
+        upload_success = commit_import('expertises_object', snapshot, errors, output_path, 'PKExpertise')
         
         if upload_success:
             print("import des expertises réussi")
@@ -514,21 +501,22 @@ def upload_expertises_to_hubspot(csv_file_path, available_columns):
             files = {'files': ('expertise_filtered.csv', csv_file, 'text/csv')}
             data = {'importRequest': json.dumps(payload)}
             
-            response = requests.post(HUBSPOT_IMPORT_API_URL, headers=headers, files=files, data=data)
+            response = hubspot_client.post(HUBSPOT_IMPORT_API_URL, headers=headers, files=files, data=data)
             
             if response.status_code == 200:
                 result = response.json()
                 print("upload réussi")
                 print(f"Import ID: {result.get('id', 'N/A')}")
-                return True
+                #import traité en asynchrone par hubspot : attendre sa fin, retourne les lignes rejetées
+                return hubspot_client.wait_for_import_errors(result['id'], headers)
             else:
                 print(f"erreur API HubSpot: {response.status_code}")
                 print(f"response: {response.text}")
-                return False
+                return None
                 
     except Exception as e:
         print(f"erreur lors de l'upload: {e}")
-        return False
+        return None
 
 def main():
     if not os.path.exists(output_dir):
@@ -540,6 +528,8 @@ def main():
         print("import terminé avec succès")
     else:
         print("échec de l'import")
+        #code retour en erreur : le connecteur saute les étapes qui en dépendent et n'avance pas le watermark
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
@@ -1,21 +1,25 @@
-import csv
 import json
+from contextlib import closing
 import os
+import sys
 from dotenv import load_dotenv
-import requests
-from datetime import datetime, timezone
+import hubspot_client
+import run_report
+import state_store
+from export_format import iter_export_rows
+import date_utils
 import time
 
 load_dotenv()
 
 # Config
-filename = "/root/apm/infocentre/apm-export-tables-back/exports/dwh.mv_participation.csv"  
+table = "dwh.mv_participation"  
 access_token = os.getenv("PROD_KEY")
 max_participations = 1
 batch_size = 10
 
 def get_existing_participations(access_token, event_type="pe144476884_evenement___participation", limit=100):    
-    url = f"https://api.hubapi.com/events/v3/events"
+    url = f"{hubspot_client.BASE_URL}/events/v3/events"
     headers = {
         "Authorization": f"Bearer {access_token}",
         "Content-Type": "application/json"
@@ -38,7 +42,7 @@ def get_existing_participations(access_token, event_type="pe144476884_evenement_
             params["after"] = after
         
         try:
-            response = requests.get(url, headers=headers, params=params)
+            response = hubspot_client.get(url, headers=headers, params=params)
             
             if response.status_code == 200:
                 data = response.json()
@@ -51,7 +55,6 @@ def get_existing_participations(access_token, event_type="pe144476884_evenement_
                 paging = data.get("paging", {})
                 if "next" in paging:
                     after = paging["next"].get("after")
-                    time.sleep(0.1)  
                 else:
                     print("Fin de pagination atteinte")
                     break
@@ -103,7 +106,7 @@ def extract_existing_participation_keys(existing_participations):
             existing_keys.add(pkparticipation)
     return existing_keys
 
-def read_participation_data(filename, max_rows=100):
+def read_participation_data(table, max_rows=100):
     columns_mapping = {
         'PKParticipation': 'pkparticipation',
         'FK_Membre': 'fk_membre', 
@@ -127,8 +130,7 @@ def read_participation_data(filename, max_rows=100):
     participations_data = []
     
     try:
-        with open(filename, 'r', encoding='utf-8') as file:
-            reader = csv.DictReader(file, delimiter=',')
+        with closing(iter_export_rows(table)) as reader:
                         
             for row in reader:
 
@@ -174,26 +176,21 @@ def convert_to_boolean(value):
     else:
         return ""
 
+#les dates sans heure sont placées à midi
+DATE_HOURS = {'%Y-%m-%d': 12, '%d/%m/%Y': 12}
+
+TIMESTAMP_FORMATS = ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d', '%d/%m/%Y %H:%M:%S', '%d/%m/%Y')
+
 def convert_date_to_iso(date_string):
     if not date_string or date_string.lower() in ['null', 'none', '']:
         return None
     
     try:
-        formats = [  '%Y-%m-%dT%H:%M:%S',  '%Y-%m-%d %H:%M:%S', '%Y-%m-%d', '%d/%m/%Y %H:%M:%S', '%d/%m/%Y']
-        
-        for fmt in formats:
-            try:
-                date_obj = datetime.strptime(date_string, fmt)
-                if fmt == '%Y-%m-%d' or fmt == '%d/%m/%Y':
-                    date_obj = date_obj.replace(hour=12, minute=0, second=0)
-                
-                date_obj = date_obj.replace(tzinfo=timezone.utc)
-                return date_obj.isoformat().replace('+00:00', '.000Z')
-            except ValueError:
-                continue
-        
-        print(f"date non convertible: '{date_string}'")
-        return None
+        converted = date_utils.convert_date(date_string, 'iso_z', formats=date_utils.BEHAVIORAL_FORMATS,
+                                            date_hours=DATE_HOURS, normalize=False)
+        if converted is None:
+            print(f"date non convertible: '{date_string}'")
+        return converted
     except Exception as e:
         print(f"erreur conversion date: {e}")
         return None
@@ -203,17 +200,7 @@ def convert_date_to_timestamp(date_string):
         return None
     
     try:
-        formats = ['%Y-%m-%d %H:%M:%S', '%Y-%m-%d', '%d/%m/%Y %H:%M:%S', '%d/%m/%Y']
-        
-        for fmt in formats:
-            try:
-                date_obj = datetime.strptime(date_string, fmt)
-                date_obj = date_obj.replace(tzinfo=timezone.utc)
-                return int(date_obj.timestamp() * 1000)
-            except ValueError:
-                continue
-        
-        return None
+        return date_utils.convert_date(date_string, 'ms', formats=TIMESTAMP_FORMATS, normalize=False)
     except Exception as e:
         return None
 
@@ -222,16 +209,7 @@ def convert_date_to_hubspot_date(date_string):
         return None
     
     try:
-        formats = ['%Y-%m-%dT%H:%M:%S', '%Y-%m-%d %H:%M:%S', '%Y-%m-%d', '%d/%m/%Y %H:%M:%S', '%d/%m/%Y']
-        
-        for fmt in formats:
-            try:
-                date_obj = datetime.strptime(date_string, fmt)
-                return date_obj.strftime('%Y-%m-%d')
-            except ValueError:
-                continue
-        
-        return None
+        return date_utils.convert_date(date_string, 'date', formats=date_utils.BEHAVIORAL_FORMATS, normalize=False)
     except Exception as e:
         return None
 
@@ -285,7 +263,7 @@ def create_hubspot_payload(participations_data):
 
 
 def send_participations_to_hubspot(payload, access_token, batch_size=25):    
-    url = "https://api.hubapi.com/events/v3/send/batch"
+    url = f"{hubspot_client.BASE_URL}/events/v3/send/batch"
     headers = {
         "Authorization": f"Bearer {access_token}",
         "Content-Type": "application/json"
@@ -300,66 +278,80 @@ def send_participations_to_hubspot(payload, access_token, batch_size=25):
         batch_payload = {"inputs": batch}
         batch_num = i//batch_size + 1
         
-        success = False
-        max_retries = 3
+        with run_report.timed('batch', 'import_participation', rows=len(batch)) as fields:
+            success = False
+            max_retries = 3
         
-        for attempt in range(max_retries):
-            try:
-                print(f"Envoi du batch {batch_num}/{(total_participations + batch_size - 1) // batch_size}")
-                response = requests.post(url, json=batch_payload, headers=headers, timeout=30)
+            for attempt in range(max_retries):
+                try:
+                    print(f"Envoi du batch {batch_num}/{(total_participations + batch_size - 1) // batch_size}")
+                    response = hubspot_client.post(url, json=batch_payload, headers=headers, timeout=30)
                 
-                if response.status_code == 204:
-                    print(f"Batch {batch_num} réussi")
-                    successful_batches += 1
-                    success = True
-                    break
-                else:
-                    print(f"Erreur batch {batch_num}: {response.status_code}")
+                    if response.status_code == 204:
+                        print(f"Batch {batch_num} réussi")
+                        successful_batches += 1
+                        state_store.add_sent_keys('participation', [event['properties'].get('pkparticipation') for event in batch])
+                        success = True
+                        break
+                    else:
+                        print(f"Erreur batch {batch_num}: {response.status_code}")
                     
-            except Exception as e:
-                print(f"ERREUR RÉSEAU BATCH {batch_num}: {e}")
-                if attempt < max_retries - 1:
-                    wait_time = 5 * (attempt + 1)
-                    print(f"Nouvelle tentative dans {wait_time} secondes...")
-                    time.sleep(wait_time)
-        
-        # pause entre les lots pour éviter les problèmes de débit
-        time.sleep(1)
+                except Exception as e:
+                    print(f"ERREUR RÉSEAU BATCH {batch_num}: {e}")
+                    if attempt < max_retries - 1:
+                        wait_time = 5 * (attempt + 1)
+                        print(f"Nouvelle tentative dans {wait_time} secondes...")
+                        time.sleep(wait_time)
+            
+            fields['status'] = 'ok' if success else 'error'
     
     total_batches = (total_participations + batch_size - 1) // batch_size
     print(f"Batches réussis: {successful_batches}/{total_batches}")
     print(f"Participations envoyées: {successful_batches * batch_size}/{total_participations}")
     
-    return successful_batches > 0
+    #succès seulement si tous les batches sont passés : le connecteur n'avance pas le watermark sinon
+    return successful_batches == total_batches
 
 
 
-try:
-    existing_participations = get_existing_participations(access_token)
-    existing_participation_keys = extract_existing_participation_keys(existing_participations)
-    participations_data = read_participation_data(filename, max_participations)
+def main():
+    try:
+        # participations déjà envoyées lors des runs précédents
+        existing_participation_keys = state_store.get_sent_keys('participation')
+        
+        if not existing_participation_keys:
+            # premier run avec le state store : récupérer les participations existantes
+            existing_participations = get_existing_participations(access_token)
+            existing_participation_keys = extract_existing_participation_keys(existing_participations)
+            state_store.add_sent_keys('participation', existing_participation_keys)
+        participations_data = read_participation_data(table, max_participations)
     
-    if not participations_data:
-        exit()
+        if not participations_data:
+            return
     
-    new_participations = filter_new_participations(participations_data, existing_participation_keys)
+        new_participations = filter_new_participations(participations_data, existing_participation_keys)
     
-    if not new_participations:
-        exit()
+        if not new_participations:
+            return
     
-    payload = create_hubspot_payload(new_participations)
+        payload = create_hubspot_payload(new_participations)
     
-    if payload['inputs']:
-        print(f"envoie de {len(payload['inputs'])} nouvelles participations")
-        result = send_participations_to_hubspot(payload, access_token, batch_size)
+        if payload['inputs']:
+            print(f"envoie de {len(payload['inputs'])} nouvelles participations")
+            result = send_participations_to_hubspot(payload, access_token, batch_size)
         
-        if result:
-            print("import terminé")
+            if result:
+                print("import terminé")
+            else:
+                print("import échoué")
+                sys.exit(1)
         else:
-            print("import échoué")
-    else:
-        print("aucune participation à envoyer après traitement")
+            print("aucune participation à envoyer après traitement")
         
-except Exception as e:
-    import traceback
-    traceback.print_exc()
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,29 @@
 import os
-import requests
+import hubspot_client
+import run_report
+from export_format import iter_export_rows
 from dotenv import load_dotenv
 import csv
 import tempfile
 import json
+from contextlib import closing
 
 load_dotenv()
 
 # compte APM
 API_KEY = os.getenv("PROD_KEY")
 TABLE_ID = "414751957"  
-CSV_FILE = "/root/apm/infocentre/apm-export-tables-back/exports/dwh.mv_region.csv"
+EXPORT_TABLE = "dwh.mv_region"
 
 # récupère les clés existantes dans hubdb
 def get_hubdb_keys():
-    url = f"https://api.hubapi.com/cms/v3/hubdb/tables/{TABLE_ID}/rows"
+    url = f"{hubspot_client.BASE_URL}/cms/v3/hubdb/tables/{TABLE_ID}/rows"
     headers = {
         "Authorization": f"Bearer {API_KEY}",
         "Content-Type": "application/json"
     }
     try:
-        response = requests.get(url, headers=headers)
+        response = hubspot_client.get(url, headers=headers)
         if response.status_code == 200:
             # Retourner un dictionnaire : {region_key: hs_id}
             return {str(row['values'].get('region_key', '')).strip(): row['id'] 
@@ -35,8 +38,7 @@ def get_hubdb_keys():
 # filtre le csv pour garder les nouvelles entrées
 def process_csv_data(hubdb_keys):
     all_data = []
-    with open(CSV_FILE, mode='r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
+    with closing(iter_export_rows(EXPORT_TABLE)) as reader:
         
         for row in reader:
             key_value = str(row.get('key', '')).strip()
@@ -84,7 +86,7 @@ def import_to_hubdb(temp_file):
     if not temp_file:
         return None
 
-    import_url = f"https://api.hubapi.com/cms/v3/hubdb/tables/{TABLE_ID}/draft/import"
+    import_url = f"{hubspot_client.BASE_URL}/cms/v3/hubdb/tables/{TABLE_ID}/draft/import"
     
     config = {
         "skipRows": 1,
@@ -116,7 +118,7 @@ def import_to_hubdb(temp_file):
                 "Authorization": f"Bearer {API_KEY}"
             }
             
-            response = requests.post(import_url, files=files, headers=headers)
+            response = hubspot_client.post(import_url, files=files, headers=headers)
             print(f"réponse de l'API: {response.status_code} - {response.text}")
             return response
     except Exception as e:
@@ -146,7 +148,8 @@ def main():
         return
     
     # préparer le fichier d'import
-    temp_file = prepare_import_file(all_data)
+    with run_report.timed('transform', 'import_region', rows=len(all_data)):
+        temp_file = prepare_import_file(all_data)
     if not temp_file:
         print("erreur lors de la préparation du fichier")
         return
@@ -158,12 +161,12 @@ def main():
     if response and response.status_code == 200:
         print("import/mise à jour réussi")
         # publication
-        publish_url = f"https://api.hubapi.com/cms/v3/hubdb/tables/{TABLE_ID}/draft/publish"
+        publish_url = f"{hubspot_client.BASE_URL}/cms/v3/hubdb/tables/{TABLE_ID}/draft/publish"
         headers = {
             "Authorization": f"Bearer {API_KEY}",
             "Content-Type": "application/json"
         }
-        pub_response = requests.post(publish_url, headers=headers)
+        pub_response = hubspot_client.post(publish_url, headers=headers)
         if pub_response.status_code == 200:
             print("table publiée")
         else:
@@ -1,8 +1,13 @@
 from dotenv import load_dotenv
 import pandas as pd
 import os
-import requests
+import hubspot_client
+import run_report
+from export_format import read_export
+from column_transforms import cell_text, map_distinct
+from change_detection import detect_changes, commit_import
 import json
+import sys
 from datetime import datetime
 from country_converter import CountryConverter
 
@@ -10,7 +15,7 @@ load_dotenv()
 
 output_dir = '/root/apm/infocentre/apm-export-tables-back/filtered'
 HUBSPOT_API_KEY = os.getenv("PROD_KEY")
-HUBSPOT_IMPORT_API_URL = 'https://api.hubapi.com/crm/v3/imports'
+HUBSPOT_IMPORT_API_URL = f'{hubspot_client.BASE_URL}/crm/v3/imports'
 
 COMPANY_COLUMNS = [
     'PKSociete',
@@ -40,44 +45,60 @@ COMPANY_COLUMNS = [
     'TiersPayeur'         
 ]
 
+#les codes pays des sociétés n'ont pas de placeholder
 def convert_country_for_company(value):
-    if not value or pd.isna(value):
+    return CountryConverter.convert_value(value, placeholders=())
+
+INT_COLUMNS = ['Effectif', 'IdMode', 'IdEffectif']
+
+#mapping des valeurs
+DEADLINE_MAPPING = {
+    '30 jours net virement SEPA': '30JN',
+    '60 jours net virement SEPA': '60JN',
+    '60 jours net': '60JN',
+    'Anim / Experts': 'Anim / Experts'
+}
+#même mapping en minuscules, la première clé l'emporte
+DEADLINE_LOOKUP = {}
+for key, mapped_value in DEADLINE_MAPPING.items():
+    DEADLINE_LOOKUP.setdefault(key.lower(), mapped_value)
+
+
+def clean_int(value):
+    try:
+        return int(float(value)) if value and str(value).replace('.', '').isdigit() else ""
+    except:
         return ""
-    
-    original_value = str(value).strip()
-    converted = CountryConverter.convert_iso_to_country(original_value)
-    
-    return converted
 
+
+def clean_revenue(value):
+    try:
+        return float(value) if value and str(value).replace('.', '').replace(',', '').isdigit() else ""
+    except:
+        return ""
+
+
+#nettoyage colonne par colonne, conversions faites une fois par valeur distincte
 def clean_company_data(df):
-    processed_data = []
-    
-    for _, row in df.iterrows():
-        data = {}
-        
-        for column in df.columns:
-            value = row[column] if pd.notna(row[column]) else ""
-            
-            if column == 'Pays':  
-                data[column] = convert_country_for_company(value)
-            elif column == 'Deadline':  # ← Ajout de cette condition
-                data[column] = convert_deadline(value)
-            elif column in ['Effectif', 'IdMode', 'IdEffectif']:  
-                try:
-                    data[column] = int(float(value)) if value and str(value).replace('.', '').isdigit() else ""
-                except:
-                    data[column] = ""
-            elif column == 'Revenue':  
-                try:
-                    data[column] = float(value) if value and str(value).replace('.', '').replace(',', '').isdigit() else ""
-                except:
-                    data[column] = ""
-            else:
-                data[column] = str(value).strip() if value else ""
-        
-        processed_data.append(data)
+    if df.empty:
+        return pd.DataFrame()
+
+    data = {}
+    for column in df.columns:
+        values = df[column]
+
+        if column == 'Pays':  
+            data[column] = CountryConverter.convert_series(values, placeholders=())
+        elif column == 'Deadline':
+            data[column] = map_distinct(values, convert_deadline)
+        elif column in INT_COLUMNS:  
+            data[column] = map_distinct(values, clean_int)
+        elif column == 'Revenue':  
+            data[column] = map_distinct(values, clean_revenue)
+        else:
+            data[column] = cell_text(values, strip=True)
     
-    return pd.DataFrame(processed_data)
+    return pd.DataFrame(data, index=df.index).reset_index(drop=True)
 
 def convert_deadline(value):
     if not value or pd.isna(value):
@@ -85,31 +106,18 @@ def convert_deadline(value):
     
     value_clean = str(value).strip()
     
-    #mapping des valeurs
-    mapping = {
-        '30 jours net virement SEPA': '30JN',
-        '60 jours net virement SEPA': '60JN',
-        '60 jours net': '60JN',
-        'Anim / Experts': 'Anim / Experts'
-    }
-    
-    if value_clean in mapping:
-        return mapping[value_clean]
-    
-    for key, mapped_value in mapping.items():
-        if value_clean.lower() == key.lower():
-            return mapped_value
+    if value_clean in DEADLINE_MAPPING:
+        return DEADLINE_MAPPING[value_clean]
     
-    return value_clean
+    return DEADLINE_LOOKUP.get(value_clean.lower(), value_clean)
 
 
 def process_companies():
-    input_file = '/root/apm/infocentre/apm-export-tables-back/exports/dwh.mv_societe.csv'
     output_file = 'dwh_societe_filtered.csv'
     output_path = os.path.join(output_dir, output_file)
     
     try:
-        df = pd.read_csv(input_file)
+        df = read_export('dwh.mv_societe')
         print(f"nombre total d'entreprises: {len(df)}")
         
         available_columns = [col for col in COMPANY_COLUMNS if col in df.columns]
@@ -120,12 +128,22 @@ def process_companies():
         
         df_filtered = df[available_columns]
         
-        df_cleaned = clean_company_data(df_filtered)
+        with run_report.timed('transform', 'import_societe', rows=len(df_filtered)):
+            df_cleaned = clean_company_data(df_filtered)
         
-        df_cleaned.to_csv(output_path, index=False)
-        print(f"{len(df_cleaned)} entreprises exportées vers {output_path}")
+        #seules les lignes nouvelles ou modifiées depuis le dernier import réussi sont envoyées
+        df_changed, snapshot = detect_changes('societe', df_cleaned, 'PKSociete')
         
-        upload_success = upload_companies_to_hubspot(output_path, available_columns)
+        if df_changed.empty:
+            print("aucune entreprise à envoyer, import ignoré")
+            return True
+        
+        df_changed.to_csv(output_path, index=False)
+        print(f"{len(df_changed)} entreprises exportées vers {output_path}")
+        
+        #lignes rejetées par hubspot, None si l'import a échoué : le snapshot est enregistré sans les lignes rejetées
+        errors = upload_companies_to_hubspot(output_path, available_columns)
+        upload_success = commit_import('societe', snapshot, errors, output_path, 'PKSociete')
         
         if upload_success:
             print("import des entreprises réussi")
@@ -296,21 +314,22 @@ def upload_companies_to_hubspot(csv_file_path, available_columns):
             files = {'files': ('dwh_societe_filtered.csv', csv_file, 'text/csv')}
             data = {'importRequest': json.dumps(payload)}
             
-            response = requests.post(HUBSPOT_IMPORT_API_URL, headers=headers, files=files, data=data)
+            response = hubspot_client.post(HUBSPOT_IMPORT_API_URL, headers=headers, files=files, data=data)
             
             if response.status_code == 200:
                 result = response.json()
                 print("upload réussi")
                 print(f"Import ID: {result.get('id', 'N/A')}")
-                return True
+                #import traité en asynchrone par hubspot : attendre sa fin, retourne les lignes rejetées
+                return hubspot_client.wait_for_import_errors(result['id'], headers)
             else:
                 print(f"erreur API HubSpot: {response.status_code}")
                 print(f"response: {response.text}")
-                return False
+                return None
                 
     except Exception as e:
         print(f"erreur lors de l'upload: {e}")
-        return False
+        return None
 
 def main():
     if not os.path.exists(output_dir):
@@ -322,6 +341,8 @@ def main():
         print("import terminé avec succès")
     else:
         print("échec de l'import")
+        #code retour en erreur : le connecteur saute les étapes qui en dépendent et n'avance pas le watermark
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
@@ -1,20 +1,23 @@
-import csv
 import json
+from contextlib import closing
 import os
+import sys
 from dotenv import load_dotenv
-import requests
-from datetime import datetime, timezone
-import time
+import hubspot_client
+import run_report
+import state_store
+from export_format import iter_export_rows
+import date_utils
 
 load_dotenv()
 
-filename = "/root/apm/infocentre/apm-export-tables-back/exports/dwh.mv_sollicitation.csv"  
+table = "dwh.mv_sollicitation"  
 access_token = os.getenv("PROD_KEY")
 max_solicitations = 1000 
 batch_size = 10
 
 def get_existing_solicitations(access_token, event_type="pe144476884_sollicitation", limit=100):    
-    url = f"https://api.hubapi.com/events/v3/events"
+    url = f"{hubspot_client.BASE_URL}/events/v3/events"
     headers = {
         "Authorization": f"Bearer {access_token}",
         "Content-Type": "application/json"
@@ -35,7 +38,7 @@ def get_existing_solicitations(access_token, event_type="pe144476884_sollicitati
             params["after"] = after
         
         try:
-            response = requests.get(url, headers=headers, params=params)
+            response = hubspot_client.get(url, headers=headers, params=params)
             
             if response.status_code == 200:
                 data = response.json()
@@ -46,7 +49,6 @@ def get_existing_solicitations(access_token, event_type="pe144476884_sollicitati
                 paging = data.get("paging", {})
                 if "next" in paging:
                     after = paging["next"].get("after")
-                    time.sleep(0.1)  
                 else:
                     print("Fin de pagination atteinte")
                     break
@@ -95,7 +97,7 @@ def extract_existing_solicitation_keys(existing_solicitations):
             existing_keys.add(key)
     return existing_keys
 
-def read_solicitation_data(filename, max_rows=100):
+def read_solicitation_data(table, max_rows=100):
     columns_mapping = {
         'key': 'key',
         'solicitation_status': 'solicitation_status',
@@ -124,8 +126,7 @@ def read_solicitation_data(filename, max_rows=100):
     solicitations_data = []
     
     try:
-        with open(filename, 'r', encoding='utf-8') as file:
-            reader = csv.DictReader(file, delimiter=',')
+        with closing(iter_export_rows(table)) as reader:
                         
             for row in reader:
                 solicitation_data = {}
@@ -152,26 +153,21 @@ def read_solicitation_data(filename, max_rows=100):
         
     return solicitations_data
 
+#les dates sans heure sont placées à midi
+DATE_HOURS = {'%Y-%m-%d': 12, '%d/%m/%Y': 12}
+
+TIMESTAMP_FORMATS = ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d', '%d/%m/%Y %H:%M:%S', '%d/%m/%Y')
+
 def convert_date_to_iso(date_string):
     if not date_string or date_string.lower() in ['null', 'none', '']:
         return None
     
     try:
-        formats = ['%Y-%m-%dT%H:%M:%S', '%Y-%m-%d %H:%M:%S', '%Y-%m-%d', '%d/%m/%Y %H:%M:%S', '%d/%m/%Y']
-        
-        for fmt in formats:
-            try:
-                date_obj = datetime.strptime(date_string, fmt)
-                if fmt == '%Y-%m-%d' or fmt == '%d/%m/%Y':
-                    date_obj = date_obj.replace(hour=12, minute=0, second=0)
-                
-                date_obj = date_obj.replace(tzinfo=timezone.utc)
-                return date_obj.isoformat().replace('+00:00', '.000Z')
-            except ValueError:
-                continue
-        
-        print(f"date non convertible: '{date_string}'")
-        return None
+        converted = date_utils.convert_date(date_string, 'iso_z', formats=date_utils.BEHAVIORAL_FORMATS,
+                                            date_hours=DATE_HOURS, normalize=False)
+        if converted is None:
+            print(f"date non convertible: '{date_string}'")
+        return converted
     except Exception as e:
         print(f"erreur conversion date: {e}")
         return None
@@ -181,17 +177,7 @@ def convert_date_to_timestamp(date_string):
         return None
     
     try:
-        formats = ['%Y-%m-%d %H:%M:%S', '%Y-%m-%d', '%d/%m/%Y %H:%M:%S', '%d/%m/%Y']
-        
-        for fmt in formats:
-            try:
-                date_obj = datetime.strptime(date_string, fmt)
-                date_obj = date_obj.replace(tzinfo=timezone.utc)
-                return int(date_obj.timestamp() * 1000)
-            except ValueError:
-                continue
-        
-        return None
+        return date_utils.convert_date(date_string, 'ms', formats=TIMESTAMP_FORMATS, normalize=False)
     except Exception as e:
         return None
 
@@ -200,16 +186,7 @@ def convert_date_to_hubspot_date(date_string):
         return None
     
     try:
-        formats = ['%Y-%m-%dT%H:%M:%S', '%Y-%m-%d %H:%M:%S', '%Y-%m-%d', '%d/%m/%Y %H:%M:%S', '%d/%m/%Y']
-        
-        for fmt in formats:
-            try:
-                date_obj = datetime.strptime(date_string, fmt)
-                return date_obj.strftime('%Y-%m-%d')
-            except ValueError:
-                continue
-        
-        return None
+        return date_utils.convert_date(date_string, 'date', formats=date_utils.BEHAVIORAL_FORMATS, normalize=False)
     except Exception as e:
         return None
 
@@ -273,7 +250,7 @@ def create_hubspot_payload(solicitations_data):
     return {"inputs": hubspot_inputs}
 
 def send_solicitations_to_hubspot(payload, access_token, batch_size=100):    
-    url = "https://api.hubapi.com/events/v3/send/batch"
+    url = f"{hubspot_client.BASE_URL}/events/v3/send/batch"
     headers = {
         "Authorization": f"Bearer {access_token}",
         "Content-Type": "application/json"
@@ -290,73 +267,87 @@ def send_solicitations_to_hubspot(payload, access_token, batch_size=100):
         batch_num = i//batch_size + 1
         batch_size_actual = len(batch)  
         
-        try:
-            response = requests.post(url, json=batch_payload, headers=headers)
+        with run_report.timed('batch', 'import_sollicitation', rows=batch_size_actual) as fields:
+            try:
+                response = hubspot_client.post(url, json=batch_payload, headers=headers)
             
-            print(f"BATCH {batch_num}: {response.status_code} - {batch_size_actual} sollicitations")
+                print(f"BATCH {batch_num}: {response.status_code} - {batch_size_actual} sollicitations")
             
-            if response.status_code == 204:
-                successful_batches += 1
-                total_sent += batch_size_actual  
-                print(f"BATCH {batch_num} réussi")
-            else:
-                print(f"ERREUR BATCH {batch_num}")
-                try:
-                    error_data = response.json()
-                    print(f"Détails erreur: {json.dumps(error_data, indent=2)}")
-                except:
-                    print(f"Réponse brute: {response.text}")
+                if response.status_code == 204:
+                    successful_batches += 1
+                    total_sent += batch_size_actual  
+                    print(f"BATCH {batch_num} réussi")
+                    state_store.add_sent_keys('sollicitation', [event['properties'].get('key') for event in batch])
+                else:
+                    print(f"ERREUR BATCH {batch_num}")
+                    try:
+                        error_data = response.json()
+                        print(f"Détails erreur: {json.dumps(error_data, indent=2)}")
+                    except:
+                        print(f"Réponse brute: {response.text}")
+                    fields['status'] = 'error'
                 
-        except Exception as e:
-            print(f"erreur réseau batch {batch_num}: {e}")
-        
-        time.sleep(0.1) 
+            except Exception as e:
+                print(f"erreur réseau batch {batch_num}: {e}")
+                fields['status'] = 'error'
     
     total_batches = (total_solicitations + batch_size - 1) // batch_size
     print(f"batches réussis: {successful_batches}/{total_batches}")
     print(f"sollicitations envoyées: {total_sent}/{total_solicitations}") 
     
-    return successful_batches > 0
+    #succès seulement si tous les batches sont passés : le connecteur n'avance pas le watermark sinon
+    return successful_batches == total_batches
 
 
-try:    
-    # récupérer les sollicitations existantes
-    print("récupération des sollicitations existantes...")
-    existing_solicitations = get_existing_solicitations(access_token)
-    existing_solicitation_keys = extract_existing_solicitation_keys(existing_solicitations)
+def main():
+    try:    
+        # sollicitations déjà envoyées lors des runs précédents
+        existing_solicitation_keys = state_store.get_sent_keys('sollicitation')
+        
+        if not existing_solicitation_keys:
+            # premier run avec le state store : récupérer les sollicitations existantes
+            print("récupération des sollicitations existantes...")
+            existing_solicitations = get_existing_solicitations(access_token)
+            existing_solicitation_keys = extract_existing_solicitation_keys(existing_solicitations)
+            state_store.add_sent_keys('sollicitation', existing_solicitation_keys)
     
-    #lire les données du CSV
-    print("lecture des données CSV...")
-    solicitations_data = read_solicitation_data(filename, max_solicitations)
+        #lire les données du CSV
+        print("lecture des données CSV...")
+        solicitations_data = read_solicitation_data(table, max_solicitations)
     
-    if not solicitations_data:
-        print("aucune donnée à traiter")
-        exit()
+        if not solicitations_data:
+            print("aucune donnée à traiter")
+            return
     
-    #filtrer les nouvelles sollicitations
-    print("filtrage des nouvelles sollicitations...")
-    new_solicitations = filter_new_solicitations(solicitations_data, existing_solicitation_keys)
+        #filtrer les nouvelles sollicitations
+        print("filtrage des nouvelles sollicitations...")
+        new_solicitations = filter_new_solicitations(solicitations_data, existing_solicitation_keys)
     
-    if not new_solicitations:
-        print("aucune nouvelle sollicitation à importer")
-        exit()
+        if not new_solicitations:
+            print("aucune nouvelle sollicitation à importer")
+            return
     
-    #créer le payload HubSpot
-    print("création du payload HubSpot...")
-    payload = create_hubspot_payload(new_solicitations)
+        #créer le payload HubSpot
+        print("création du payload HubSpot...")
+        payload = create_hubspot_payload(new_solicitations)
     
-    if payload['inputs']:
-        print(f"envoi de {len(payload['inputs'])} nouvelles sollicitations...")
-        result = send_solicitations_to_hubspot(payload, access_token, batch_size)
+        if payload['inputs']:
+            print(f"envoi de {len(payload['inputs'])} nouvelles sollicitations...")
+            result = send_solicitations_to_hubspot(payload, access_token, batch_size)
         
-        if result:
-            print("import terminé avec succès")
+            if result:
+                print("import terminé avec succès")
+            else:
+                print("import échoué")
+                sys.exit(1)
         else:
-            print("import échoué")
-    else:
-        print("aucune sollicitation à envoyer après traitement")
+            print("aucune sollicitation à envoyer après traitement")
         
-except Exception as e:
-    print(f"erreur générale: {e}")
-    import traceback
-    traceback.print_exc()
+    except Exception as e:
+        print(f"erreur générale: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
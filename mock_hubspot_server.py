@@ -0,0 +1,476 @@
+import argparse
+import csv
+import gzip
+import io
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from email.parser import BytesParser
+from email.policy import default as default_policy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+#serveur local qui imite les endpoints hubspot utilisés par les scripts
+#lancer puis exporter HUBSPOT_BASE_URL=http://127.0.0.1:8765 avant le connecteur ou un script
+DEFAULT_PORT = 8765
+
+
+class MockConfig:
+    def __init__(self, latency_ms=0, jitter_ms=0, rate_limit=100, interval_ms=10000,
+                 search_rate_limit=4, throttle_rate=0.0, error_rate=0.0, search_hit_rate=1.0, seed=None,
+                 import_delay_ms=0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rate_limit = rate_limit
+        self.interval_ms = interval_ms
+        self.search_rate_limit = search_rate_limit
+        #part des appels refusés en 429 même sous la limite
+        self.throttle_rate = throttle_rate
+        #part des entrées en erreur dans les réponses batch (réponse 207)
+        self.error_rate = error_rate
+        #part des valeurs recherchées trouvées par l'api search
+        self.search_hit_rate = search_hit_rate
+        #durée de traitement d'un import (état PROCESSING), les lignes en erreur suivent error_rate
+        self.import_delay_ms = import_delay_ms
+        self.random = random.Random(seed)
+
+
+#état partagé du serveur : buckets, objets, événements, lignes hubdb, compteurs
+class MockState:
+    def __init__(self, config):
+        self.config = config
+        self.lock = threading.Lock()
+        self.buckets = {}
+        self.events = {}
+        self.hubdb_rows = {}
+        self.imports = {}
+        #objets connus par type : {type: {(propriété, valeur): id}}, remplis par search et batch read
+        #(ou directement par les tests), servis par la liste paginée des objets
+        self.objects = {}
+        #date de création des objets (ms), servie comme date de dernière modification
+        self.modified = {}
+        #associations créées : {(type from, type to): {id from: {id to: {type d'association}}}}
+        self.associations = {}
+        self.stats = {}
+        self.next_id = 1000
+
+    def new_id(self):
+        with self.lock:
+            self.next_id += 1
+            return str(self.next_id)
+
+    #objet trouvé ou créé par un test, id stable pour la valeur
+    def add_object(self, object_type, property_name, value):
+        hubspot_id = object_id(object_type, value)
+        with self.lock:
+            self.objects.setdefault(object_type, {})[(property_name, str(value))] = hubspot_id
+            self.modified.setdefault(object_type, {}).setdefault(hubspot_id, int(time.time() * 1000))
+        return hubspot_id
+
+    def count(self, route, status):
+        with self.lock:
+            route_stats = self.stats.setdefault(route, {})
+            route_stats[str(status)] = route_stats.get(str(status), 0) + 1
+
+    #fenêtre fixe par bucket, comme les en-têtes X-HubSpot-RateLimit-*
+    def take_token(self, bucket):
+        config = self.config
+        limit = config.search_rate_limit if bucket == 'search' else config.rate_limit
+        interval = 1000 if bucket == 'search' else config.interval_ms
+
+        with self.lock:
+            now = time.time()
+            window = self.buckets.get(bucket)
+            if window is None or now >= window['reset_at']:
+                window = {'remaining': limit, 'reset_at': now + interval / 1000}
+                self.buckets[bucket] = window
+
+            headers = {
+                'X-HubSpot-RateLimit-Max': str(limit),
+                'X-HubSpot-RateLimit-Interval-Milliseconds': str(interval),
+            }
+
+            if window['remaining'] <= 0 or config.random.random() < config.throttle_rate:
+                headers['X-HubSpot-RateLimit-Remaining'] = '0'
+                headers['Retry-After'] = str(max(round(window['reset_at'] - now, 3), 0.05))
+                return False, headers
+
+            window['remaining'] -= 1
+            headers['X-HubSpot-RateLimit-Remaining'] = str(window['remaining'])
+            return True, headers
+
+
+#propriété de date de dernière modification : lastmodifieddate pour les contacts, hs_lastmodifieddate sinon
+MODIFIED_PROPERTIES = {'0-1': 'lastmodifieddate'}
+
+
+#id hubspot stable pour une valeur de pk recherchée
+def object_id(object_type, value):
+    return str(zlib.crc32(f"{object_type}:{value}".encode('utf-8')))
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    state = None
+
+    ROUTES = [
+        ('POST', r'/crm/v3/imports/?$', 'imports', 'import_create'),
+        ('GET', r'/crm/v3/imports/(?P<import_id>[^/]+)$', 'imports', 'import_status'),
+        ('GET', r'/crm/v3/imports/(?P<import_id>[^/]+)/errors$', 'imports', 'import_errors'),
+        ('GET', r'/crm/v3/objects/(?P<object_type>[^/]+)/?$', 'default', 'objects_list'),
+        ('POST', r'/crm/v3/objects/(?P<object_type>[^/]+)/search$', 'search', 'search'),
+        ('POST', r'/crm/v3/objects/(?P<object_type>[^/]+)/batch/read$', 'default', 'batch_read'),
+        ('POST', r'/crm/v4/associations/(?P<from_type>[^/]+)/(?P<to_type>[^/]+)/batch/create$', 'default', 'associations_create'),
+        ('POST', r'/crm/v4/associations/(?P<from_type>[^/]+)/(?P<to_type>[^/]+)/batch/read$', 'default', 'associations_read'),
+        ('POST', r'/crm/v4/associations/(?P<from_type>[^/]+)/(?P<to_type>[^/]+)/batch/archive$', 'default', 'associations_archive'),
+        ('POST', r'/crm/v4/associations/(?P<from_type>[^/]+)/(?P<to_type>[^/]+)/batch/labels/archive$', 'default', 'associations_labels_archive'),
+        ('POST', r'/events/v3/send/batch$', 'default', 'events_send'),
+        ('GET', r'/events/v3/events$', 'default', 'events_list'),
+        ('POST', r'/marketing/v3/marketing-events/events/upsert$', 'default', 'marketing_upsert'),
+        ('GET', r'/cms/v3/hubdb/tables/(?P<table_id>[^/]+)/rows$', 'default', 'hubdb_rows'),
+        ('POST', r'/cms/v3/hubdb/tables/(?P<table_id>[^/]+)/draft/import$', 'default', 'hubdb_import'),
+        ('POST', r'/cms/v3/hubdb/tables/(?P<table_id>[^/]+)/draft/publish$', 'default', 'hubdb_publish'),
+        ('PATCH', r'/cms/v3/hubdb/tables/(?P<table_id>[^/]+)/rows/(?P<row_id>[^/]+)/draft$', 'default', 'hubdb_row_update'),
+        ('GET', r'/__stats$', None, 'stats'),
+    ]
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.dispatch('GET')
+
+    def do_POST(self):
+        self.dispatch('POST')
+
+    def do_PATCH(self):
+        self.dispatch('PATCH')
+
+    def read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        if self.headers.get('Content-Encoding') == 'gzip':
+            body = gzip.decompress(body)
+        return body
+
+    def json_body(self):
+        body = self.read_body()
+        return json.loads(body) if body else {}
+
+    def send(self, status, payload=None, headers=None):
+        body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if body:
+            self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def dispatch(self, method):
+        url = urlsplit(self.path)
+        state = self.state
+        config = state.config
+
+        for route_method, pattern, bucket, handler_name in self.ROUTES:
+            match = re.match(pattern, url.path)
+            if route_method != method or not match:
+                continue
+
+            if bucket is None:
+                return self.send(200, state.stats)
+
+            if config.latency_ms or config.jitter_ms:
+                time.sleep((config.latency_ms + config.random.uniform(0, config.jitter_ms)) / 1000)
+
+            allowed, headers = state.take_token(bucket)
+            if not allowed:
+                self.read_body()
+                state.count(handler_name, 429)
+                return self.send(429, {'status': 'error', 'category': 'RATE_LIMITS',
+                                       'message': 'You have reached your secondly limit.'}, headers)
+
+            status, payload = getattr(self, handler_name)(parse_qs(url.query), **match.groupdict())
+            state.count(handler_name, status)
+            return self.send(status, payload, headers)
+
+        self.read_body()
+        self.send(404, {'status': 'error', 'message': f'route inconnue {method} {url.path}'})
+
+    #lignes csv du fichier envoyé en multipart, en-tête exclu
+    def import_rows(self, body):
+        message = BytesParser(policy=default_policy).parsebytes(
+            f"Content-Type: {self.headers.get('Content-Type', '')}\r\n\r\n".encode() + body)
+        if not message.is_multipart():
+            return []
+
+        for part in message.iter_parts():
+            if part.get_filename():
+                content = part.get_payload(decode=True).decode('utf-8')
+                return list(csv.reader(io.StringIO(content)))[1:]
+        return []
+
+    def import_create(self, query):
+        body = self.read_body()
+        import_id = self.state.new_id()
+        rows = self.import_rows(body)
+        config = self.state.config
+        #lignes rejetées : index dans le fichier, en-tête exclu
+        rejected = [i for i in range(len(rows)) if config.random.random() < config.error_rate]
+        self.state.imports[import_id] = {'rows': rows, 'body': body, 'rejected': rejected,
+                                         'done_at': time.time() + config.import_delay_ms / 1000}
+        return 200, {'id': import_id, 'state': 'STARTED', 'createdAt': time.strftime('%Y-%m-%dT%H:%M:%SZ')}
+
+    def import_status(self, query, import_id):
+        if import_id not in self.state.imports:
+            return 404, {'status': 'error', 'message': 'import inconnu'}
+        state = 'DONE' if time.time() >= self.state.imports[import_id]['done_at'] else 'PROCESSING'
+        return 200, {'id': import_id, 'state': state}
+
+    def import_errors(self, query, import_id):
+        if import_id not in self.state.imports:
+            return 404, {'status': 'error', 'message': 'import inconnu'}
+        limit = min(int(query.get('limit', ['100'])[0]), 100)
+        after = int(query.get('after', ['0'])[0])
+        imported = self.state.imports[import_id]
+        errors = [{
+            'errorType': 'INVALID_PROPERTY_VALUE',
+            'sourceData': {'lineNumber': i + 2, 'rowData': imported['rows'][i]},
+        } for i in imported['rejected']]
+
+        payload = {'results': errors[after:after + limit]}
+        if after + limit < len(errors):
+            payload['paging'] = {'next': {'after': str(after + limit)}}
+        return 200, payload
+
+    def search(self, query, object_type):
+        body = self.json_body()
+        config = self.state.config
+        results = []
+
+        for group in body.get('filterGroups', []):
+            for search_filter in group.get('filters', []):
+                property_name = search_filter.get('propertyName')
+                if search_filter.get('operator') == 'GTE':
+                    results.extend(self.modified_since(object_type, property_name, int(search_filter['value'])))
+                    continue
+                values = search_filter.get('values') or [search_filter.get('value')]
+                for value in values:
+                    if value is None or config.random.random() >= config.search_hit_rate:
+                        continue
+                    results.append({
+                        'id': self.state.add_object(object_type, property_name, value),
+                        'properties': {property_name: str(value)},
+                    })
+
+        limit = int(body.get('limit', 10))
+        after = int(body.get('after', 0))
+        payload = {'total': len(results), 'results': results[after:after + limit]}
+        if after + limit < len(results):
+            payload['paging'] = {'next': {'after': str(after + limit)}}
+        return 200, payload
+
+    #objets connus modifiés depuis since_ms, aucun si la propriété n'est pas celle du type
+    def modified_since(self, object_type, property_name, since_ms):
+        if property_name != MODIFIED_PROPERTIES.get(object_type, 'hs_lastmodifieddate'):
+            return []
+
+        with self.state.lock:
+            modified = self.state.modified.get(object_type, {})
+            return [{'id': hubspot_id, 'properties': {key_property: value}}
+                    for (key_property, value), hubspot_id in self.state.objects.get(object_type, {}).items()
+                    if modified.get(hubspot_id, 0) >= since_ms]
+
+    def batch_read(self, query, object_type):
+        body = self.json_body()
+        config = self.state.config
+        property_name = body.get('idProperty')
+        results, errors = [], []
+
+        for item in body.get('inputs', []):
+            value = item.get('id')
+            if config.random.random() >= config.search_hit_rate:
+                errors.append({'status': 'error', 'category': 'OBJECT_NOT_FOUND', 'context': {'ids': [value]}})
+                continue
+            results.append({
+                'id': self.state.add_object(object_type, property_name, value),
+                'properties': {property_name: str(value)},
+            })
+
+        if errors:
+            return 207, {'status': 'COMPLETE', 'results': results, 'errors': errors, 'numErrors': len(errors)}
+        return 200, {'status': 'COMPLETE', 'results': results}
+
+    #liste paginée des objets du type, après = position dans la liste
+    def objects_list(self, query, object_type):
+        limit = min(int(query.get('limit', ['10'])[0]), 100)
+        after = int(query.get('after', ['0'])[0])
+        properties = set(','.join(query.get('properties', [])).split(','))
+
+        with self.state.lock:
+            objects = sorted(self.state.objects.get(object_type, {}).items(), key=lambda item: item[1])
+        page = objects[after:after + limit]
+
+        payload = {'results': [{
+            'id': hubspot_id,
+            'properties': {property_name: value} if property_name in properties else {},
+            'archived': False,
+        } for (property_name, value), hubspot_id in page]}
+        if after + limit < len(objects):
+            payload['paging'] = {'next': {'after': str(after + limit)}}
+        return 200, payload
+
+    def associations_create(self, query, from_type, to_type):
+        inputs = self.json_body().get('inputs', [])
+        config = self.state.config
+        results, errors = [], []
+
+        for item in inputs:
+            if config.random.random() < config.error_rate:
+                errors.append({'status': 'error', 'category': 'VALIDATION_ERROR', 'context': {'fromId': [item['from']['id']]}})
+                continue
+            with self.state.lock:
+                linked = self.state.associations.setdefault((from_type, to_type), {}).setdefault(str(item['from']['id']), {})
+                linked.setdefault(str(item['to']['id']), set()).update(
+                    association_type.get('associationTypeId') for association_type in item.get('types', []))
+            results.append({
+                'fromObjectTypeId': from_type, 'fromObjectId': item['from']['id'],
+                'toObjectTypeId': to_type, 'toObjectId': item['to']['id'],
+                'labels': [],
+            })
+
+        if errors:
+            return 207, {'status': 'COMPLETE', 'results': results, 'errors': errors, 'numErrors': len(errors)}
+        return 201, {'status': 'COMPLETE', 'results': results}
+
+    def associations_read(self, query, from_type, to_type):
+        inputs = self.json_body().get('inputs', [])
+        results = []
+
+        with self.state.lock:
+            associations = self.state.associations.get((from_type, to_type), {})
+            for item in inputs:
+                linked = associations.get(str(item['id']), {})
+                results.append({'from': {'id': item['id']}, 'to': [{
+                    'toObjectId': int(to_id) if to_id.isdigit() else to_id,
+                    'associationTypes': [{'category': 'USER_DEFINED', 'typeId': type_id, 'label': None}
+                                         for type_id in sorted(type_ids)]
+                } for to_id, type_ids in linked.items()]})
+
+        return 200, {'status': 'COMPLETE', 'results': results}
+
+    #batch/archive : toutes les associations entre les objets, de tous les types
+    def associations_archive(self, query, from_type, to_type):
+        inputs = self.json_body().get('inputs', [])
+
+        with self.state.lock:
+            associations = self.state.associations.get((from_type, to_type), {})
+            for item in inputs:
+                linked = associations.get(str(item['from']['id']), {})
+                for to in item.get('to', []):
+                    linked.pop(str(to['id']), None)
+
+        return 204, None
+
+    #batch/labels/archive : seulement les types donnés, la paire reste associée par les autres types
+    def associations_labels_archive(self, query, from_type, to_type):
+        inputs = self.json_body().get('inputs', [])
+
+        with self.state.lock:
+            associations = self.state.associations.get((from_type, to_type), {})
+            for item in inputs:
+                linked = associations.get(str(item['from']['id']), {})
+                to_id = str(item['to']['id'])
+                type_ids = linked.get(to_id, set())
+                type_ids.difference_update(association_type.get('associationTypeId') for association_type in item.get('types', []))
+                if not type_ids:
+                    linked.pop(to_id, None)
+
+        return 204, None
+
+    def events_send(self, query):
+        inputs = self.json_body().get('inputs', [])
+        with self.state.lock:
+            for event in inputs:
+                self.state.events.setdefault(event.get('eventName'), []).append(event)
+        return 204, None
+
+    def events_list(self, query):
+        event_type = query.get('eventType', [''])[0]
+        limit = int(query.get('limit', ['100'])[0])
+        after = int(query.get('after', ['0'])[0])
+
+        events = self.state.events.get(event_type, [])
+        page = events[after:after + limit]
+        payload = {'results': [{'eventType': event_type, 'properties': event.get('properties', {})} for event in page]}
+        if after + limit < len(events):
+            payload['paging'] = {'next': {'after': str(after + limit)}}
+        return 200, payload
+
+    def marketing_upsert(self, query):
+        inputs = self.json_body().get('inputs', [])
+        return 200, {'status': 'COMPLETE', 'results': [dict(item, objectId=self.state.new_id()) for item in inputs]}
+
+    def hubdb_rows(self, query, table_id):
+        rows = self.state.hubdb_rows.get(table_id, [])
+        return 200, {'total': len(rows), 'results': rows}
+
+    def hubdb_import(self, query, table_id):
+        body = self.read_body()
+        rows = max(body.count(b'\n') - 1, 0)
+        return 200, {'rowsImported': rows, 'duplicateRows': 0, 'rowLimitExceeded': False, 'errors': []}
+
+    def hubdb_publish(self, query, table_id):
+        return 200, {'id': table_id, 'published': True}
+
+    def hubdb_row_update(self, query, table_id, row_id):
+        values = self.json_body().get('values', {})
+        return 200, {'id': row_id, 'values': values}
+
+
+def start_server(config=None, host='127.0.0.1', port=DEFAULT_PORT):
+    handler = type('ConfiguredMockHandler', (MockHandler,), {'state': MockState(config or MockConfig())})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--latency-ms', type=float, default=0, help="latence ajoutée à chaque réponse")
+    parser.add_argument('--jitter-ms', type=float, default=0, help="latence aléatoire supplémentaire (0 à n ms)")
+    parser.add_argument('--rate-limit', type=int, default=100, help="appels autorisés par intervalle")
+    parser.add_argument('--interval-ms', type=int, default=10000)
+    parser.add_argument('--search-rate-limit', type=int, default=4, help="appels search autorisés par seconde")
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help="part des appels refusés en 429")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="part des entrées batch en erreur (207)")
+    parser.add_argument('--search-hit-rate', type=float, default=1.0, help="part des pk trouvées (search, batch read)")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--import-delay-ms', type=float, default=0, help="durée de traitement d'un import crm")
+    args = parser.parse_args()
+
+    config = MockConfig(args.latency_ms, args.jitter_ms, args.rate_limit, args.interval_ms,
+                        args.search_rate_limit, args.throttle_rate, args.error_rate, args.search_hit_rate, args.seed,
+                        args.import_delay_ms)
+    server = start_server(config, args.host, args.port)
+    print(f"serveur hubspot de test sur http://{args.host}:{server.server_port}")
+    print(f"export HUBSPOT_BASE_URL=http://{args.host}:{server.server_port}")
+
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+import fcntl
+import json
+import os
+import time
+
+#budget d'appels hubspot partagé par tous les scripts (et tous les processus) du run
+STATE_DIR = '/root/apm/infocentre/apm-export-tables-back/state'
+RATE_LIMIT_FILE = os.path.join(STATE_DIR, 'hubspot_rate_limit.json')
+
+#limites par défaut, ajustées ensuite avec les en-têtes X-HubSpot-RateLimit-*
+BUCKETS = {
+    'default': {
+        'max': int(os.getenv("HUBSPOT_RATE_LIMIT", 100)),
+        'interval_ms': int(os.getenv("HUBSPOT_RATE_INTERVAL_MS", 10000)),
+    },
+    #l'api search a sa propre limite, beaucoup plus basse
+    'search': {
+        'max': int(os.getenv("HUBSPOT_SEARCH_RATE_LIMIT", 4)),
+        'interval_ms': 1000,
+    },
+}
+
+MAX_RETRIES = int(os.getenv("HUBSPOT_MAX_RETRIES", 5))
+
+
+#lit et modifie l'état des buckets sous verrou fichier
+def _update_state(update):
+    os.makedirs(STATE_DIR, exist_ok=True)
+
+    with open(RATE_LIMIT_FILE, 'a+', encoding='utf-8') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            f.seek(0)
+            content = f.read()
+            try:
+                state = json.loads(content) if content else {}
+            except ValueError:
+                state = {}
+
+            result = update(state)
+
+            f.seek(0)
+            f.truncate()
+            json.dump(state, f)
+            f.flush()
+            return result
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _refill(bucket_state, now):
+    capacity = bucket_state['max']
+    rate = capacity / (bucket_state['interval_ms'] / 1000)
+    elapsed = max(now - bucket_state['updated_at'], 0)
+    bucket_state['tokens'] = min(capacity, bucket_state['tokens'] + elapsed * rate)
+    bucket_state['updated_at'] = now
+    return rate
+
+
+def _bucket(state, name, now):
+    defaults = BUCKETS.get(name, BUCKETS['default'])
+    return state.setdefault(name, {
+        'max': defaults['max'],
+        'interval_ms': defaults['interval_ms'],
+        'tokens': defaults['max'],
+        'updated_at': now,
+        'blocked_until': 0,
+    })
+
+
+#attend qu'un jeton soit disponible dans le bucket puis le consomme
+def acquire(bucket='default'):
+    while True:
+        def take(state):
+            now = time.time()
+            bucket_state = _bucket(state, bucket, now)
+            rate = _refill(bucket_state, now)
+
+            if now < bucket_state['blocked_until']:
+                return bucket_state['blocked_until'] - now
+
+            if bucket_state['tokens'] >= 1:
+                bucket_state['tokens'] -= 1
+                return 0
+
+            return (1 - bucket_state['tokens']) / rate
+
+        wait_time = _update_state(take)
+        if wait_time <= 0:
+            return
+        time.sleep(wait_time)
+
+
+#met à jour le bucket à partir des en-têtes de la réponse (quota réel du compte)
+def update_from_response(response, bucket='default'):
+    headers = response.headers
+
+    def update(state):
+        now = time.time()
+        bucket_state = _bucket(state, bucket, now)
+        _refill(bucket_state, now)
+
+        try:
+            if headers.get('X-HubSpot-RateLimit-Max'):
+                bucket_state['max'] = int(headers['X-HubSpot-RateLimit-Max'])
+            if headers.get('X-HubSpot-RateLimit-Interval-Milliseconds'):
+                bucket_state['interval_ms'] = int(headers['X-HubSpot-RateLimit-Interval-Milliseconds'])
+            if headers.get('X-HubSpot-RateLimit-Remaining') is not None:
+                remaining = int(headers['X-HubSpot-RateLimit-Remaining'])
+                bucket_state['tokens'] = min(bucket_state['tokens'], remaining)
+        except ValueError:
+            pass
+
+        if response.status_code == 429:
+            retry_after = retry_after_seconds(response, bucket_state['interval_ms'] / 1000)
+            bucket_state['tokens'] = 0
+            bucket_state['blocked_until'] = max(bucket_state['blocked_until'], now + retry_after)
+
+    _update_state(update)
+
+
+def retry_after_seconds(response, default):
+    try:
+        return float(response.headers.get('Retry-After', default))
+    except (TypeError, ValueError):
+        return default
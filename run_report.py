@@ -0,0 +1,131 @@
+import fcntl
+import json
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+#rapport de run : une ligne json par mesure (export, étape, transformation, appel http, batch)
+REPORT_DIR = '/root/apm/infocentre/apm-export-tables-back/reports'
+
+
+#fichier du run en cours, transmis aux scripts par le connecteur via la variable d'environnement
+def report_file():
+    path = os.getenv("RUN_REPORT_FILE")
+    if not path:
+        path = os.path.join(REPORT_DIR, f"run_{datetime.now().strftime('%Y%m%d')}.jsonl")
+    return path
+
+
+def record(phase, name, **fields):
+    entry = {
+        'ts': datetime.now().isoformat(timespec='milliseconds'),
+        'phase': phase,
+        'name': name,
+        'pid': os.getpid(),
+    }
+    entry.update(fields)
+
+    try:
+        path = report_file()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'a', encoding='utf-8') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.write(json.dumps(entry, ensure_ascii=False, default=str) + '\n')
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+    except OSError as e:
+        #la mesure ne doit jamais faire échouer le traitement
+        print(f"erreur écriture rapport: {e}")
+
+
+#mesure la durée d'un bloc, les champs ajoutés au dict (rows, bytes...) sont enregistrés
+@contextmanager
+def timed(phase, name, **fields):
+    start_time = time.time()
+    fields = dict(fields)
+    fields.setdefault('status', 'ok')
+    try:
+        yield fields
+    except BaseException:
+        fields['status'] = 'error'
+        raise
+    finally:
+        fields['duration'] = round(time.time() - start_time, 3)
+        record(phase, name, **fields)
+
+
+def load_report(path=None):
+    path = path or report_file()
+    entries = []
+    if not os.path.exists(path):
+        return entries
+
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                continue
+    return entries
+
+
+#agrège le rapport : durées par phase, étapes les plus lentes, débit par entité, appels http
+def summarize(entries, top=5):
+    phases = {}
+    for entry in entries:
+        phase = phases.setdefault(entry['phase'], {'count': 0, 'duration': 0.0})
+        phase['count'] += 1
+        phase['duration'] = round(phase['duration'] + entry.get('duration', 0), 3)
+
+    slowest = sorted(
+        (entry for entry in entries if entry['phase'] in ('export', 'step')),
+        key=lambda entry: entry.get('duration', 0),
+        reverse=True
+    )[:top]
+
+    throughput = {}
+    for entry in entries:
+        if entry['phase'] not in ('export', 'transform') or not entry.get('rows'):
+            continue
+        key = f"{entry['phase']} {entry['name']}"
+        stats = throughput.setdefault(key, {'rows': 0, 'duration': 0.0})
+        stats['rows'] += entry['rows']
+        stats['duration'] += entry.get('duration', 0)
+    for stats in throughput.values():
+        stats['rows_per_second'] = round(stats['rows'] / stats['duration'], 1) if stats['duration'] else None
+        stats['duration'] = round(stats['duration'], 3)
+
+    http_entries = [entry for entry in entries if entry['phase'] == 'http']
+    statuses = {}
+    for entry in http_entries:
+        status = str(entry.get('status'))
+        statuses[status] = statuses.get(status, 0) + 1
+
+    return {
+        'phases': phases,
+        'slowest': [
+            {'phase': entry['phase'], 'name': entry['name'], 'duration': entry.get('duration', 0)}
+            for entry in slowest
+        ],
+        'throughput': throughput,
+        'http': {
+            'calls': len(http_entries),
+            'duration': round(sum(entry.get('duration', 0) for entry in http_entries), 3),
+            'bytes_sent': sum(entry.get('bytes_sent', 0) for entry in http_entries),
+            'retries': sum(entry.get('retries', 0) for entry in http_entries),
+            'statuses': statuses,
+        },
+    }
+
+
+def write_summary(path=None, top=5):
+    path = path or report_file()
+    summary = summarize(load_report(path), top)
+
+    summary_path = os.path.splitext(path)[0] + '.summary.json'
+    with open(summary_path, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2, ensure_ascii=False)
+
+    return summary
@@ -0,0 +1,149 @@
+import fcntl
+import json
+import os
+import uuid
+from datetime import datetime
+
+#état du run en cours : exports, étapes et batches d'associations terminés
+#permet de reprendre un run interrompu avec --resume sans refaire ce qui a réussi
+STATE_DIR = '/root/apm/infocentre/apm-export-tables-back/state'
+RUN_STATE_FILE = os.path.join(STATE_DIR, 'run_state.json')
+
+
+#lit et modifie l'état sous verrou fichier (les scripts écrivent depuis leurs propres processus)
+def _update_state(update, path=None):
+    path = path or RUN_STATE_FILE
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    with open(path, 'a+', encoding='utf-8') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            f.seek(0)
+            content = f.read()
+            try:
+                state = json.loads(content) if content else {}
+            except ValueError:
+                state = {}
+
+            result = update(state)
+
+            f.seek(0)
+            f.truncate()
+            json.dump(state, f, indent=2, sort_keys=True)
+            f.flush()
+            return result
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def load_run_state(path=None):
+    path = path or RUN_STATE_FILE
+    if not os.path.exists(path):
+        return {}
+
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            fcntl.flock(f, fcntl.LOCK_SH)
+            try:
+                return json.load(f)
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+    except (OSError, ValueError) as e:
+        print(f"état du run illisible {path}: {e}")
+        return {}
+
+
+#démarre un nouveau run, ou reprend le dernier s'il n'est pas terminé
+#l'identifiant du run est transmis aux scripts par la variable d'environnement RUN_ID
+#retourne (état du run, True si le run est repris)
+def start_run(resume=False, previous_manifest=None):
+    def start(state):
+        if resume and state.get('run_id') and not state.get('completed'):
+            print(f"reprise du run {state['run_id']} (démarré le {state.get('started_at')})")
+            return dict(state), True
+
+        if resume:
+            print("aucun run interrompu à reprendre, démarrage d'un nouveau run")
+
+        state.clear()
+        state.update({
+            'run_id': uuid.uuid4().hex,
+            'started_at': datetime.now().isoformat(timespec='seconds'),
+            'completed': False,
+            'previous_manifest': previous_manifest or {},
+            'exports': {},
+            'steps': {},
+            'batches': {},
+        })
+        return dict(state), False
+
+    state, resumed = _update_state(start)
+    os.environ["RUN_ID"] = state['run_id']
+    return state, resumed
+
+
+def finish_run():
+    def finish(state):
+        state['completed'] = True
+        state['finished_at'] = datetime.now().isoformat(timespec='seconds')
+
+    _update_state(finish)
+
+
+#les checkpoints ne sont lus et écrits que pour un run lancé par le connecteur
+def _current_run(state):
+    run_id = os.getenv("RUN_ID")
+    return run_id and state.get('run_id') == run_id and not state.get('completed')
+
+
+def mark_export(table, entry):
+    def mark(state):
+        if _current_run(state):
+            state.setdefault('exports', {})[table] = entry
+
+    _update_state(mark)
+
+
+#export déjà fait dans ce run : le fichier doit encore être là et avoir la même taille
+def completed_export(table, export_file):
+    state = load_run_state()
+    if not _current_run(state):
+        return None
+
+    entry = state.get('exports', {}).get(table)
+    if not entry or not os.path.exists(export_file):
+        return None
+    if os.path.getsize(export_file) != entry.get('bytes'):
+        return None
+    return entry
+
+
+def mark_step(step):
+    def mark(state):
+        if _current_run(state):
+            state.setdefault('steps', {})[step] = datetime.now().isoformat(timespec='seconds')
+
+    _update_state(mark)
+
+
+def step_done(step):
+    state = load_run_state()
+    return bool(_current_run(state) and step in state.get('steps', {}))
+
+
+def mark_batch(script, batch):
+    def mark(state):
+        if _current_run(state):
+            batches = state.setdefault('batches', {}).setdefault(script, [])
+            if batch not in batches:
+                batches.append(batch)
+
+    _update_state(mark)
+
+
+#batches déjà traités par un script dans ce run (vide hors connecteur)
+def done_batches(script):
+    state = load_run_state()
+    if not _current_run(state):
+        return set()
+    return set(state.get('batches', {}).get(script, []))
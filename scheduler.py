@@ -0,0 +1,72 @@
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+
+#vérifie que les dépendances ne forment pas de cycle
+def check_dependencies(steps, dependencies):
+    visiting = set()
+    visited = set()
+
+    def visit(step):
+        if step in visited:
+            return
+        if step in visiting:
+            raise ValueError(f"dépendance circulaire détectée sur {step}")
+        visiting.add(step)
+        for dependency in dependencies.get(step, []):
+            if dependency in steps:
+                visit(dependency)
+        visiting.discard(step)
+        visited.add(step)
+
+    for step in steps:
+        visit(step)
+
+
+#exécute les étapes en parallèle en respectant les dépendances
+#steps : liste des noms d'étapes à exécuter
+#dependencies : {étape: [étapes requises]}, les dépendances absentes de steps sont ignorées
+#run_step : fonction appelée avec le nom de l'étape, retourne True si succès
+#after : {étape: [étapes à attendre]}, lancée une fois celles-ci terminées, même en échec
+#retourne {étape: True/False/None} (None = ignorée car une dépendance a échoué)
+def run_dag(steps, dependencies, run_step, max_workers=4, after=None):
+    steps = list(steps)
+    after = after or {}
+    check_dependencies(steps, {step: list(dependencies.get(step, [])) + list(after.get(step, [])) for step in steps})
+
+    pending = {
+        step: set(dep for dep in list(dependencies.get(step, [])) + list(after.get(step, [])) if dep in steps)
+        for step in steps
+    }
+    results = {}
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        while pending or running:
+            #lancer toutes les étapes dont les dépendances sont terminées
+            for step in list(pending):
+                deps = pending[step]
+                if not deps.issubset(results):
+                    continue
+
+                del pending[step]
+                failed = [dep for dep in deps if dep in dependencies.get(step, []) and not results[dep]]
+                if failed:
+                    print(f"{step} ignoré (dépendances en échec : {', '.join(sorted(failed))})")
+                    results[step] = None
+                    continue
+
+                running[executor.submit(run_step, step)] = step
+
+            if not running:
+                continue
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                step = running.pop(future)
+                try:
+                    results[step] = bool(future.result())
+                except Exception as e:
+                    print(f"erreur lors de l'exécution de {step}: {e}")
+                    results[step] = False
+
+    return results
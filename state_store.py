@@ -0,0 +1,150 @@
+import os
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+
+#mémoire entre les runs : correspondances pk -> id hubspot, empreintes des lignes,
+#clés déjà envoyées et watermarks
+#sqlite en mode WAL : lectures concurrentes pendant qu'un script écrit
+STATE_DIR = '/root/apm/infocentre/apm-export-tables-back/state'
+DB_FILE = os.path.join(STATE_DIR, 'state.db')
+
+#nombre de lignes par executemany dans une transaction d'écriture
+WRITE_CHUNK = 10000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS id_map (
+    entity TEXT NOT NULL,
+    key TEXT NOT NULL,
+    hubspot_id TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (entity, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS id_map_hubspot_id ON id_map (entity, hubspot_id);
+
+CREATE TABLE IF NOT EXISTS row_hashes (
+    entity TEXT NOT NULL,
+    key TEXT NOT NULL,
+    hash TEXT NOT NULL,
+    PRIMARY KEY (entity, key)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS sent_keys (
+    entity TEXT NOT NULL,
+    key TEXT NOT NULL,
+    sent_at TEXT NOT NULL,
+    PRIMARY KEY (entity, key)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS watermarks (
+    table_name TEXT PRIMARY KEY,
+    watermark TEXT,
+    last_full TEXT
+);
+"""
+
+
+@contextmanager
+def connect(path=None):
+    path = path or DB_FILE
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path, timeout=60)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SCHEMA)
+        yield conn
+    finally:
+        conn.close()
+
+
+#une seule transaction pour toutes les lignes, découpées en paquets d'executemany
+def _write(query, rows, delete=None):
+    rows = list(rows)
+    with connect() as conn:
+        with conn:
+            if delete:
+                conn.execute(*delete)
+            for i in range(0, len(rows), WRITE_CHUNK):
+                conn.executemany(query, rows[i:i + WRITE_CHUNK])
+    return len(rows)
+
+
+def _now():
+    return datetime.now().isoformat(timespec='seconds')
+
+
+#correspondances clé métier -> id hubspot d'un objet
+def get_id_map(entity):
+    with connect() as conn:
+        return dict(conn.execute("SELECT key, hubspot_id FROM id_map WHERE entity = ?", (entity,)))
+
+
+def put_id_map(entity, mapping):
+    now = _now()
+    return _write(
+        "INSERT OR REPLACE INTO id_map (entity, key, hubspot_id, updated_at) VALUES (?, ?, ?, ?)",
+        ((entity, str(key), str(hubspot_id), now) for key, hubspot_id in mapping.items())
+    )
+
+
+#remplace toutes les correspondances de l'entité
+def replace_id_map(entity, mapping):
+    now = _now()
+    return _write(
+        "INSERT INTO id_map (entity, key, hubspot_id, updated_at) VALUES (?, ?, ?, ?)",
+        ((entity, str(key), str(hubspot_id), now) for key, hubspot_id in mapping.items()),
+        delete=("DELETE FROM id_map WHERE entity = ?", (entity,))
+    )
+
+
+def delete_id_map(entity, keys):
+    return _write("DELETE FROM id_map WHERE entity = ? AND key = ?", ((entity, str(key)) for key in keys))
+
+
+#empreintes des lignes envoyées (détection des changements)
+def get_row_hashes(entity):
+    with connect() as conn:
+        return dict(conn.execute("SELECT key, hash FROM row_hashes WHERE entity = ?", (entity,)))
+
+
+#remplace toutes les empreintes de l'entité
+def replace_row_hashes(entity, hashes):
+    return _write(
+        "INSERT INTO row_hashes (entity, key, hash) VALUES (?, ?, ?)",
+        ((entity, str(key), row_hash) for key, row_hash in hashes.items()),
+        delete=("DELETE FROM row_hashes WHERE entity = ?", (entity,))
+    )
+
+
+#clés d'événements déjà envoyés à hubspot
+def get_sent_keys(entity):
+    with connect() as conn:
+        return set(key for key, in conn.execute("SELECT key FROM sent_keys WHERE entity = ?", (entity,)))
+
+
+def add_sent_keys(entity, keys):
+    now = _now()
+    return _write(
+        "INSERT OR IGNORE INTO sent_keys (entity, key, sent_at) VALUES (?, ?, ?)",
+        ((entity, str(key), now) for key in keys if key)
+    )
+
+
+def get_watermarks():
+    with connect() as conn:
+        return {
+            table_name: {key: value for key, value in (('watermark', watermark), ('last_full', last_full)) if value}
+            for table_name, watermark, last_full in conn.execute("SELECT table_name, watermark, last_full FROM watermarks")
+        }
+
+
+#met à jour seulement les champs fournis ({table: {watermark, last_full}})
+def put_watermarks(updates):
+    return _write(
+        """INSERT INTO watermarks (table_name, watermark, last_full) VALUES (?, ?, ?)
+           ON CONFLICT (table_name) DO UPDATE SET
+               watermark = COALESCE(excluded.watermark, watermarks.watermark),
+               last_full = COALESCE(excluded.last_full, watermarks.last_full)""",
+        ((table, entry.get('watermark'), entry.get('last_full')) for table, entry in updates.items())
+    )
@@ -0,0 +1,36 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import hubspot_client
+import id_cache
+import mock_hubspot_server
+import rate_limiter
+import run_state
+import state_store
+
+
+#fichiers d'état (budget d'appels, rapport et état du run, state store) dans un dossier temporaire
+@pytest.fixture
+def isolated_state(tmp_path, monkeypatch):
+    monkeypatch.setattr(rate_limiter, 'STATE_DIR', str(tmp_path))
+    monkeypatch.setattr(rate_limiter, 'RATE_LIMIT_FILE', str(tmp_path / 'hubspot_rate_limit.json'))
+    monkeypatch.setattr(run_state, 'RUN_STATE_FILE', str(tmp_path / 'run_state.json'))
+    monkeypatch.setattr(state_store, 'DB_FILE', str(tmp_path / 'state.db'))
+    monkeypatch.setenv('RUN_REPORT_FILE', str(tmp_path / 'run_report.jsonl'))
+    #caches du processus remis à zéro entre les tests
+    monkeypatch.setattr(id_cache, '_maps', {})
+    return tmp_path
+
+
+#serveur hubspot de test, les appels des scripts y sont envoyés
+@pytest.fixture
+def mock_hubspot(isolated_state, monkeypatch):
+    server = mock_hubspot_server.start_server(mock_hubspot_server.MockConfig(seed=1), port=0)
+    monkeypatch.setattr(hubspot_client, 'BASE_URL', f"http://127.0.0.1:{server.server_port}")
+    yield server.RequestHandlerClass.state
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,61 @@
+import association_engine
+import id_cache
+import run_report
+from mock_hubspot_server import object_id
+
+CLUB = association_engine.CLUB_OBJECT_ID
+EVENT = association_engine.EVENT_OBJECT_ID
+
+#autre type d'association entre clubs et events, hors du fichier event_club
+OTHER_TYPE = 999
+
+
+def _run_event_club(mock_hubspot, isolated_state, monkeypatch, rows):
+    mock_hubspot.config.search_hit_rate = 1.0
+    monkeypatch.setattr(association_engine, 'FILTERED_DIR', str(isolated_state))
+    (isolated_state / 'dwh.event_club.csv').write_text('club_key,event_key\n' + ''.join(f'{row}\n' for row in rows))
+    association_engine.main('associations_event_club')
+    return mock_hubspot.associations[(CLUB, EVENT)]
+
+
+#le cache a un id périmé pour l'event e1 (supprimé puis recréé) : l'association réelle c1 -> e1 est gardée,
+#c1 -> e2 n'est plus dans le fichier et est supprimée, le club c9 (absent du fichier) n'est ni lu ni touché
+def test_archive_uses_ids_read_in_run(mock_hubspot, isolated_state, monkeypatch):
+    club_id = mock_hubspot.add_object(CLUB, 'pk_club', 'c1')
+    cached_club_id = mock_hubspot.add_object(CLUB, 'pk_club', 'c9')
+    event_id = mock_hubspot.add_object(EVENT, 'pk_event', 'e1')
+    old_event_id = object_id(EVENT, 'e2')
+    id_cache._maps[CLUB] = {'c1': club_id, 'c9': cached_club_id}
+    id_cache._maps[EVENT] = {'e1': '999'}
+    mock_hubspot.associations[(CLUB, EVENT)] = {
+        club_id: {event_id: {122}, old_event_id: {122}},
+        cached_club_id: {old_event_id: {122}},
+    }
+
+    linked = _run_event_club(mock_hubspot, isolated_state, monkeypatch, ['c1,e1'])
+
+    assert event_id in linked[club_id]
+    assert old_event_id not in linked[club_id]
+    assert old_event_id in linked[cached_club_id]
+    assert id_cache._maps[EVENT]['e1'] == event_id
+
+    archive = [entry for entry in run_report.load_report() if entry['phase'] == 'archive']
+    assert [(entry['rows'], entry['skipped']) for entry in archive] == [(1, 0)]
+    reads = [entry for entry in run_report.load_report() if entry['phase'] == 'read_associations']
+    assert [entry['rows'] for entry in reads] == [1]
+
+
+#seul le type du fichier est retiré : la paire reste associée par l'autre type
+def test_archive_keeps_other_association_types(mock_hubspot, isolated_state, monkeypatch):
+    club_id = mock_hubspot.add_object(CLUB, 'pk_club', 'c1')
+    event_id = mock_hubspot.add_object(EVENT, 'pk_event', 'e1')
+    old_event_id = mock_hubspot.add_object(EVENT, 'pk_event', 'e2')
+    id_cache._maps[CLUB] = {'c1': club_id}
+    id_cache._maps[EVENT] = {'e1': event_id, 'e2': old_event_id}
+    mock_hubspot.associations[(CLUB, EVENT)] = {club_id: {event_id: {122}, old_event_id: {122, OTHER_TYPE}}}
+
+    linked = _run_event_club(mock_hubspot, isolated_state, monkeypatch, ['c1,e1'])
+
+    assert linked[club_id] == {event_id: {122}, old_event_id: {OTHER_TYPE}}
+    assert mock_hubspot.stats['associations_labels_archive'] == {'204': 1}
+    assert 'associations_archive' not in mock_hubspot.stats
@@ -0,0 +1,58 @@
+import pandas as pd
+
+import change_detection
+import hubspot_client
+
+
+def _import(mock_hubspot, csv_path):
+    with open(csv_path, 'rb') as csv_file:
+        response = hubspot_client.post(f"{hubspot_client.BASE_URL}/crm/v3/imports",
+                                       files={'files': (csv_path.name, csv_file, 'text/csv')},
+                                       data={'importRequest': '{}'})
+    import_id = response.json()['id']
+    return import_id, hubspot_client.wait_for_import_errors(import_id, {})
+
+
+def _upload_changes(mock_hubspot, isolated_state, df):
+    df_changed, snapshot = change_detection.detect_changes('test', df, 'pk')
+    csv_path = isolated_state / 'upload.csv'
+    df_changed.to_csv(csv_path, index=False)
+    import_id, errors = _import(mock_hubspot, csv_path)
+    rejected = {str(i) for i in mock_hubspot.imports[import_id]['rejected']}
+    return change_detection.commit_import('test', snapshot, errors, csv_path, 'pk'), errors, rejected
+
+
+#les lignes rejetées gardent leur ancien hash (ou sortent du snapshot) : seules elles sont renvoyées au run suivant
+def test_rejected_rows_are_the_only_rows_resent(mock_hubspot, isolated_state, monkeypatch):
+    monkeypatch.setattr(hubspot_client, 'IMPORT_POLL_SECONDS', 0.05)
+    mock_hubspot.config.error_rate = 0.5
+    keys = [str(i) for i in range(250)]
+
+    #lignes nouvelles
+    df = pd.DataFrame({'pk': keys, 'name': [f'nom {i}' for i in range(250)]})
+    success, errors, rejected = _upload_changes(mock_hubspot, isolated_state, df)
+    assert not success
+    assert len(errors) == len(rejected) > 100
+    assert set(change_detection.detect_changes('test', df, 'pk')[0]['pk']) == rejected
+
+    #lignes modifiées, après un import complet
+    mock_hubspot.config.error_rate = 0.0
+    assert _upload_changes(mock_hubspot, isolated_state, df)[0]
+    mock_hubspot.config.error_rate = 0.5
+    df = df.assign(name=df['name'] + ' bis')
+    success, errors, rejected = _upload_changes(mock_hubspot, isolated_state, df)
+    assert not success
+    assert set(change_detection.detect_changes('test', df, 'pk')[0]['pk']) == rejected
+
+
+def test_import_without_rejected_rows_saves_full_snapshot(mock_hubspot, isolated_state, monkeypatch):
+    monkeypatch.setattr(hubspot_client, 'IMPORT_POLL_SECONDS', 0.05)
+    df = pd.DataFrame({'pk': ['1', '2'], 'name': ['a', 'b']})
+    df_changed, snapshot = change_detection.detect_changes('test', df, 'pk')
+    csv_path = isolated_state / 'upload.csv'
+    df_changed.to_csv(csv_path, index=False)
+
+    _, errors = _import(mock_hubspot, csv_path)
+
+    assert change_detection.commit_import('test', snapshot, errors, csv_path, 'pk')
+    assert change_detection.detect_changes('test', df, 'pk')[0].empty
@@ -0,0 +1,132 @@
+import os
+from collections import namedtuple
+from datetime import datetime
+from decimal import Decimal
+
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+import export_format
+
+Column = namedtuple('Column', 'name type_code precision scale')
+
+#table de test exportée en csv (COPY, comme le connecteur) et en parquet (write_parquet)
+ROUNDTRIP_TABLE = '''
+    CREATE TEMP TABLE export_roundtrip (
+        id integer, amount numeric, price numeric(10, 2), ratio double precision,
+        payload bytea, label text, active boolean, created timestamp
+    )
+'''
+ROUNDTRIP_ROWS = '''
+    INSERT INTO export_roundtrip VALUES
+        (1, 12.50, 3.10, 0.1, '\\x00ff', 'a,b', true, '2024-01-02 03:04:05.5'),
+        (2, NULL, NULL, NULL, NULL, NULL, NULL, NULL),
+        (3, 100, 0, -2.5, '\\x', 'ligne
+deux', false, '2024-01-02'),
+        (4, 12345678901234567890.123456789, 99999999.99, 1e-7, '\\x4869', '', true, '1999-12-31 23:59:59')
+'''
+NUMERIC_COLUMNS = ['id', 'amount', 'price', 'ratio']
+
+
+def test_arrow_types():
+    assert export_format._arrow_type(pa, Column('amount', export_format.PG_NUMERIC, None, None)) == pa.string()
+    assert export_format._arrow_type(pa, Column('price', export_format.PG_NUMERIC, 10, 2)) == pa.decimal128(10, 2)
+    assert export_format._arrow_type(pa, Column('payload', export_format.PG_BYTEA, None, None)) == pa.binary()
+    assert export_format._text(memoryview(b'Hi')) == '\\x4869'
+
+
+#curseur qui renvoie les valeurs comme psycopg2 (Decimal, memoryview, datetime)
+class FakeCursor:
+    description = [Column('id', 23, None, None), Column('amount', export_format.PG_NUMERIC, None, None),
+                   Column('price', export_format.PG_NUMERIC, 10, 2), Column('payload', export_format.PG_BYTEA, None, None),
+                   Column('created', export_format.PG_TIMESTAMP, None, None)]
+    rows = [(1, Decimal('12.50'), Decimal('3.10'), memoryview(b'\x00\xff'), datetime(2024, 1, 2, 3, 4, 5, 500000)),
+            (2, None, None, None, None),
+            (3, Decimal('12345678901234567890.123456789'), Decimal('0.00'), memoryview(b''), datetime(2024, 1, 2))]
+
+    def execute(self, query):
+        self.pending = list(self.rows)
+
+    def fetchmany(self, size):
+        rows, self.pending = self.pending[:size], self.pending[size:]
+        return rows
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def cursor(self, name=None):
+        return FakeCursor()
+
+
+#csv écrit par le COPY de postgresql pour les mêmes lignes
+FAKE_CSV = ('id,amount,price,payload,created\n'
+            '1,12.50,3.10,\\x00ff,2024-01-02 03:04:05.5\n'
+            '2,,,,\n'
+            '3,12345678901234567890.123456789,0.00,\\x,2024-01-02 00:00:00\n')
+
+
+#le parquet donne le même texte que le csv, et les mêmes valeurs en lecture typée
+def test_parquet_text_matches_csv(tmp_path, monkeypatch):
+    monkeypatch.setattr(export_format, 'EXPORT_DIR', str(tmp_path))
+    monkeypatch.setattr(export_format, 'register_text_types', lambda conn: None)
+    export_format.write_parquet(FakeConnection(), 'SELECT', str(tmp_path / 'fake.parquet'))
+    (tmp_path / 'fake.csv').write_text(FAKE_CSV, encoding='utf-8')
+
+    exports = {}
+    for fmt in export_format.EXPORT_FORMATS:
+        monkeypatch.setenv('EXPORT_FORMAT', fmt)
+        exports[fmt] = (export_format.read_export('fake'), export_format.read_export('fake', as_text=True),
+                        list(export_format.iter_export_rows('fake')))
+
+    (csv_df, csv_text, csv_rows), (parquet_df, parquet_text, parquet_rows) = exports['csv'], exports['parquet']
+    assert parquet_rows == csv_rows
+    pd.testing.assert_frame_equal(parquet_text, csv_text)
+    assert parquet_text['amount'].tolist()[::2] == ['12.50', '12345678901234567890.123456789']
+    pd.testing.assert_series_equal(parquet_df['amount'], csv_df['amount'])
+
+
+#TEST_DATABASE_URL : base postgresql de test (dsn libpq), le test est ignoré sans
+@pytest.fixture
+def pg_conn():
+    psycopg2 = pytest.importorskip('psycopg2')
+    dsn = os.getenv('TEST_DATABASE_URL')
+    if not dsn:
+        pytest.skip('TEST_DATABASE_URL non défini')
+
+    conn = psycopg2.connect(dsn)
+    conn.set_client_encoding('UTF8')
+    yield conn
+    conn.rollback()
+    conn.close()
+
+
+def test_csv_parquet_roundtrip(pg_conn, tmp_path, monkeypatch):
+    monkeypatch.setattr(export_format, 'EXPORT_DIR', str(tmp_path))
+    cur = pg_conn.cursor()
+    cur.execute(ROUNDTRIP_TABLE)
+    cur.execute(ROUNDTRIP_ROWS)
+
+    query = 'SELECT * FROM export_roundtrip ORDER BY id'
+    with open(tmp_path / 'roundtrip.csv', 'wb') as f:
+        cur.copy_expert(f"COPY ({query}) TO STDOUT WITH CSV HEADER", f)
+    export_format.write_parquet(pg_conn, query, str(tmp_path / 'roundtrip.parquet'))
+
+    exports = {}
+    for fmt in export_format.EXPORT_FORMATS:
+        monkeypatch.setenv('EXPORT_FORMAT', fmt)
+        exports[fmt] = (export_format.read_export('roundtrip'), export_format.read_export('roundtrip', as_text=True),
+                        list(export_format.iter_export_rows('roundtrip')))
+
+    (csv_df, csv_text, csv_rows), (parquet_df, parquet_text, parquet_rows) = exports['csv'], exports['parquet']
+    for column in csv_df.columns:
+        if column in NUMERIC_COLUMNS:
+            pd.testing.assert_series_equal(parquet_df[column].astype('float64'), csv_df[column].astype('float64'))
+        else:
+            assert parquet_df[column].fillna('').tolist() == csv_df[column].fillna('').tolist()
+
+    #rendu texte identique, numeric sans précision compris
+    assert parquet_rows == csv_rows
+    pd.testing.assert_frame_equal(parquet_text, csv_text)
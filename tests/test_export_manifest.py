@@ -0,0 +1,22 @@
+import export_manifest
+
+PREVIOUS = {
+    'dwh.mv_cycle': {'format': 'csv', 'sha256': 'abc', 'mode': 'incremental', 'watermark': '2026-10-17'},
+    'dwh.mv_club': {'format': 'csv', 'sha256': 'def', 'mode': 'full'},
+}
+
+
+#export en échec : l'entrée précédente reste dans le manifeste tant que son fichier est là
+def test_failed_export_keeps_previous_entry(tmp_path):
+    (tmp_path / 'dwh.mv_cycle.csv').write_text('PKCycle\n1\n')
+    path = str(tmp_path / 'manifest.json')
+
+    entries = {'dwh.mv_region': {'format': 'csv', 'sha256': 'new'}}
+    entries.update(export_manifest.failed_entries(['dwh.mv_cycle', 'dwh.mv_club'], PREVIOUS, str(tmp_path)))
+    export_manifest.write_manifest(entries, PREVIOUS, path=path)
+
+    manifest = export_manifest.load_manifest(path)
+    assert sorted(manifest) == ['dwh.mv_cycle', 'dwh.mv_region']
+    assert manifest['dwh.mv_cycle']['stale'] and manifest['dwh.mv_cycle']['unchanged']
+    assert manifest['dwh.mv_cycle']['watermark'] == '2026-10-17'
+    assert 'stale' not in manifest['dwh.mv_region']
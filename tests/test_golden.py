@@ -0,0 +1,18 @@
+import os
+import sys
+
+import export_format
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+
+import run_benchmarks
+
+
+#sorties des transformations des scripts d'import identiques aux références de benchmarks/golden
+def test_transforms_match_golden_outputs(tmp_path, monkeypatch):
+    monkeypatch.setattr(export_format, 'EXPORT_DIR', export_format.EXPORT_DIR)
+    monkeypatch.setenv('EXPORT_FORMAT', 'csv')
+    names = sorted(run_benchmarks.TRANSFORMS)
+
+    assert [name for name in names if not os.path.exists(run_benchmarks.golden_path(name))] == []
+    assert run_benchmarks.check_golden(names, str(tmp_path)) == []
@@ -0,0 +1,61 @@
+import json
+import time
+
+import hubspot_client
+
+
+def test_upload_retried_after_429_resends_csv(mock_hubspot, tmp_path):
+    csv_path = tmp_path / 'upload.csv'
+    csv_path.write_text("pk,name\n1,alpha\n2,beta\n", encoding='utf-8')
+
+    #bucket épuisé : le premier envoi reçoit un 429
+    mock_hubspot.buckets['imports'] = {'remaining': 0, 'reset_at': time.time() + 0.2}
+
+    with open(csv_path, 'rb') as csv_file:
+        response = hubspot_client.post(
+            f"{hubspot_client.BASE_URL}/crm/v3/imports",
+            files={'files': ('upload.csv', csv_file, 'text/csv')},
+            data={'importRequest': json.dumps({'name': 'test'})}
+        )
+
+    assert response.status_code == 200
+    assert mock_hubspot.stats['import_create'] == {'429': 1, '200': 1}
+
+    body = mock_hubspot.imports[response.json()['id']]['body']
+    assert b"pk,name\n1,alpha\n2,beta\n" in body
+    assert b'"name": "test"' in body
+
+
+def _start_import(tmp_path):
+    csv_path = tmp_path / 'upload.csv'
+    csv_path.write_text("pk,name\n1,alpha\n2,beta\n", encoding='utf-8')
+    with open(csv_path, 'rb') as csv_file:
+        response = hubspot_client.post(f"{hubspot_client.BASE_URL}/crm/v3/imports",
+                                       files={'files': ('upload.csv', csv_file, 'text/csv')},
+                                       data={'importRequest': '{}'})
+    return response.json()['id']
+
+
+def test_wait_for_import_polls_until_done(mock_hubspot, tmp_path, monkeypatch):
+    monkeypatch.setattr(hubspot_client, 'IMPORT_POLL_SECONDS', 0.05)
+    mock_hubspot.config.import_delay_ms = 300
+
+    start = time.time()
+
+    assert hubspot_client.wait_for_import(_start_import(tmp_path), {})
+    assert time.time() - start >= 0.3
+
+
+def test_wait_for_import_fails_on_row_errors(mock_hubspot, tmp_path, monkeypatch):
+    monkeypatch.setattr(hubspot_client, 'IMPORT_POLL_SECONDS', 0.05)
+    mock_hubspot.config.error_rate = 1.0
+
+    assert not hubspot_client.wait_for_import(_start_import(tmp_path), {})
+
+
+def test_wait_for_import_times_out(mock_hubspot, tmp_path, monkeypatch):
+    monkeypatch.setattr(hubspot_client, 'IMPORT_POLL_SECONDS', 0.05)
+    monkeypatch.setattr(hubspot_client, 'IMPORT_TIMEOUT_SECONDS', 0.2)
+    mock_hubspot.config.import_delay_ms = 10000
+
+    assert not hubspot_client.wait_for_import(_start_import(tmp_path), {})
@@ -0,0 +1,63 @@
+import pytest
+
+import id_cache
+import mock_hubspot_server
+import state_store
+
+CLUB_OBJECT_ID = "2-191825137"
+CONTACT_OBJECT_ID = "0-1"
+
+
+def _seed_clubs(mock_hubspot, count):
+    for pk in range(count):
+        mock_hubspot.add_object(CLUB_OBJECT_ID, 'pk_club', pk)
+
+
+def test_full_pass_fills_cache_from_paginated_list(mock_hubspot):
+    _seed_clubs(mock_hubspot, 250)
+
+    found = id_cache.lookup(CLUB_OBJECT_ID, ['1', '2', '999'])
+
+    assert found == {'1': mock_hubspot_server.object_id(CLUB_OBJECT_ID, '1'),
+                     '2': mock_hubspot_server.object_id(CLUB_OBJECT_ID, '2')}
+    assert mock_hubspot.stats['objects_list'] == {'200': 3}
+    assert len(state_store.get_id_map(CLUB_OBJECT_ID)) == 250
+
+    state = state_store.get_watermarks()[f"id_map:{CLUB_OBJECT_ID}"]
+    assert state['watermark'] and state['last_full']
+
+
+def test_next_run_refreshes_incrementally_from_store(mock_hubspot, monkeypatch):
+    _seed_clubs(mock_hubspot, 120)
+    id_cache.refresh(CLUB_OBJECT_ID)
+
+    #nouveau processus : cache relu depuis le state store, seulement les objets modifiés demandés
+    monkeypatch.setattr(id_cache, '_maps', {})
+    mapping = id_cache.refresh(CLUB_OBJECT_ID)
+
+    assert len(mapping) == 120
+    assert mock_hubspot.stats['objects_list'] == {'200': 2}
+    assert mock_hubspot.stats['search'] == {'200': 1}
+
+
+def test_cache_falls_back_to_batch_read_when_list_fails(mock_hubspot, monkeypatch):
+    monkeypatch.setattr(id_cache, 'fetch_all', lambda object_type, key_property: None)
+
+    assert id_cache.lookup(CLUB_OBJECT_ID, ['7']) == {}
+    assert id_cache.read_by_key(CLUB_OBJECT_ID, ['7']) == {'7': mock_hubspot_server.object_id(CLUB_OBJECT_ID, '7')}
+
+
+#mise à jour incrémentale sur la date de modification propre au type (lastmodifieddate pour les contacts)
+@pytest.mark.parametrize('object_type', [CLUB_OBJECT_ID, CONTACT_OBJECT_ID])
+def test_incremental_refresh_finds_new_objects(mock_hubspot, monkeypatch, object_type):
+    key_property = id_cache.KEY_PROPERTIES[object_type]
+    for pk in range(10):
+        mock_hubspot.add_object(object_type, key_property, pk)
+    id_cache.refresh(object_type)
+
+    monkeypatch.setattr(id_cache, '_maps', {})
+    new_id = mock_hubspot.add_object(object_type, key_property, 'nouveau')
+    mapping = id_cache.refresh(object_type)
+
+    assert mapping['nouveau'] == new_id
+    assert mock_hubspot.stats['objects_list'] == {'200': 1}
@@ -0,0 +1,26 @@
+import time
+
+import import_event_custom
+
+
+def _event_upload(mock_hubspot, tmp_path, monkeypatch):
+    monkeypatch.setattr(import_event_custom, 'HUBSPOT_IMPORT_API_URL', f"{import_event_custom.hubspot_client.BASE_URL}/crm/v3/imports")
+    monkeypatch.setattr(import_event_custom.hubspot_client, 'IMPORT_POLL_SECONDS', 0.05)
+    csv_path = tmp_path / 'events.csv'
+    csv_path.write_text("pk_evt\n1\n2\n", encoding='utf-8')
+    return import_event_custom.upload_to_hubspot(str(csv_path), ['pk_evt'])
+
+
+#l'upload ne se termine qu'une fois l'import traité par hubspot
+def test_upload_waits_for_hubspot_processing(mock_hubspot, tmp_path, monkeypatch):
+    mock_hubspot.config.import_delay_ms = 300
+    start = time.time()
+
+    assert _event_upload(mock_hubspot, tmp_path, monkeypatch)
+    assert time.time() - start >= 0.3
+    assert mock_hubspot.stats['import_status']['200'] >= 1
+
+
+def test_upload_fails_when_hubspot_rejects_rows(mock_hubspot, tmp_path, monkeypatch):
+    mock_hubspot.config.error_rate = 1.0
+    assert not _event_upload(mock_hubspot, tmp_path, monkeypatch)
@@ -0,0 +1,25 @@
+import importlib
+import sys
+
+import pytest
+
+import export_format
+import warm_worker
+
+#scripts d'import dont le connecteur lit le code retour (dépendances des étapes, watermarks)
+IMPORT_MODULES = ['import_club_object', 'import_societe', 'import_expertises_object', 'import_event_custom',
+                  'import_contact', 'import_cycle']
+
+
+#export absent : l'import échoue, le code retour doit le signaler
+@pytest.mark.parametrize('module_name', IMPORT_MODULES)
+def test_failed_import_exits_with_error(module_name, isolated_state, monkeypatch):
+    module = importlib.import_module(module_name)
+    monkeypatch.setattr(export_format, 'EXPORT_DIR', str(isolated_state / 'exports'))
+    monkeypatch.setattr(module, 'output_dir', str(isolated_state / 'filtered'))
+    monkeypatch.setattr(sys, 'argv', [f'{module_name}.py'])
+
+    with pytest.raises(SystemExit) as exit_info:
+        module.main()
+    assert exit_info.value.code == 1
+    assert not warm_worker.run_module(module_name)
@@ -0,0 +1,32 @@
+import threading
+import time
+
+from scheduler import run_dag
+
+
+def test_after_waits_for_failed_steps_without_skipping():
+    finished = []
+    lock = threading.Lock()
+
+    def run_step(step):
+        if step.startswith('import'):
+            time.sleep(0.05)
+        with lock:
+            finished.append(step)
+        return step != 'import_b'
+
+    steps = ['import_a', 'import_b', 'check', 'associations']
+    dependencies = {'associations': ['check', 'import_a']}
+    after = {'check': ['import_a', 'import_b']}
+
+    results = run_dag(steps, dependencies, run_step, max_workers=4, after=after)
+
+    #la vérification attend les deux imports et tourne malgré l'échec de import_b
+    assert finished.index('check') > max(finished.index('import_a'), finished.index('import_b'))
+    assert results == {'import_a': True, 'import_b': False, 'check': True, 'associations': True}
+
+
+def test_failed_dependency_still_skips_step():
+    results = run_dag(['import_a', 'associations'], {'associations': ['import_a']}, lambda step: step != 'import_a')
+    assert results == {'import_a': False, 'associations': None}
+
@@ -0,0 +1,29 @@
+import textwrap
+
+from warm_worker import WarmPool
+
+#étape de test : réussit si elle ne voit ni les ids ni la session laissés par l'étape précédente
+PROBE = textwrap.dedent('''
+    import hubspot_client
+    import id_cache
+
+
+    def main(key):
+        clean = not id_cache._maps and hubspot_client._session is None
+        id_cache._maps['probe'] = {key: key}
+        hubspot_client.session()
+        return clean
+''')
+
+
+def test_steps_share_nothing_in_spawned_worker(tmp_path, monkeypatch):
+    (tmp_path / 'warm_probe.py').write_text(PROBE)
+    monkeypatch.syspath_prepend(str(tmp_path))
+
+    pool = WarmPool(['warm_probe'], max_workers=1)
+    try:
+        assert pool.executor._mp_context.get_start_method() == 'spawn'
+        assert pool.run('warm_probe', ['a'])
+        assert pool.run('warm_probe', ['b'])
+    finally:
+        pool.shutdown()
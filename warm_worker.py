@@ -0,0 +1,85 @@
+import importlib
+import multiprocessing
+import sys
+import threading
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+#bibliothèques chargées une seule fois par worker
+PRELOADED_LIBRARIES = ['pandas', 'requests', 'dotenv', 'csv', 'json', 'hubspot_client']
+
+#workers démarrés par spawn : un fork depuis les threads du scheduler copierait des verrous pris,
+#les connexions psycopg2 et les sessions requests du connecteur
+START_METHOD = 'spawn'
+
+#état gardé par les modules d'un appel à l'autre, remis à zéro avant chaque étape : (module, fonction)
+RESET_FUNCTIONS = [('id_cache', 'reset'), ('hubspot_client', 'reset_session')]
+
+
+#chargé au démarrage de chaque worker : les imports et le .env ne sont lus qu'une fois
+def init_worker(module_names):
+    for module_name in PRELOADED_LIBRARIES + list(module_names):
+        try:
+            importlib.import_module(module_name)
+        except Exception as e:
+            print(f"préchargement de {module_name} impossible: {e}")
+
+
+#une étape ne voit rien de l'étape précédente exécutée dans le même worker
+def reset_state():
+    for module_name, function_name in RESET_FUNCTIONS:
+        module = sys.modules.get(module_name)
+        if module is not None:
+            getattr(module, function_name)()
+
+
+#exécute le point d'entrée main() d'un script d'import dans le worker
+#même convention que le code retour d'un sous-processus : exception ou sys.exit(1) = échec
+def run_module(module_name, args=()):
+    try:
+        reset_state()
+        module = importlib.import_module(module_name)
+        result = module.main(*args)
+    except SystemExit as e:
+        return e.code in (None, 0)
+    except Exception:
+        traceback.print_exc()
+        return False
+
+    return result is not False
+
+
+#pool de processus gardés chauds pendant tout le run
+#un worker qui plante (OOM, segfault) ne fait échouer que son étape : le pool est recréé
+class WarmPool:
+    def __init__(self, module_names, max_workers=4):
+        self.module_names = list(module_names)
+        self.max_workers = max_workers
+        self.lock = threading.Lock()
+        self.executor = self._create_executor()
+
+    def _create_executor(self):
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context(START_METHOD),
+            initializer=init_worker,
+            initargs=(self.module_names,)
+        )
+
+    def run(self, module_name, args=()):
+        with self.lock:
+            executor = self.executor
+
+        try:
+            return executor.submit(run_module, module_name, tuple(args)).result()
+        except BrokenProcessPool:
+            print(f"worker interrompu pendant {module_name}, recréation du pool")
+            with self.lock:
+                if self.executor is executor:
+                    self.executor = self._create_executor()
+            return False
+
+    def shutdown(self):
+        with self.lock:
+            self.executor.shutdown(wait=True)
@@ -0,0 +1,55 @@
+import json
+import os
+from datetime import datetime, timedelta
+import state_store
+
+#dernières valeurs exportées (high-water mark) des tables en export incrémental
+#conservées dans le state store, l'ancien fichier json n'est lu que pour la migration
+STATE_DIR = '/root/apm/infocentre/apm-export-tables-back/state'
+WATERMARK_FILE = os.path.join(STATE_DIR, 'watermarks.json')
+
+
+def _load_watermark_file(path):
+    if not os.path.exists(path):
+        return {}
+
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"fichier de watermarks illisible {path}: {e}")
+        return {}
+
+
+def load_watermarks(path=WATERMARK_FILE):
+    watermarks = state_store.get_watermarks()
+    if watermarks:
+        return watermarks
+
+    #migration : reprise des watermarks de l'ancien fichier json
+    watermarks = _load_watermark_file(path)
+    if watermarks:
+        state_store.put_watermarks(watermarks)
+        print(f"watermarks migrés depuis {path}")
+    return watermarks
+
+
+#enregistre la nouvelle valeur une fois l'export consommé par les imports
+def save_watermarks(updates):
+    if not updates:
+        return
+
+    state_store.put_watermarks(updates)
+
+
+#un export complet est nécessaire sans watermark ou si le dernier export complet est trop ancien
+def needs_full_export(state, full_every_days):
+    if not state or not state.get('watermark') or not state.get('last_full'):
+        return True
+
+    try:
+        last_full = datetime.fromisoformat(state['last_full'])
+    except ValueError:
+        return True
+
+    return datetime.now() - last_full >= timedelta(days=full_every_days)